@@ -249,17 +249,13 @@ class Assignment(keystone_assignment.Driver):
                 sql_constraints).distinct()
         return [role.role_id for role in query.all()]
 
-    def list_role_ids_for_groups_on_project(
-            self, group_ids, project_id, project_domain_id, project_parents):
-
-        if not group_ids:
-            # If there's no groups then there will be no project roles.
-            return []
-
+    def _project_role_constraints(self, project_type, domain_type, actor_ids,
+                                  project_id, project_domain_id,
+                                  project_parents):
         # NOTE(rodrigods): First, we always include projects with
         # non-inherited assignments
         sql_constraints = sqlalchemy.and_(
-            RoleAssignment.type == AssignmentType.GROUP_PROJECT,
+            RoleAssignment.type == project_type,
             RoleAssignment.inherited == false(),
             RoleAssignment.target_id == project_id)
 
@@ -268,7 +264,7 @@ class Assignment(keystone_assignment.Driver):
             sql_constraints = sqlalchemy.or_(
                 sql_constraints,
                 sqlalchemy.and_(
-                    RoleAssignment.type == AssignmentType.GROUP_DOMAIN,
+                    RoleAssignment.type == domain_type,
                     RoleAssignment.inherited,
                     RoleAssignment.target_id == project_domain_id))
 
@@ -277,20 +273,48 @@ class Assignment(keystone_assignment.Driver):
                 sql_constraints = sqlalchemy.or_(
                     sql_constraints,
                     sqlalchemy.and_(
-                        RoleAssignment.type == AssignmentType.GROUP_PROJECT,
+                        RoleAssignment.type == project_type,
                         RoleAssignment.inherited,
                         RoleAssignment.target_id.in_(project_parents)))
 
-        sql_constraints = sqlalchemy.and_(
-            sql_constraints, RoleAssignment.actor_id.in_(group_ids))
+        return sqlalchemy.and_(
+            sql_constraints, RoleAssignment.actor_id.in_(actor_ids))
 
+    def _list_role_ids(self, sql_constraints):
         with sql.transaction() as session:
             # NOTE(morganfainberg): Only select the columns we actually care
             # about here, in this case role_id.
             query = session.query(RoleAssignment.role_id).filter(
                 sql_constraints).distinct()
+            return [result.role_id for result in query.all()]
+
+    def list_role_ids_for_groups_on_project(
+            self, group_ids, project_id, project_domain_id, project_parents):
+
+        if not group_ids:
+            # If there's no groups then there will be no project roles.
+            return []
+
+        return self._list_role_ids(self._project_role_constraints(
+            AssignmentType.GROUP_PROJECT, AssignmentType.GROUP_DOMAIN,
+            group_ids, project_id, project_domain_id, project_parents))
+
+    def list_role_ids_for_user_on_project(
+            self, user_id, group_ids, project_id, project_domain_id,
+            project_parents):
+        sql_constraints = self._project_role_constraints(
+            AssignmentType.USER_PROJECT, AssignmentType.USER_DOMAIN,
+            [user_id], project_id, project_domain_id, project_parents)
+
+        if group_ids:
+            sql_constraints = sqlalchemy.or_(
+                sql_constraints,
+                self._project_role_constraints(
+                    AssignmentType.GROUP_PROJECT, AssignmentType.GROUP_DOMAIN,
+                    group_ids, project_id, project_domain_id,
+                    project_parents))
 
-        return [result.role_id for result in query.all()]
+        return self._list_role_ids(sql_constraints)
 
     def list_project_ids_for_groups(self, group_ids, hints,
                                     inherited=False):
@@ -16,6 +16,7 @@
 
 import abc
 import copy
+import uuid
 
 from oslo_config import cfg
 from oslo_log import log
@@ -36,6 +37,7 @@ LOG = log.getLogger(__name__)
 MEMOIZE = cache.get_memoization_decorator(section='role')
 
 
+@notifications.listener
 @dependency.provider('assignment_api')
 @dependency.requires('credential_api', 'identity_api', 'resource_api',
                      'revoke_api', 'role_api')
@@ -66,6 +68,47 @@ class Manager(manager.Manager):
 
         super(Manager, self).__init__(assignment_driver)
 
+        self.event_callbacks = {
+            notifications.ACTIONS.created: {
+                'project': [self._project_created],
+            },
+            notifications.ACTIONS.deleted: {
+                'project': [self._effective_assignments_deleted],
+                'domain': [self._effective_assignments_deleted],
+                'user': [self._effective_assignments_deleted],
+                'group': [self._effective_assignments_deleted],
+                'role': [self._effective_assignments_deleted],
+            },
+            notifications.ACTIONS.internal: {
+                notifications.GROUP_MEMBERSHIP_CHANGED: [
+                    self._group_membership_changed],
+            },
+        }
+
+    def _project_created(self, service, resource_type, operation, payload):
+        self._effective_assignments_changed(
+            project_id=payload['resource_info'])
+
+    def _effective_assignments_deleted(self, service, resource_type,
+                                       operation, payload):
+        # The deleted entity can no longer be traced back to its domains, so
+        # every domain snapshot is refreshed.
+        self._invalidate_effective_assignments()
+
+    def _group_membership_changed(self, service, resource_type, operation,
+                                  payload):
+        refs = self.driver.list_role_assignments(
+            group_ids=[payload['resource_info']])
+        domain_ids = set(ref['domain_id'] for ref in refs
+                         if 'domain_id' in ref)
+        project_ids = set(ref['project_id'] for ref in refs
+                          if 'project_id' in ref)
+        if project_ids:
+            domain_ids.update(
+                project['domain_id'] for project in
+                self.resource_api.list_projects_from_ids(list(project_ids)))
+        self._invalidate_effective_assignments(domain_ids)
+
     def _get_group_ids_for_user_id(self, user_id):
         # TODO(morganfainberg): Implement a way to get only group_ids
         # instead of the more expensive to_dict() call for each record.
@@ -96,15 +139,7 @@ class Manager(manager.Manager):
                  keystone.exception.ProjectNotFound
 
         """
-        def _get_group_project_roles(user_id, project_ref):
-            group_ids = self._get_group_ids_for_user_id(user_id)
-            return self.list_role_ids_for_groups_on_project(
-                group_ids,
-                project_ref['id'],
-                project_ref['domain_id'],
-                self._list_parent_ids_of_project(project_ref['id']))
-
-        def _get_user_project_roles(user_id, project_ref):
+        def _get_user_project_roles(user_id, project_ref, parent_ids):
             role_list = []
             try:
                 metadata_ref = self._get_metadata(user_id=user_id,
@@ -124,18 +159,31 @@ class Manager(manager.Manager):
                 except (exception.MetadataNotFound, exception.NotImplemented):
                     pass
                 # As well inherited roles from parent projects
-                for p in self.resource_api.list_project_parents(
-                        project_ref['id']):
+                for parent_id in parent_ids:
                     p_roles = self.list_grants(
-                        user_id=user_id, project_id=p['id'],
+                        user_id=user_id, project_id=parent_id,
                         inherited_to_projects=True)
                     role_list += [x['id'] for x in p_roles]
 
             return role_list
 
         project_ref = self.resource_api.get_project(tenant_id)
-        user_role_list = _get_user_project_roles(user_id, project_ref)
-        group_role_list = _get_group_project_roles(user_id, project_ref)
+        group_ids = self._get_group_ids_for_user_id(user_id)
+        parent_ids = self._list_parent_ids_of_project(project_ref['id'])
+        try:
+            return self.driver.list_role_ids_for_user_on_project(
+                user_id, group_ids, project_ref['id'],
+                project_ref['domain_id'], parent_ids)
+        except exception.NotImplemented:
+            # The driver cannot resolve every assignment at once, so collect
+            # the user and group roles separately.
+            pass
+
+        user_role_list = _get_user_project_roles(user_id, project_ref,
+                                                 parent_ids)
+        group_role_list = self.list_role_ids_for_groups_on_project(
+            group_ids, project_ref['id'], project_ref['domain_id'],
+            parent_ids)
         # Use set() to process the list to remove any duplicates
         return list(set(user_role_list + group_role_list))
 
@@ -230,6 +278,7 @@ class Manager(manager.Manager):
                 user_id,
                 tenant_id,
                 CONF.member_role_id)
+        self._effective_assignments_changed(project_id=tenant_id)
 
     @notifications.role_assignment('created')
     def _add_role_to_user_and_project_adapter(self, role_id, user_id=None,
@@ -245,6 +294,7 @@ class Manager(manager.Manager):
         self.resource_api.get_project(project_id)
         self.role_api.get_role(role_id)
         self.driver.add_role_to_user_and_project(user_id, project_id, role_id)
+        self._effective_assignments_changed(project_id=project_id)
 
     def add_role_to_user_and_project(self, user_id, tenant_id, role_id):
         self._add_role_to_user_and_project_adapter(
@@ -271,6 +321,7 @@ class Manager(manager.Manager):
             except exception.RoleNotFound:
                 LOG.debug("Removing role %s failed because it does not exist.",
                           role_id)
+        self._effective_assignments_changed(project_id=tenant_id)
 
     # TODO(henry-nash): We might want to consider list limiting this at some
     # point in the future.
@@ -381,6 +432,7 @@ class Manager(manager.Manager):
 
         self.driver.remove_role_from_user_and_project(user_id, project_id,
                                                       role_id)
+        self._effective_assignments_changed(project_id=project_id)
         self.identity_api.emit_invalidate_user_token_persistence(user_id)
         self.revoke_api.revoke_by_grant(role_id, user_id=user_id,
                                         project_id=project_id)
@@ -409,6 +461,8 @@ class Manager(manager.Manager):
             self.resource_api.get_project(project_id)
         self.driver.create_grant(role_id, user_id, group_id, domain_id,
                                  project_id, inherited_to_projects)
+        self._effective_assignments_changed(domain_id=domain_id,
+                                            project_id=project_id)
 
     def get_grant(self, role_id, user_id=None, group_id=None,
                   domain_id=None, project_id=None,
@@ -486,6 +540,8 @@ class Manager(manager.Manager):
             self.resource_api.get_project(project_id)
         self.driver.delete_grant(role_id, user_id, group_id, domain_id,
                                  project_id, inherited_to_projects)
+        self._effective_assignments_changed(domain_id=domain_id,
+                                            project_id=project_id)
 
     # The methods _expand_indirect_assignment, _list_direct_role_assignments
     # and _list_effective_role_assignments below are only used on
@@ -786,6 +842,66 @@ class Manager(manager.Manager):
 
         return refs
 
+    @MEMOIZE
+    def _get_effective_assignments_version(self, domain_id):
+        return uuid.uuid4().hex
+
+    def _invalidate_effective_assignments(self, domain_ids=None):
+        """Move the given domains, or all of them, to a new snapshot."""
+        if domain_ids is None:
+            domain_ids = [x['id'] for x in self.resource_api.list_domains()]
+        for domain_id in domain_ids:
+            self._get_effective_assignments_version.invalidate(
+                self, domain_id)
+
+    def _effective_assignments_changed(self, domain_id=None,
+                                       project_id=None):
+        if project_id:
+            domain_id = self.resource_api.get_project(project_id)['domain_id']
+        self._invalidate_effective_assignments([domain_id])
+
+    @MEMOIZE
+    def _get_effective_assignments_snapshot(self, domain_id, inherited,
+                                            version):
+        """Return the expanded assignments on a domain and its projects.
+
+        Snapshots are keyed by a version that changes whenever an assignment,
+        group membership or project affecting the domain changes, so a
+        snapshot built while a change is in flight is never served after it.
+
+        """
+        refs = self.driver.list_role_assignments(
+            domain_id=domain_id, inherited_to_projects=inherited)
+        project_ids = [x['id'] for x in
+                       self.resource_api.list_projects_in_domain(domain_id)]
+        if project_ids:
+            refs += self.driver.list_role_assignments(
+                project_ids=project_ids, inherited_to_projects=inherited)
+
+        expanded_refs = []
+        for ref in refs:
+            expanded_refs += self._expand_indirect_assignment(ref=ref)
+        return expanded_refs
+
+    def _list_all_effective_role_assignments(self, role_id, inherited):
+        """List the effective role assignments across every domain.
+
+        This is the unfiltered listing used to audit a whole deployment, so it
+        is served from the per domain snapshots rather than expanding every
+        group and inherited assignment on each request.
+
+        """
+        refs = []
+        for domain in self.resource_api.list_domains():
+            version = self._get_effective_assignments_version(domain['id'])
+            refs += self._get_effective_assignments_snapshot(
+                domain['id'], inherited, version)
+        if role_id:
+            refs = [ref for ref in refs if ref['role_id'] == role_id]
+        # NOTE: Callers are free to modify the returned refs, so do not hand
+        # out the cached ones.
+        return copy.deepcopy(refs)
+
     def _list_direct_role_assignments(self, role_id, user_id, group_id,
                                       domain_id, project_id, inherited):
         """List role assignments without applying expansion.
@@ -831,6 +947,9 @@ class Manager(manager.Manager):
             inherited = False
 
         if effective:
+            if not (user_id or group_id or domain_id or project_id):
+                return self._list_all_effective_role_assignments(
+                    role_id, inherited)
             return self._list_effective_role_assignments(
                 role_id, user_id, group_id, domain_id, project_id, inherited)
         else:
@@ -1111,6 +1230,32 @@ class Driver(object):
         """
         raise exception.NotImplemented()
 
+    def list_role_ids_for_user_on_project(
+            self, user_id, group_ids, project_id, project_domain_id,
+            project_parents):
+        """List the effective role ids of a user on a specific project.
+
+        Combines the roles assigned to the user and to its groups, including
+        the ``OS-INHERIT`` roles inherited from the project's domain and
+        parents, so that drivers can resolve them in a single query. Drivers
+        that cannot do so leave this unimplemented and the manager collects
+        the roles one source at a time.
+
+        :param user_id: user identifier
+        :type user_id: str
+        :param group_ids: list of group ids the user belongs to
+        :type group_ids: list
+        :param project_id: project identifier
+        :type project_id: str
+        :param project_domain_id: project's domain identifier
+        :type project_domain_id: str
+        :param project_parents: list of parent ids of this project
+        :type project_parents: list
+        :returns: list of role ids for the project
+        :rtype: list
+        """
+        raise exception.NotImplemented()
+
     @abc.abstractmethod
     def list_role_ids_for_groups_on_domain(self, group_ids, domain_id):
         """List the group role ids for a specific domain.
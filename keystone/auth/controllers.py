@@ -23,6 +23,7 @@ from oslo_utils import importutils
 import six
 import stevedore
 
+from keystone.common import authorization
 from keystone.common import controller
 from keystone.common import dependency
 from keystone.common import utils
@@ -512,8 +513,9 @@ class Auth(controller.V3Controller):
     @controller.protected()
     def check_token(self, context):
         token_id = context.get('subject_token_id')
-        token_data = self.token_provider_api.validate_v3_token(
-            token_id)
+        token_data = authorization.validate_token(
+            self.token_provider_api, context.get('environment'), token_id,
+            v3=True)
         # NOTE(morganfainberg): The code in
         # ``keystone.common.wsgi.render_response`` will remove the content
         # body.
@@ -528,9 +530,12 @@ class Auth(controller.V3Controller):
     def validate_token(self, context):
         token_id = context.get('subject_token_id')
         include_catalog = 'nocatalog' not in context['query_string']
-        token_data = self.token_provider_api.validate_v3_token(
-            token_id)
+        token_data = authorization.validate_token(
+            self.token_provider_api, context.get('environment'), token_id,
+            v3=True)
         if not include_catalog and 'catalog' in token_data['token']:
+            # The validated token data is shared by the whole request.
+            token_data = dict(token_data, token=dict(token_data['token']))
             del token_data['token']['catalog']
         return render_token_data_response(token_id, token_data)
 
@@ -18,6 +18,7 @@ from six.moves.urllib import parse
 
 from keystone import auth
 from keystone.auth import plugins as auth_plugins
+from keystone.common import authorization
 from keystone.common import dependency
 from keystone.contrib.federation import constants as federation_constants
 from keystone.contrib.federation import utils
@@ -36,9 +37,10 @@ METHOD_NAME = 'mapped'
                      'resource_api', 'token_provider_api')
 class Mapped(auth.AuthMethodHandler):
 
-    def _get_token_ref(self, auth_payload):
+    def _get_token_ref(self, context, auth_payload):
         token_id = auth_payload['id']
-        response = self.token_provider_api.validate_token(token_id)
+        response = authorization.validate_token(
+            self.token_provider_api, context.get('environment'), token_id)
         return token_model.KeystoneToken(token_id=token_id,
                                          token_data=response)
 
@@ -58,7 +60,7 @@ class Mapped(auth.AuthMethodHandler):
         """
 
         if 'id' in auth_payload:
-            token_ref = self._get_token_ref(auth_payload)
+            token_ref = self._get_token_ref(context, auth_payload)
             handle_scoped_token(context, auth_payload, auth_context, token_ref,
                                 self.federation_api,
                                 self.identity_api,
@@ -194,13 +196,15 @@ def apply_mapping_filter(identity_provider, protocol, assertion,
     # ``mapping_id`` was used as well as idenity_api and resource_api
     # objects.
     group_ids = mapped_properties['group_ids']
+    group_lookup = utils.GroupLookup(identity_api, resource_api)
     utils.validate_groups_in_backend(group_ids,
                                      mapping_id,
-                                     identity_api)
+                                     identity_api,
+                                     group_lookup=group_lookup)
     group_ids.extend(
         utils.transform_to_group_ids(
             mapped_properties['group_names'], mapping_id,
-            identity_api, resource_api))
+            identity_api, resource_api, group_lookup=group_lookup))
     mapped_properties['group_ids'] = list(set(group_ids))
     return mapped_properties, mapping_id
 
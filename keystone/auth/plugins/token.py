@@ -18,6 +18,7 @@ import six
 
 from keystone import auth
 from keystone.auth.plugins import mapped
+from keystone.common import authorization
 from keystone.common import dependency
 from keystone.common import wsgi
 from keystone import exception
@@ -33,9 +34,10 @@ CONF = cfg.CONF
 @dependency.requires('federation_api', 'identity_api', 'token_provider_api')
 class Token(auth.AuthMethodHandler):
 
-    def _get_token_ref(self, auth_payload):
+    def _get_token_ref(self, context, auth_payload):
         token_id = auth_payload['id']
-        response = self.token_provider_api.validate_token(token_id)
+        response = authorization.validate_token(
+            self.token_provider_api, context.get('environment'), token_id)
         return token_model.KeystoneToken(token_id=token_id,
                                          token_data=response)
 
@@ -43,7 +45,7 @@ class Token(auth.AuthMethodHandler):
         if 'id' not in auth_payload:
             raise exception.ValidationError(attribute='id',
                                             target='token')
-        token_ref = self._get_token_ref(auth_payload)
+        token_ref = self._get_token_ref(context, auth_payload)
         if token_ref.is_federated_user and self.federation_api:
             mapped.handle_scoped_token(
                 context, auth_payload, user_context, token_ref,
@@ -13,8 +13,6 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import itertools
-
 from oslo_config import cfg
 import sqlalchemy
 from sqlalchemy.sql import true
@@ -23,6 +21,7 @@ from keystone import catalog
 from keystone.catalog import core
 from keystone.common import sql
 from keystone import exception
+from keystone import notifications
 
 
 CONF = cfg.CONF
@@ -86,7 +85,21 @@ class Endpoint(sql.ModelBase, sql.DictBase):
     extra = sql.Column(sql.JsonBlob())
 
 
+@notifications.listener
 class Catalog(catalog.Driver):
+    def __init__(self):
+        super(Catalog, self).__init__()
+        catalog_changed = {'service': self._catalog_changed,
+                           'endpoint': self._catalog_changed}
+        self.event_callbacks = {
+            notifications.ACTIONS.created: catalog_changed,
+            notifications.ACTIONS.updated: catalog_changed,
+            notifications.ACTIONS.deleted: catalog_changed,
+        }
+
+    def _catalog_changed(self, service, resource_type, operation, payload):
+        self._get_compiled_catalog.invalidate(self)
+
     # Regions
     def list_regions(self, hints):
         session = sql.get_session()
@@ -267,6 +280,48 @@ class Catalog(catalog.Driver):
             ref.extra = new_endpoint.extra
         return ref.to_dict()
 
+    @core.MEMOIZE
+    def _get_compiled_catalog(self):
+        """Return the enabled services with their enabled endpoints.
+
+        This is the part of the catalog that does not depend on the user or
+        project, so it is cached until a service or endpoint changes. The
+        endpoints are in the V3 catalog format, with unformatted URLs.
+
+        """
+        session = sql.get_session()
+        services = (session.query(Service).filter(Service.enabled == true()).
+                    options(sql.joinedload(Service.endpoints)).
+                    all())
+
+        compiled_catalog = []
+        for svc in services:
+            endpoints = []
+            for endpoint in (ep.to_dict() for ep in svc.endpoints
+                             if ep.enabled):
+                del endpoint['service_id']
+                del endpoint['legacy_endpoint_id']
+                del endpoint['enabled']
+                endpoint['region'] = endpoint['region_id']
+                endpoints.append(endpoint)
+            compiled_catalog.append({'endpoints': endpoints, 'id': svc.id,
+                                     'type': svc.type,
+                                     'name': svc.extra.get('name', '')})
+        return compiled_catalog
+
+    def _format_endpoint_urls(self, endpoints, substitutions,
+                              silent_keyerror_failures):
+        """Yield the endpoints and their URLs formatted for the catalog."""
+        for endpoint in endpoints:
+            try:
+                formatted_url = core.format_url(
+                    endpoint['url'], substitutions,
+                    silent_keyerror_failures=silent_keyerror_failures)
+            except exception.MalformedEndpoint:
+                continue  # this failure is already logged in format_url()
+            if formatted_url is not None:
+                yield endpoint, formatted_url
+
     def get_catalog(self, user_id, tenant_id):
         """Retrieve and format the V2 service catalog.
 
@@ -282,47 +337,26 @@ class Catalog(catalog.Driver):
                   empty dict.
 
         """
-        substitutions = dict(
-            itertools.chain(CONF.items(), CONF.eventlet_server.items()))
-        substitutions.update({'user_id': user_id})
-        silent_keyerror_failures = []
-        if tenant_id:
-            substitutions.update({'tenant_id': tenant_id})
-        else:
-            silent_keyerror_failures = ['tenant_id']
-
-        session = sql.get_session()
-        endpoints = (session.query(Endpoint).
-                     options(sql.joinedload(Endpoint.service)).
-                     filter(Endpoint.enabled == true()).all())
+        substitutions = core.get_url_substitutions(user_id, tenant_id)
+        silent_keyerror_failures = [] if tenant_id else ['tenant_id']
 
         catalog = {}
 
-        for endpoint in endpoints:
-            if not endpoint.service['enabled']:
-                continue
-            try:
-                formatted_url = core.format_url(
-                    endpoint['url'], substitutions,
-                    silent_keyerror_failures=silent_keyerror_failures)
-                if formatted_url is not None:
-                    url = formatted_url
-                else:
-                    continue
-            except exception.MalformedEndpoint:
-                continue  # this failure is already logged in format_url()
-
-            region = endpoint['region_id']
-            service_type = endpoint.service['type']
-            default_service = {
-                'id': endpoint['id'],
-                'name': endpoint.service.extra.get('name', ''),
-                'publicURL': ''
-            }
-            catalog.setdefault(region, {})
-            catalog[region].setdefault(service_type, default_service)
-            interface_url = '%sURL' % endpoint['interface']
-            catalog[region][service_type][interface_url] = url
+        for svc in self._get_compiled_catalog():
+            for endpoint, url in self._format_endpoint_urls(
+                    svc['endpoints'], substitutions,
+                    silent_keyerror_failures):
+                region = endpoint['region_id']
+                service_type = svc['type']
+                default_service = {
+                    'id': endpoint['id'],
+                    'name': svc['name'],
+                    'publicURL': ''
+                }
+                catalog.setdefault(region, {})
+                catalog[region].setdefault(service_type, default_service)
+                interface_url = '%sURL' % endpoint['interface']
+                catalog[region][service_type][interface_url] = url
 
         return catalog
 
@@ -339,45 +373,25 @@ class Catalog(catalog.Driver):
         :returns: A list representing the service catalog or an empty list
 
         """
-        d = dict(
-            itertools.chain(CONF.items(), CONF.eventlet_server.items()))
-        d.update({'user_id': user_id})
-        silent_keyerror_failures = []
-        if tenant_id:
-            d.update({'tenant_id': tenant_id})
-        else:
-            silent_keyerror_failures = ['tenant_id']
-
-        session = sql.get_session()
-        services = (session.query(Service).filter(Service.enabled == true()).
-                    options(sql.joinedload(Service.endpoints)).
-                    all())
+        substitutions = core.get_url_substitutions(user_id, tenant_id)
+        silent_keyerror_failures = [] if tenant_id else ['tenant_id']
 
         def make_v3_endpoints(endpoints):
-            for endpoint in (ep.to_dict() for ep in endpoints if ep.enabled):
-                del endpoint['service_id']
-                del endpoint['legacy_endpoint_id']
-                del endpoint['enabled']
-                endpoint['region'] = endpoint['region_id']
-                try:
-                    formatted_url = core.format_url(
-                        endpoint['url'], d,
-                        silent_keyerror_failures=silent_keyerror_failures)
-                    if formatted_url:
-                        endpoint['url'] = formatted_url
-                    else:
-                        continue
-                except exception.MalformedEndpoint:
-                    continue  # this failure is already logged in format_url()
-
+            # NOTE: The compiled catalog may be shared through the cache, so
+            # the endpoints are copied rather than modified.
+            for endpoint, url in self._format_endpoint_urls(
+                    endpoints, substitutions, silent_keyerror_failures):
+                if not url:
+                    continue
+                endpoint = endpoint.copy()
+                endpoint['url'] = url
                 yield endpoint
 
         # TODO(davechen): If there is service with no endpoints, we should skip
         # the service instead of keeping it in the catalog, see bug #1436704.
         def make_v3_service(svc):
-            eps = list(make_v3_endpoints(svc.endpoints))
-            service = {'endpoints': eps, 'id': svc.id, 'type': svc.type}
-            service['name'] = svc.extra.get('name', '')
-            return service
+            eps = list(make_v3_endpoints(svc['endpoints']))
+            return {'endpoints': eps, 'id': svc['id'], 'type': svc['type'],
+                    'name': svc['name']}
 
-        return [make_v3_service(svc) for svc in services]
+        return [make_v3_service(svc) for svc in self._get_compiled_catalog()]
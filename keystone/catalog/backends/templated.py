@@ -12,7 +12,6 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import itertools
 import os.path
 
 from oslo_config import cfg
@@ -119,14 +118,8 @@ class Catalog(kvs.Catalog):
                   empty dict.
 
         """
-        substitutions = dict(
-            itertools.chain(CONF.items(), CONF.eventlet_server.items()))
-        substitutions.update({'user_id': user_id})
-        silent_keyerror_failures = []
-        if tenant_id:
-            substitutions.update({'tenant_id': tenant_id})
-        else:
-            silent_keyerror_failures = ['tenant_id']
+        substitutions = core.get_url_substitutions(user_id, tenant_id)
+        silent_keyerror_failures = [] if tenant_id else ['tenant_id']
 
         catalog = {}
         # TODO(davechen): If there is service with no endpoints, we should
@@ -17,6 +17,7 @@
 
 import abc
 import itertools
+import re
 
 from oslo_config import cfg
 from oslo_log import log
@@ -42,6 +43,98 @@ WHITELISTED_PROPERTIES = [
     'public_endpoint', 'admin_endpoint', ]
 
 
+# The number of parsed URL templates kept by format_url.
+_URL_TEMPLATE_CACHE_SIZE = 1024
+_URL_TEMPLATES = {}
+
+# A substitution with a key and conversion that URL templates are parsed into,
+# or an escaped '%'. Anything else is left to the '%' operator.
+_URL_PLACEHOLDER = re.compile(
+    r'%(?:\((?P<key>[^()]*)\)'
+    r'(?P<spec>[#0\- +]*\d*(?:\.\d+)?[diouxXeEfFgGcrs])|(?P<escape>%))')
+
+# Returned by _URLTemplate.format when the URL must be formatted with the '%'
+# operator to get the same result or error.
+_FORMAT_WITH_OPERATOR = object()
+
+
+class _URLTemplate(object):
+    """A URL template parsed once for :func:`format_url`.
+
+    ``keys`` are the substitutions the URL needs, in order. ``parts`` is
+    the literal text and ``(key, conversion)`` substitutions of the URL, or
+    None if the URL uses formatting that is not parsed here.
+
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.keys = []
+        self.parts = []
+        url_format = url.replace('$(', '%(')
+        position = 0
+        for match in _URL_PLACEHOLDER.finditer(url_format):
+            literal = url_format[position:match.start()]
+            if '%' in literal:
+                self.parts = None
+                break
+            self.parts.append(literal)
+            if match.group('escape'):
+                self.parts.append('%')
+            else:
+                key = match.group('key')
+                self.keys.append(key)
+                self.parts.append((key, '%' + match.group('spec')))
+            position = match.end()
+        else:
+            literal = url_format[position:]
+            if '%' in literal:
+                self.parts = None
+            else:
+                self.parts.append(literal)
+
+    def format(self, substitutions, allow_keyerror):
+        """Format the URL, substituting from left to right like '%' does.
+
+        :returns: the formatted URL, None if a key in ``allow_keyerror`` is
+                  missing, or ``_FORMAT_WITH_OPERATOR`` if formatting fails
+                  in any other way.
+
+        """
+        formatted = []
+        for part in self.parts:
+            if not isinstance(part, tuple):
+                formatted.append(part)
+                continue
+            key, conversion = part
+            if key not in WHITELISTED_PROPERTIES:
+                return _FORMAT_WITH_OPERATOR
+            if key not in substitutions:
+                if key in allow_keyerror:
+                    return None
+                return _FORMAT_WITH_OPERATOR
+            try:
+                formatted.append(conversion % (substitutions[key],))
+            except (TypeError, ValueError):
+                return _FORMAT_WITH_OPERATOR
+        return ''.join(formatted)
+
+
+def _get_url_template(url):
+    """Return the parsed template of a URL, or None if it is not a string."""
+    try:
+        return _URL_TEMPLATES[url]
+    except (KeyError, TypeError):
+        pass
+    if not isinstance(url, six.string_types):
+        return None
+    template = _URLTemplate(url)
+    if len(_URL_TEMPLATES) >= _URL_TEMPLATE_CACHE_SIZE:
+        _URL_TEMPLATES.clear()
+    _URL_TEMPLATES[url] = template
+    return template
+
+
 def format_url(url, substitutions, silent_keyerror_failures=None):
     """Formats a user-defined URL with the given substitutions.
 
@@ -52,11 +145,21 @@ def format_url(url, substitutions, silent_keyerror_failures=None):
     :returns: a formatted URL
 
     """
+    allow_keyerror = silent_keyerror_failures or []
+
+    # NOTE: URLs are parsed once and formatted from the parsed template. URLs
+    # that are not parsed, and substitutions that fail other than with a key
+    # in silent_keyerror_failures, are formatted with the '%' operator below
+    # so that the same errors are logged and raised.
+    template = _get_url_template(url)
+    if template is not None and template.parts is not None:
+        result = template.format(substitutions, allow_keyerror)
+        if result is not _FORMAT_WITH_OPERATOR:
+            return result
 
     substitutions = utils.WhiteListedItemFilter(
         WHITELISTED_PROPERTIES,
         substitutions)
-    allow_keyerror = silent_keyerror_failures or []
     try:
         result = url.replace('$(', '%(') % substitutions
     except AttributeError:
@@ -85,6 +188,31 @@ def format_url(url, substitutions, silent_keyerror_failures=None):
     return result
 
 
+def get_url_substitutions(user_id, tenant_id=None):
+    """Return the substitutions used to format the URLs of a catalog.
+
+    This is equivalent to building the substitutions from every option in
+    ``CONF`` and ``CONF.eventlet_server``, but only looks up the whitelisted
+    options.
+
+    :param user_id: the id of the user the catalog is built for
+    :param tenant_id: the id of the project the catalog is built for, if any
+    :returns: dict of substitutions for :func:`format_url`
+
+    """
+    substitutions = {}
+    for name in WHITELISTED_PROPERTIES:
+        for group in (CONF, CONF.eventlet_server):
+            try:
+                substitutions[name] = group[name]
+            except (KeyError, cfg.NoSuchOptError):
+                pass
+    substitutions['user_id'] = user_id
+    if tenant_id:
+        substitutions['tenant_id'] = tenant_id
+    return substitutions
+
+
 def check_endpoint_url(url):
     """Check substitution of url.
 
@@ -16,10 +16,12 @@ from __future__ import absolute_import
 from __future__ import print_function
 
 import os
+import time
 
 from oslo_config import cfg
 from oslo_log import log
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 import pbr.version
 
 from keystone.common import driver_hints
@@ -238,10 +240,92 @@ class TokenFlush(BaseApp):
 
     name = 'token_flush'
 
+    # Batch size used when batching is requested by any of the batch options
+    # other than --batch-size.
+    default_batch_size = 1000
+
+    @classmethod
+    def add_argument_parser(cls, subparsers):
+        parser = super(TokenFlush, cls).add_argument_parser(subparsers)
+        parser.add_argument('--batch-size', default=None, type=int,
+                            help=('Delete expired tokens in transactions of '
+                                  'at most this many tokens, printing the '
+                                  'progress after each one. By default all '
+                                  'expired tokens are deleted at once.'))
+        parser.add_argument('--pause', default=None, type=float,
+                            help=('Seconds to sleep between batches, to limit '
+                                  'the load on the database and its '
+                                  'replicas.'))
+        parser.add_argument('--deadline', default=None, type=float,
+                            help=('Stop after deleting the batch that runs '
+                                  'past this many seconds.'))
+        parser.add_argument('--expired-after', default=None,
+                            help=('Only delete tokens that expired after '
+                                  'this ISO 8601 time. Together with '
+                                  '--expired-before this allows several '
+                                  'flushes to run in parallel on disjoint '
+                                  'expiry ranges.'))
+        parser.add_argument('--expired-before', default=None,
+                            help=('Only delete tokens that expired no later '
+                                  'than this ISO 8601 time, which may not '
+                                  'be in the future. Defaults to now.'))
+        return parser
+
+    @staticmethod
+    def _parse_time(value):
+        if value is None:
+            return None
+        return timeutils.normalize_time(timeutils.parse_isotime(value))
+
     @classmethod
     def main(cls):
+        cls.flush(batch_size=CONF.command.batch_size,
+                  pause=CONF.command.pause,
+                  deadline=CONF.command.deadline,
+                  expired_after=cls._parse_time(CONF.command.expired_after),
+                  expired_before=cls._parse_time(CONF.command.expired_before))
+
+    @classmethod
+    def flush(cls, batch_size=None, pause=None, deadline=None,
+              expired_after=None, expired_before=None):
         token_manager = token.persistence.PersistenceManager()
-        token_manager.flush_expired_tokens()
+        batch_options = (pause, deadline, expired_after, expired_before)
+        if batch_size is None and all(o is None for o in batch_options):
+            token_manager.flush_expired_tokens()
+            return
+
+        batch_size = batch_size or cls.default_batch_size
+        # NOTE: Fix the upper bound so that tokens expiring while the flush
+        # runs are left for the next one, which keeps the ranges of parallel
+        # flushes disjoint.
+        now = timeutils.utcnow()
+        if expired_before is None:
+            expired_before = now
+        elif expired_before > now:
+            raise SystemExit(_('--expired-before %s is in the future, only '
+                               'expired tokens can be flushed.') %
+                             expired_before.isoformat())
+
+        start = time.time()
+        total_removed = 0
+        while True:
+            removed = token_manager.flush_expired_tokens_batch(
+                batch_size, lower_bound=expired_after,
+                upper_bound=expired_before)
+            total_removed += removed
+            elapsed = time.time() - start
+            print(_('Removed %(total)d expired tokens (%(rate).1f '
+                    'tokens/s)') %
+                  {'total': total_removed,
+                   'rate': total_removed / elapsed if elapsed else 0.0})
+            if removed < batch_size:
+                break
+            if deadline is not None and elapsed >= deadline:
+                print(_('Stopping the token flush after %.1f seconds, '
+                        'expired tokens remain.') % elapsed)
+                break
+            if pause:
+                time.sleep(pause)
 
 
 class MappingPurge(BaseApp):
@@ -39,11 +39,62 @@ It is a dictionary with the following attributes:
 
 """
 
+VALIDATED_TOKENS_ENV = 'keystone.validated_tokens'
+"""Environment variable keeping the tokens validated during a request.
+
+It is a dictionary mapping ``(token_id, v3)`` to the validated token data,
+see ``validate_token()``.
+
+"""
+
+TOKEN_VALIDATIONS_ENV = 'keystone.token_validations'
+"""Environment variable counting the token validations of a request."""
+
 LOG = log.getLogger(__name__)
 
 
+def validate_token(token_provider_api, environment, token_id, v3=False):
+    """Validate a token at most once per request.
+
+    The token data is kept in the request environment, so that the auth
+    context middleware, RBAC and the controllers handling a request share a
+    single validation of each token. Each validation that goes to the token
+    provider is counted in the ``TOKEN_VALIDATIONS_ENV`` variable.
+
+    :param environment: the WSGI environment of the request, or None to
+                        always validate the token
+    :param v3: return the token data in the v3 format, as
+               ``validate_v3_token`` does, rather than in the format of the
+               token, as ``validate_token`` does
+    :raises: exception.TokenNotFound if the token is not valid, which is
+             not kept
+
+    """
+    if environment is None:
+        environment = {}
+    validated = environment.setdefault(VALIDATED_TOKENS_ENV, {})
+    token_data = validated.get((token_id, v3))
+    if token_data is None and v3:
+        # A v3 token is validated to the same data by both methods.
+        token_data = validated.get((token_id, False))
+        if token_data is not None and 'token' not in token_data:
+            token_data = None
+    if token_data is not None:
+        return token_data
+
+    environment[TOKEN_VALIDATIONS_ENV] = (
+        environment.get(TOKEN_VALIDATIONS_ENV, 0) + 1)
+    if v3:
+        token_data = token_provider_api.validate_v3_token(token_id)
+    else:
+        token_data = token_provider_api.validate_token(token_id)
+    validated[(token_id, v3)] = token_data
+    return token_data
+
+
 def token_to_auth_context(token):
-    if not isinstance(token, token_model.KeystoneToken):
+    if not isinstance(token, (token_model.KeystoneToken,
+                              token_model.KeystoneTokenView)):
         raise exception.UnexpectedError(_('token reference must be a '
                                           'KeystoneToken type, got: %s') %
                                         type(token))
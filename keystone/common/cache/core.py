@@ -15,6 +15,7 @@
 """Keystone Caching Layer Implementation."""
 
 import dogpile.cache
+from dogpile.cache import api
 from dogpile.cache import proxy
 from dogpile.cache import util
 from oslo_config import cfg
@@ -296,8 +297,17 @@ def get_memoization_decorator(section, expiration_section=None):
     should_cache = get_should_cache_fn(section)
     expiration_time = get_expiration_time_fn(expiration_section)
 
-    memoize = REGION.cache_on_arguments(should_cache_fn=should_cache,
-                                        expiration_time=expiration_time)
+    cache_on_arguments = REGION.cache_on_arguments(
+        should_cache_fn=should_cache, expiration_time=expiration_time)
+
+    def memoize(fn):
+        decorated = cache_on_arguments(fn)
+        # NOTE: Expose the cache key generator and TTL of the decorated
+        # function so that several memoized values can be fetched at once
+        # with ``get_multi``.
+        decorated.generate_key = function_key_generator(None, fn)
+        decorated.get_expiration_time = expiration_time
+        return decorated
 
     # Make sure the actual "should_cache" and "expiration_time" methods are
     # available. This is potentially interesting/useful to pre-seed cache
@@ -306,3 +316,23 @@ def get_memoization_decorator(section, expiration_section=None):
     memoize.get_expiration_time = expiration_time
 
     return memoize
+
+
+def get_multi(memoized_fn, *args_list):
+    """Fetch several values cached by a memoized function at once.
+
+    ``memoized_fn`` must have been decorated by a decorator built with
+    :func:`get_memoization_decorator`. Each element of ``args_list`` is the
+    tuple of arguments the function would have been called with (including
+    ``self`` for methods). Values are fetched from the cache region with a
+    single ``get_multi`` call.
+
+    :returns: list of cached values, in the order of ``args_list``, with
+              ``None`` for each value that is not cached.
+    """
+    keys = [memoized_fn.generate_key(*args) for args in args_list]
+    if not keys:
+        return []
+    values = REGION.get_multi(
+        keys, expiration_time=memoized_fn.get_expiration_time())
+    return [None if value is api.NO_VALUE else value for value in values]
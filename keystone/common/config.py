@@ -163,6 +163,54 @@ FILE_OPTIONS = {
                    max=passlib.utils.MAX_PASSWORD_SIZE,
                    help='Maximum supported length for user passwords; '
                         'decrease to improve performance.'),
+        cfg.IntOpt('password_hash_workers', default=0,
+                   help='Number of worker processes each keystone process '
+                        'starts to hash and verify user passwords, so that '
+                        'hashing does not block the handling of other '
+                        'requests. A value of 0 hashes passwords in the '
+                        'requesting thread.'),
+        cfg.IntOpt('password_hash_queue_size', default=64,
+                   help='Maximum number of passwords waiting for a '
+                        'password_hash_workers process. Requests needing '
+                        'further passwords hashed are rejected with a 503 '
+                        'Service Unavailable error rather than queued.'),
+        cfg.IntOpt('password_hash_timeout', default=10,
+                   help='Time in seconds a request waits for a '
+                        'password_hash_workers process to hash its '
+                        'password. The worker is then replaced and the '
+                        'request rejected with a 503 Service Unavailable '
+                        'error.'),
+        cfg.IntOpt('verified_password_cache_ttl', default=0,
+                   help='Time in seconds a successful verification of a '
+                        'user password stored by keystone is remembered '
+                        'for by each keystone process, skipping the hash '
+                        'when the same password is given again. Only a '
+                        'keyed hash of the password is kept. A value of 0 '
+                        'disables the cache.'),
+        cfg.IntOpt('verified_password_cache_size', default=1000,
+                   help='Maximum number of password verifications '
+                        'remembered by each keystone process.'),
+        cfg.StrOpt('password_hash_algorithm', default='sha512_crypt',
+                   choices=['sha512_crypt', 'bcrypt', 'scrypt',
+                            'pbkdf2_sha512'],
+                   help='The passlib scheme used to hash user passwords. '
+                        'Passwords hashed with any of the other schemes '
+                        'are still verified, and are rehashed with this '
+                        'scheme when the user next authenticates. bcrypt '
+                        'requires the bcrypt library to be installed. '
+                        'WARNING: bcrypt only uses the first 72 bytes of a '
+                        'password, so longer passwords (see '
+                        'max_password_length) that share those bytes are '
+                        'all accepted.'),
+        cfg.IntOpt('password_hash_rounds',
+                   help='The cost passed as the keyword "rounds" to the '
+                        'password_hash_algorithm scheme: the number of '
+                        'iterations for sha512_crypt and pbkdf2_sha512, '
+                        'and its base 2 logarithm for bcrypt and scrypt. '
+                        'Defaults to crypt_strength for sha512_crypt and '
+                        'to the passlib default for the other schemes. '
+                        'Passwords hashed with a different cost are '
+                        'rehashed when the user next authenticates.'),
         cfg.IntOpt('list_limit',
                    help='Maximum number of entities that will be returned in '
                         'an identity collection.'),
@@ -233,6 +281,14 @@ FILE_OPTIONS = {
                         'key, and one secondary key. Increasing this value '
                         'means that additional secondary keys will be kept in '
                         'the rotation.'),
+        cfg.BoolOpt('packed_payloads', default=False,
+                    help='Pack the payload of unscoped, domain-scoped and '
+                         'project-scoped tokens whose IDs are all UUIDs into '
+                         'a fixed binary layout instead of msgpack, which is '
+                         'faster to issue and validate. Tokens in either '
+                         'format are always accepted; only enable this once '
+                         'every keystone node validating these tokens has '
+                         'been upgraded.'),
     ],
     'token': [
         cfg.ListOpt('bind', default=[],
@@ -274,6 +330,17 @@ FILE_OPTIONS = {
                     'list of tokens to revoke. Only disable if you are '
                     'switching to using the Revoke extension with a '
                     'backend other than KVS, which stores events in memory.'),
+        cfg.BoolOpt('legacy_kvs_indexes', default=False,
+                    deprecated_for_removal=True,
+                    help='Also keep the per-user token lists and the '
+                         'revocation list of the kvs and memcache token '
+                         'persistence drivers in the format of earlier '
+                         'releases, so that keystone nodes which have not '
+                         'been upgraded yet still see every token. Only '
+                         'enable this while upgrading from an earlier '
+                         'release, as every token created then rewrites '
+                         'the whole list, and disable it once every node is '
+                         'upgraded.'),
         cfg.BoolOpt('allow_rescope_scoped_token', default=True,
                     help='Allow rescoping of scoped token. Setting '
                     'allow_rescoped_scoped_token to false prevents a user '
@@ -297,14 +364,31 @@ FILE_OPTIONS = {
                         'expiration before a revocation event may be removed '
                         'from the backend.'),
         cfg.BoolOpt('caching', default=True,
-                    help='Toggle for revocation event caching. This has no '
-                         'effect unless global caching is enabled.'),
+                    help='Toggle for keeping the revocation events in each '
+                         'keystone process. When disabled, every token '
+                         'validation reads all the revocation events from '
+                         'the backend.'),
         cfg.IntOpt('cache_time', default=3600,
-                   help='Time to cache the revocation list and the revocation '
-                        'events (in seconds). This has no effect unless '
-                        'global and token caching are enabled.',
+                   help='Time (in seconds) after which each keystone '
+                        'process reads all the revocation events from the '
+                        'backend again, rather than only the new ones. This '
+                        'has no effect unless revocation caching is '
+                        'enabled.',
                    deprecated_opts=[cfg.DeprecatedOpt(
                        'revocation_cache_time', group='token')]),
+        cfg.IntOpt('poll_interval', default=1,
+                   help='Minimum time (in seconds) between two reads of new '
+                        'revocation events from the backend by a keystone '
+                        'process. Revocations made by other processes may '
+                        'take this long to take effect. This has no effect '
+                        'unless revocation caching is enabled.'),
+        cfg.IntOpt('fetch_overlap', default=60,
+                   help='New revocation events are read from this many '
+                        'seconds before the newest event already read. Set '
+                        'this above the clock skew between keystone nodes, '
+                        'otherwise events revoked by a node with a lagging '
+                        'clock may be missed until the events are next all '
+                        'read again (see cache_time).'),
     ],
     'cache': [
         cfg.StrOpt('config_prefix', default='cache.keystone',
@@ -544,6 +628,11 @@ FILE_OPTIONS = {
         cfg.IntOpt('list_limit',
                    help='Maximum number of entities that will be returned '
                         'in a policy collection.'),
+        cfg.IntOpt('decision_cache_size', default=0,
+                   help='Maximum number of policy decisions cached by the '
+                        'rules policy engine, keyed by action, credentials '
+                        'and target. The cache is cleared whenever the '
+                        'policy file is reloaded. Set to 0 to disable.'),
     ],
     'endpoint_filter': [
         cfg.StrOpt('driver',
@@ -565,7 +654,11 @@ FILE_OPTIONS = {
     ],
     'ldap': [
         cfg.StrOpt('url', default='ldap://localhost',
-                   help='URL for connecting to the LDAP server.'),
+                   help='URL for connecting to the LDAP server. Several '
+                        'URLs may be given, separated by commas or spaces. '
+                        'Without connection pooling they are tried in '
+                        'order, with it connections are spread across '
+                        'them.'),
         cfg.StrOpt('user',
                    help='User BindDN to query the LDAP server.'),
         cfg.StrOpt('password', secret=True,
@@ -855,7 +948,8 @@ FILE_OPTIONS = {
         cfg.BoolOpt('use_pool', default=False,
                     help='Enable LDAP connection pooling.'),
         cfg.IntOpt('pool_size', default=10,
-                   help='Connection pool size.'),
+                   help='Connection pool size, divided evenly between the '
+                        'servers of url.'),
         cfg.IntOpt('pool_retry_max', default=3,
                    help='Maximum count of reconnect trials.'),
         cfg.FloatOpt('pool_retry_delay', default=0.1,
@@ -866,14 +960,50 @@ FILE_OPTIONS = {
                         'indefinite wait for response.'),
         cfg.IntOpt('pool_connection_lifetime', default=600,
                    help='Connection lifetime in seconds.'),
+        cfg.IntOpt('pool_eject_failures', default=3,
+                   help='Number of times in a row connecting to, or a '
+                        'request to, a pooled LDAP server may fail before '
+                        'the server is no longer used for pool_eject_time '
+                        'seconds. A value of 0 disables ejecting servers.'),
+        cfg.IntOpt('pool_eject_time', default=30,
+                   help='Time in seconds a failing pooled LDAP server is '
+                        'not used for.'),
         cfg.BoolOpt('use_auth_pool', default=False,
                     help='Enable LDAP connection pooling for end user '
                          'authentication. If use_pool is disabled, then this '
                          'setting is meaningless and is not used at all.'),
         cfg.IntOpt('auth_pool_size', default=100,
-                   help='End user auth connection pool size.'),
+                   help='End user auth connection pool size, divided '
+                        'evenly between the servers of url.'),
         cfg.IntOpt('auth_pool_connection_lifetime', default=60,
                    help='End user auth connection lifetime in seconds.'),
+        cfg.IntOpt('entry_cache_ttl', default=0,
+                   help='Time in seconds entries read from the directory '
+                        'by identity lookups are cached for by each '
+                        'keystone process. A value of 0 disables the entry '
+                        'cache.'),
+        cfg.IntOpt('entry_cache_negative_ttl', default=10,
+                   help='Time in seconds lookups that found no entry are '
+                        'cached for. A value of 0 disables negative caching. '
+                        'Only used when entry_cache_ttl is set.'),
+        cfg.IntOpt('entry_cache_size', default=10000,
+                   help='Maximum number of entries held by the entry '
+                        'cache of each LDAP object type.'),
+        cfg.IntOpt('entry_cache_poll_interval', default=0,
+                   help='Interval in seconds at which the directory is '
+                        'searched for entries changed since the last search, '
+                        'which are then dropped from the entry cache. A '
+                        'value of 0 disables polling, leaving changes made '
+                        'outside of this process to expire with '
+                        'entry_cache_ttl.'),
+        cfg.StrOpt('entry_cache_change_attribute',
+                   default='modifyTimestamp',
+                   choices=['modifyTimestamp', 'entryCSN'],
+                   help='Operational attribute searched to find changed '
+                        'entries when entry_cache_poll_interval is set. '
+                        'The attribute must support ordering matches, as '
+                        'modifyTimestamp does on most servers and entryCSN '
+                        'does on OpenLDAP.'),
     ],
     'auth': [
         cfg.ListOpt('methods', default=_DEFAULT_AUTH_METHODS,
@@ -71,9 +71,10 @@ def _build_policy_check_credentials(self, action, context, kwargs):
     # in a sane manner as this just mirrors the logic in AuthContextMiddleware
     try:
         LOG.debug('RBAC: building auth context from the incoming auth token')
-        token_ref = token_model.KeystoneToken(
+        token_ref = token_model.KeystoneTokenView(
             token_id=context['token_id'],
-            token_data=self.token_provider_api.validate_token(
+            token_data=authorization.validate_token(
+                self.token_provider_api, context.get('environment'),
                 context['token_id']))
         # NOTE(jamielennox): whilst this maybe shouldn't be within this
         # function it would otherwise need to reload the token_ref from
@@ -88,6 +89,13 @@ def _build_policy_check_credentials(self, action, context, kwargs):
     return auth_context
 
 
+def _rule_reads_target(policy_api, action):
+    """Whether the policy rule for an action reads the target entity."""
+    attributes = policy_api.get_target_attributes(action)
+    return attributes is None or any(
+        attribute.startswith('target.') for attribute in attributes)
+
+
 def protected(callback=None):
     """Wraps API calls with role based access controls (RBAC).
 
@@ -117,11 +125,16 @@ def protected(callback=None):
 
                 policy_dict = {}
 
+                # Only build the target entity if the rule reads it, as
+                # doing so costs a backend lookup or a token validation.
+                reads_target = _rule_reads_target(self.policy_api, action)
+
                 # Check to see if we need to include the target entity in our
                 # policy checks.  We deduce this by seeing if the class has
                 # specified a get_member() method and that kwargs contains the
                 # appropriate entity id.
-                if (hasattr(self, 'get_member_from_driver') and
+                if (reads_target and
+                        hasattr(self, 'get_member_from_driver') and
                         self.get_member_from_driver is not None):
                     key = '%s_id' % self.member_name
                     if key in kwargs:
@@ -130,10 +143,13 @@ def protected(callback=None):
 
                 # TODO(henry-nash): Move this entire code to a member
                 # method inside v3 Auth
-                if context.get('subject_token_id') is not None:
-                    token_ref = token_model.KeystoneToken(
+                if (reads_target and
+                        context.get('subject_token_id') is not None):
+                    token_ref = token_model.KeystoneTokenView(
                         token_id=context['subject_token_id'],
-                        token_data=self.token_provider_api.validate_token(
+                        token_data=authorization.validate_token(
+                            self.token_provider_api,
+                            context.get('environment'),
                             context['subject_token_id']))
                     policy_dict.setdefault('target', {})
                     policy_dict['target'].setdefault(self.member_name, {})
@@ -24,12 +24,24 @@ LOG = log.getLogger(__name__)
 __all__ = ['Server', 'httplib', 'subprocess']
 
 _configured = False
+_reset_callbacks = []
 
 Server = None
 httplib = None
 subprocess = None
 
 
+def register_reset_callback(callback):
+    """Call ``callback`` whenever the server is reset, e.g. on SIGHUP."""
+    _reset_callbacks.append(callback)
+
+
+def reset():
+    """Run the callbacks registered with register_reset_callback."""
+    for callback in _reset_callbacks:
+        callback()
+
+
 def configure_once(name):
     """Ensure that environment configuration is only run once.
 
@@ -30,6 +30,7 @@ from oslo_log import log
 from oslo_log import loggers
 from oslo_service import service
 
+from keystone.common import environment
 from keystone.i18n import _LE, _LI
 
 
@@ -180,9 +181,10 @@ class Server(service.ServiceBase):
         SIGHUP. The service interface is defined in
         oslo_service.service.Service.
 
-        Keystone does not need to do anything here.
+        Runs the callbacks registered with
+        keystone.common.environment.register_reset_callback.
         """
-        pass
+        environment.reset()
 
     def _run(self, application, socket):
         """Start a WSGI server with a new green thread pool."""
@@ -14,10 +14,15 @@
 
 import abc
 import codecs
+import collections
+import contextlib
+import copy
 import functools
 import os.path
 import re
 import sys
+import threading
+import time
 import weakref
 
 import ldap.filter
@@ -429,7 +434,8 @@ class LDAPHandler(object):
                 tls_req_cert='demand', chase_referrals=None, debug_level=None,
                 use_pool=None, pool_size=None, pool_retry_max=None,
                 pool_retry_delay=None, pool_conn_timeout=None,
-                pool_conn_lifetime=None):
+                pool_conn_lifetime=None, pool_eject_failures=None,
+                pool_eject_time=None):
         raise exception.NotImplemented()  # pragma: no cover
 
     @abc.abstractmethod
@@ -440,6 +446,17 @@ class LDAPHandler(object):
     def get_option(self, option):
         raise exception.NotImplemented()  # pragma: no cover
 
+    @contextlib.contextmanager
+    def pinned_connection(self):
+        """Send the requests made within the context over one connection.
+
+        Needed by requests which depend on each other, such as the pages
+        of a paged search, whose cookies are only valid on the server that
+        issued them. Handlers with a single connection have nothing to do.
+
+        """
+        yield
+
     @abc.abstractmethod
     def simple_bind_s(self, who='', cred='',
                       serverctrls=None, clientctrls=None):
@@ -470,6 +487,10 @@ class LDAPHandler(object):
                 resp_ctrl_classes=None):
         raise exception.NotImplemented()  # pragma: no cover
 
+    @abc.abstractmethod
+    def abandon(self, msgid):
+        raise exception.NotImplemented()  # pragma: no cover
+
     @abc.abstractmethod
     def modify_s(self, dn, modlist):
         raise exception.NotImplemented()  # pragma: no cover
@@ -500,7 +521,8 @@ class PythonLDAPHandler(LDAPHandler):
                 tls_req_cert='demand', chase_referrals=None, debug_level=None,
                 use_pool=None, pool_size=None, pool_retry_max=None,
                 pool_retry_delay=None, pool_conn_timeout=None,
-                pool_conn_lifetime=None):
+                pool_conn_lifetime=None, pool_eject_failures=None,
+                pool_eject_time=None):
 
         _common_ldap_initialization(url=url,
                                     use_tls=use_tls,
@@ -559,6 +581,9 @@ class PythonLDAPHandler(LDAPHandler):
         # To run with older versions of python-ldap we do not pass it.
         return self.conn.result3(msgid, all, timeout)
 
+    def abandon(self, msgid):
+        return self.conn.abandon(msgid)
+
     def modify_s(self, dn, modlist):
         return self.conn.modify_s(dn, modlist)
 
@@ -632,16 +657,222 @@ def use_conn_pool(func):
     """Use this only for connection pool specific ldap API.
 
     This adds connection object to decorated API as next argument after self.
+    Within ``pinned_connection()`` that is the pinned connection.
 
     """
     def wrapper(self, *args, **kwargs):
         # assert isinstance(self, PooledLDAPHandler)
+        if self._pinned_conn is not None:
+            return func(self, self._pinned_conn, *args, **kwargs)
         with self._get_pool_connection() as conn:
             self._apply_options(conn)
             return func(self, conn, *args, **kwargs)
     return wrapper
 
 
+_URL_SEPARATOR = re.compile(r'[\s,]+')
+
+
+def split_urls(url):
+    """Split an LDAP URL option into the URLs of the servers it lists.
+
+    Like libldap, URLs may be separated by whitespace or commas.
+
+    """
+    return [u for u in _URL_SEPARATOR.split(url) if u]
+
+
+# Errors that show a server, rather than a request, is failing.
+_SERVER_ERRORS = (ldappool.BackendError, ldap.SERVER_DOWN, ldap.TIMEOUT)
+
+
+class ServerStats(object):
+    """Pool usage statistics and health of one pooled LDAP server.
+
+    ``response_time`` is a moving average of the time connections are held
+    for, which for most requests is the time the server took to answer.
+
+    """
+
+    # Weight of the latest response time in the moving average.
+    RESPONSE_TIME_WEIGHT = 0.2
+
+    def __init__(self, url):
+        self.url = url
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.created = 0
+        self.in_use = 0
+        self.acquired = 0
+        self.total_wait_time = 0.0
+        self.exhausted = 0
+        self.response_time = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.ejected_until = 0
+
+    def is_ejected(self, now):
+        return now < self.ejected_until
+
+    def record_created(self):
+        with self._lock:
+            self.created += 1
+
+    def record_acquired(self, wait_time):
+        with self._lock:
+            self.in_use += 1
+            self.acquired += 1
+            self.total_wait_time += wait_time
+
+    def record_exhausted(self, wait_time):
+        with self._lock:
+            self.exhausted += 1
+            self.total_wait_time += wait_time
+
+    def record_released(self, response_time, failed, eject_failures,
+                        eject_time):
+        with self._lock:
+            self.in_use -= 1
+            self.requests += 1
+            if self.requests == 1:
+                self.response_time = response_time
+            else:
+                self.response_time += self.RESPONSE_TIME_WEIGHT * (
+                    response_time - self.response_time)
+            if failed:
+                self._record_error(eject_failures, eject_time)
+            else:
+                self.consecutive_errors = 0
+
+    def record_connect_failure(self, wait_time, eject_failures, eject_time):
+        with self._lock:
+            self.requests += 1
+            self.total_wait_time += wait_time
+            self._record_error(eject_failures, eject_time)
+
+    def _record_error(self, eject_failures, eject_time):
+        self.errors += 1
+        self.consecutive_errors += 1
+        if eject_failures and self.consecutive_errors >= eject_failures:
+            LOG.warn(_LW('LDAP server %(url)s failed %(count)d times in a '
+                         'row, not using it for %(time)d seconds.'),
+                     {'url': self.url, 'count': self.consecutive_errors,
+                      'time': eject_time})
+            self.ejected_until = time.time() + eject_time
+
+    def as_dict(self):
+        """Return the statistics.
+
+        ``wait_time`` is the average time taken to get a connection and
+        ``creation_rate`` the number of connections created per second.
+
+        """
+        with self._lock:
+            now = time.time()
+            return {
+                'url': self.url,
+                'in_use': self.in_use,
+                'acquired': self.acquired,
+                'created': self.created,
+                'creation_rate': self.created / max(now - self.started, 1.0),
+                'wait_time': self.total_wait_time / max(
+                    self.acquired + self.exhausted, 1),
+                'exhausted': self.exhausted,
+                'response_time': self.response_time,
+                'requests': self.requests,
+                'errors': self.errors,
+                'error_rate': float(self.errors) / max(self.requests, 1),
+                'ejected': self.is_ejected(now),
+            }
+
+
+def _counting_connector(connector_cls, stats):
+    """Return a connector class that counts the connections it creates."""
+    class Connector(connector_cls):
+        def __init__(self, *args, **kwargs):
+            stats.record_created()
+            # NOTE: python-ldap connections are old-style classes, so
+            # super() cannot be used.
+            connector_cls.__init__(self, *args, **kwargs)
+    return Connector
+
+
+class ServerPool(object):
+    """Spreads pooled connections across the servers of an LDAP URL.
+
+    Every server has its own ldappool connection manager. Connections are
+    taken from the server with the fewest connections in use, weighted by
+    its response time, so that a slow server is given less work. When a
+    connection cannot be made, or the server's pool is exhausted, the next
+    server is tried.
+
+    A server that fails ``eject_failures`` times in a row is not used for
+    ``eject_time`` seconds, unless no other server is left to try. It is
+    then given one more chance before being ejected again.
+
+    """
+
+    # The response time a server is assumed to have before it has any.
+    MIN_RESPONSE_TIME = 0.001
+
+    def __init__(self, servers, eject_failures, eject_time):
+        # A list of (ldappool.ConnectionManager, ServerStats) pairs.
+        self.servers = servers
+        self.eject_failures = eject_failures
+        self.eject_time = eject_time
+
+    def _choose(self, tried):
+        now = time.time()
+        servers = [s for s in self.servers if s not in tried]
+        healthy = [s for s in servers if not s[1].is_ejected(now)]
+        if healthy:
+            return min(healthy, key=lambda s: (
+                (s[1].in_use + 1) *
+                max(s[1].response_time, self.MIN_RESPONSE_TIME)))
+        return min(servers, key=lambda s: s[1].ejected_until)
+
+    @contextlib.contextmanager
+    def connection(self, who, cred):
+        tried = []
+        while True:
+            server = self._choose(tried)
+            manager, stats = server
+            started = time.time()
+            conn_ctxt = manager.connection(who, cred)
+            try:
+                conn = conn_ctxt.__enter__()
+            except ldappool.MaxConnectionReachedError:
+                stats.record_exhausted(time.time() - started)
+                error = sys.exc_info()
+            except _SERVER_ERRORS:
+                stats.record_connect_failure(time.time() - started,
+                                             self.eject_failures,
+                                             self.eject_time)
+                error = sys.exc_info()
+            else:
+                break
+            tried.append(server)
+            if len(tried) == len(self.servers):
+                six.reraise(*error)
+
+        acquired = time.time()
+        stats.record_acquired(acquired - started)
+        exc_info = (None, None, None)
+        try:
+            yield conn
+        except BaseException:
+            exc_info = sys.exc_info()
+            raise
+        finally:
+            # Also reached when an abandoned context is garbage collected,
+            # which throws GeneratorExit here.
+            stats.record_released(time.time() - acquired,
+                                  isinstance(exc_info[1], _SERVER_ERRORS),
+                                  self.eject_failures, self.eject_time)
+            conn_ctxt.__exit__(*exc_info)
+
+
 class PooledLDAPHandler(LDAPHandler):
     """LDAPHandler implementation which uses pooled connection manager.
 
@@ -670,6 +901,7 @@ class PooledLDAPHandler(LDAPHandler):
     auth_pool_prefix = 'auth_pool_'
 
     connection_pools = {}  # static connector pool dict
+    server_stats = {}  # static server statistics dict, keyed as above
 
     def __init__(self, conn=None, use_auth_pool=False):
         super(PooledLDAPHandler, self).__init__(conn=conn)
@@ -679,13 +911,15 @@ class PooledLDAPHandler(LDAPHandler):
         self.page_size = None
         self.use_auth_pool = use_auth_pool
         self.conn_pool = None
+        self._pinned_conn = None
 
     def connect(self, url, page_size=0, alias_dereferencing=None,
                 use_tls=False, tls_cacertfile=None, tls_cacertdir=None,
                 tls_req_cert='demand', chase_referrals=None, debug_level=None,
                 use_pool=None, pool_size=None, pool_retry_max=None,
                 pool_retry_delay=None, pool_conn_timeout=None,
-                pool_conn_lifetime=None):
+                pool_conn_lifetime=None, pool_eject_failures=None,
+                pool_eject_time=None):
 
         _common_ldap_initialization(url=url,
                                     use_tls=use_tls,
@@ -703,23 +937,42 @@ class PooledLDAPHandler(LDAPHandler):
         if chase_referrals is not None:
             self.set_option(ldap.OPT_REFERRALS, int(chase_referrals))
 
-        if self.use_auth_pool:  # separate pool when use_auth_pool enabled
-            pool_url = self.auth_pool_prefix + url
-        else:
-            pool_url = url
-        try:
-            self.conn_pool = self.connection_pools[pool_url]
-        except KeyError:
-            self.conn_pool = ldappool.ConnectionManager(
-                url,
-                size=pool_size,
-                retry_max=pool_retry_max,
-                retry_delay=pool_retry_delay,
-                timeout=pool_conn_timeout,
-                connector_cls=self.Connector,
-                use_tls=use_tls,
-                max_lifetime=pool_conn_lifetime)
-            self.connection_pools[pool_url] = self.conn_pool
+        server_urls = split_urls(url)
+        if pool_size:
+            # The pool size is shared between the servers.
+            pool_size = max(1, -(-pool_size // len(server_urls)))
+        servers = []
+        for server_url in server_urls:
+            if self.use_auth_pool:  # separate pool when use_auth_pool enabled
+                pool_url = self.auth_pool_prefix + server_url
+            else:
+                pool_url = server_url
+            stats = self.server_stats.get(pool_url)
+            if stats is None:
+                stats = self.server_stats.setdefault(
+                    pool_url, ServerStats(server_url))
+            try:
+                manager = self.connection_pools[pool_url]
+            except KeyError:
+                manager = ldappool.ConnectionManager(
+                    server_url,
+                    size=pool_size,
+                    retry_max=pool_retry_max,
+                    retry_delay=pool_retry_delay,
+                    timeout=pool_conn_timeout,
+                    connector_cls=_counting_connector(self.Connector, stats),
+                    use_tls=use_tls,
+                    max_lifetime=pool_conn_lifetime)
+                self.connection_pools[pool_url] = manager
+            servers.append((manager, stats))
+        self.conn_pool = ServerPool(servers, pool_eject_failures or 0,
+                                    pool_eject_time or 0)
+
+    @classmethod
+    def get_statistics(cls):
+        """Return the statistics of every pooled server, by pool URL."""
+        return dict((pool_url, stats.as_dict())
+                    for pool_url, stats in list(cls.server_stats.items()))
 
     def set_option(self, option, invalue):
         self.conn_options[option] = invalue
@@ -743,6 +996,19 @@ class PooledLDAPHandler(LDAPHandler):
     def _get_pool_connection(self):
         return self.conn_pool.connection(self.who, self.cred)
 
+    @contextlib.contextmanager
+    def pinned_connection(self):
+        if self._pinned_conn is not None:
+            yield
+            return
+        with self._get_pool_connection() as conn:
+            self._apply_options(conn)
+            self._pinned_conn = conn
+            try:
+                yield
+            finally:
+                self._pinned_conn = None
+
     def simple_bind_s(self, who='', cred='',
                       serverctrls=None, clientctrls=None):
         # Not using use_conn_pool decorator here as this API takes cred as
@@ -780,9 +1046,18 @@ class PooledLDAPHandler(LDAPHandler):
         connection is needed which originally provided the ``msgid``. So, this
         method wraps the existing connection and ``msgid`` in a new ``MsgId``
         instance. The connection associated with ``search_ext`` is released
-        once last hard reference to the ``MsgId`` instance is freed.
+        once last hard reference to the ``MsgId`` instance is freed, unless
+        it is the connection pinned by ``pinned_connection()``.
 
         """
+        if self._pinned_conn is not None:
+            conn = self._pinned_conn
+            msgid = conn.search_ext(base, scope,
+                                    filterstr, attrlist, attrsonly,
+                                    serverctrls, clientctrls,
+                                    timeout, sizelimit)
+            return MsgId((conn, msgid))
+
         conn_ctxt = self._get_pool_connection()
         conn = conn_ctxt.__enter__()
         try:
@@ -794,8 +1069,9 @@ class PooledLDAPHandler(LDAPHandler):
             conn_ctxt.__exit__(*sys.exc_info())
             raise
         res = MsgId((conn, msgid))
-        weakref.ref(res, functools.partial(conn_ctxt.__exit__,
-                                           None, None, None))
+        # The weak reference must itself be kept for its callback to run.
+        res.release = weakref.ref(res, functools.partial(conn_ctxt.__exit__,
+                                                         None, None, None))
         return res
 
     def result3(self, msgid, all=1, timeout=None,
@@ -819,6 +1095,10 @@ class PooledLDAPHandler(LDAPHandler):
         conn, msg_id = msgid
         return conn.result3(msg_id, all, timeout)
 
+    def abandon(self, msgid):
+        conn, msg_id = msgid
+        return conn.abandon(msg_id)
+
     @use_conn_pool
     def modify_s(self, conn, dn, modlist):
         return conn.modify_s(dn, modlist)
@@ -875,7 +1155,8 @@ class KeystoneLDAPHandler(LDAPHandler):
                 tls_req_cert='demand', chase_referrals=None, debug_level=None,
                 use_pool=None, pool_size=None,
                 pool_retry_max=None, pool_retry_delay=None,
-                pool_conn_timeout=None, pool_conn_lifetime=None):
+                pool_conn_timeout=None, pool_conn_lifetime=None,
+                pool_eject_failures=None, pool_eject_time=None):
         self.page_size = page_size
         return self.conn.connect(url, page_size, alias_dereferencing,
                                  use_tls, tls_cacertfile, tls_cacertdir,
@@ -886,7 +1167,9 @@ class KeystoneLDAPHandler(LDAPHandler):
                                  pool_retry_max=pool_retry_max,
                                  pool_retry_delay=pool_retry_delay,
                                  pool_conn_timeout=pool_conn_timeout,
-                                 pool_conn_lifetime=pool_conn_lifetime)
+                                 pool_conn_lifetime=pool_conn_lifetime,
+                                 pool_eject_failures=pool_eject_failures,
+                                 pool_eject_time=pool_eject_time)
 
     def set_option(self, option, invalue):
         return self.conn.set_option(option, invalue)
@@ -894,6 +1177,9 @@ class KeystoneLDAPHandler(LDAPHandler):
     def get_option(self, option):
         return self.conn.get_option(option)
 
+    def pinned_connection(self):
+        return self.conn.pinned_connection()
+
     def simple_bind_s(self, who='', cred='',
                       serverctrls=None, clientctrls=None):
         LOG.debug("LDAP bind: who=%s", who)
@@ -966,8 +1252,45 @@ class KeystoneLDAPHandler(LDAPHandler):
                                     serverctrls, clientctrls,
                                     timeout, sizelimit)
 
+    def search_iter(self, base, scope,
+                    filterstr='(objectClass=*)', attrlist=None):
+        """Search, yielding the entries found as each page arrives.
+
+        Unlike ``search_s()``, the entries of a paged search are never all
+        held in memory at once. Without paging this is the same as
+        ``search_s()``.
+
+        """
+        if not self.page_size:
+            for entry in self.search_s(base, scope, filterstr, attrlist):
+                yield entry
+            return
+
+        LOG.debug('LDAP paged search: base=%s scope=%s filterstr=%s '
+                  'attrs=%s', base, scope, filterstr, attrlist)
+        pages = self._paged_search_pages(base, scope, filterstr, attrlist)
+        try:
+            for page in pages:
+                for entry in convert_ldap_result(page):
+                    yield entry
+        finally:
+            pages.close()
+
     def _paged_search_s(self, base, scope, filterstr, attrlist=None):
         res = []
+        for page in self._paged_search_pages(base, scope,
+                                             filterstr, attrlist):
+            res.extend(page)
+        return res
+
+    def _paged_search_pages(self, base, scope, filterstr, attrlist=None):
+        """Yield the pages of a paged search as they arrive.
+
+        The next page is requested as soon as the cookie for it has arrived,
+        before the current page is yielded, so that the server is already
+        sending the next page while the caller processes the current one.
+
+        """
         use_old_paging_api = False
         # The API for the simple paged results control changed between
         # python-ldap 2.3 and 2.4.  We need to detect the capabilities
@@ -993,45 +1316,60 @@ class KeystoneLDAPHandler(LDAPHandler):
         else:
             attrlist = [attr for attr in attrlist if attr is not None]
             attrlist_utf8 = list(map(utf8_encode, attrlist))
-        msgid = self.conn.search_ext(base_utf8,
-                                     scope,
-                                     filterstr_utf8,
-                                     attrlist_utf8,
-                                     serverctrls=[lc])
-        # Endless loop request pages on ldap server until it has no data
-        while True:
-            # Request to the ldap server a page with 'page_size' entries
-            rtype, rdata, rmsgid, serverctrls = self.conn.result3(msgid)
-            # Receive the data
-            res.extend(rdata)
-            pctrls = [c for c in serverctrls
-                      if c.controlType == page_ctrl_oid]
-            if pctrls:
-                # LDAP server supports pagination
-                if use_old_paging_api:
-                    est, cookie = pctrls[0].controlValue
-                    lc.controlValue = (self.page_size, cookie)
-                else:
-                    cookie = lc.cookie = pctrls[0].cookie
-
-                if cookie:
-                    # There is more data still on the server
-                    # so we request another page
-                    msgid = self.conn.search_ext(base_utf8,
-                                                 scope,
-                                                 filterstr_utf8,
-                                                 attrlist_utf8,
-                                                 serverctrls=[lc])
-                else:
-                    # Exit condition no more data on server
-                    break
-            else:
-                LOG.warning(_LW('LDAP Server does not support paging. '
-                                'Disable paging in keystone.conf to '
-                                'avoid this message.'))
-                self._disable_paging()
-                break
-        return res
+        # Every page is requested from the server that issued the cookie.
+        with self.conn.pinned_connection():
+            msgid = self.conn.search_ext(base_utf8,
+                                         scope,
+                                         filterstr_utf8,
+                                         attrlist_utf8,
+                                         serverctrls=[lc])
+            try:
+                # Loop requesting pages from the ldap server until it has no
+                # data
+                while msgid is not None:
+                    # Request to the ldap server a page with 'page_size'
+                    # entries
+                    rtype, rdata, rmsgid, serverctrls = (
+                        self.conn.result3(msgid))
+                    msgid = None
+                    pctrls = [c for c in serverctrls
+                              if c.controlType == page_ctrl_oid]
+                    if pctrls:
+                        # LDAP server supports pagination
+                        if use_old_paging_api:
+                            est, cookie = pctrls[0].controlValue
+                            lc.controlValue = (self.page_size, cookie)
+                        else:
+                            cookie = lc.cookie = pctrls[0].cookie
+
+                        if cookie:
+                            # There is more data still on the server
+                            # so we request another page
+                            msgid = self.conn.search_ext(base_utf8,
+                                                         scope,
+                                                         filterstr_utf8,
+                                                         attrlist_utf8,
+                                                         serverctrls=[lc])
+                    else:
+                        LOG.warning(_LW('LDAP Server does not support paging. '
+                                        'Disable paging in keystone.conf to '
+                                        'avoid this message.'))
+                        self._disable_paging()
+                    # Hand over the data received
+                    yield rdata
+            finally:
+                if msgid is not None:
+                    # The caller stopped before the last page, or the
+                    # search failed: do not leave the request for the next
+                    # page running on the connection.
+                    self._abandon(msgid)
+
+    def _abandon(self, msgid):
+        try:
+            self.conn.abandon(msgid)
+        except ldap.LDAPError as e:
+            LOG.debug('Failed to abandon LDAP search %(msgid)s: %(error)s',
+                      {'msgid': msgid, 'error': e})
 
     def result3(self, msgid=ldap.RES_ANY, all=1, timeout=None,
                 resp_ctrl_classes=None):
@@ -1044,6 +1382,10 @@ class KeystoneLDAPHandler(LDAPHandler):
         py_result = convert_ldap_result(ldap_result)
         return py_result
 
+    def abandon(self, msgid):
+        LOG.debug('LDAP abandon: msgid=%s', msgid)
+        return self.conn.abandon(msgid)
+
     def modify_s(self, dn, modlist):
         ldap_modlist = [
             (op, kind, (None if values is None
@@ -1111,6 +1453,130 @@ def filter_entity(entity_ref):
     return entity_ref
 
 
+NOT_CACHED = object()
+
+
+class EntryCache(object):
+    """An in-process read-through cache of directory entries.
+
+    Entries are held by DN, each expiring ``ttl`` seconds after it was last
+    read. Lookups, such as a search for an object by ID or for the groups a
+    user is a member of, are held as the DNs of the entries they found and
+    are only answered from the cache while all of those entries are, so
+    dropping an entry invalidates every lookup that found it. Lookups that
+    found nothing expire after ``negative_ttl`` seconds.
+
+    The number of cache hits and misses are exposed as ``hits`` and
+    ``misses``.
+
+    """
+
+    def __init__(self, ttl, negative_ttl, max_entries):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._lookups = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the result cached for a lookup.
+
+        :returns: an entry, or a list of entries for a lookup cached with
+                  ``many``, None for a lookup that found no entry, or
+                  NOT_CACHED.
+
+        """
+        now = time.time()
+        with self._lock:
+            lookup = self._lookups.get(key)
+            if lookup is not None and lookup[0] > now:
+                _expires, dns, many = lookup
+                entries = []
+                for dn in dns:
+                    entry = self._entries.get(dn)
+                    if entry is None or entry[0] <= now:
+                        break
+                    entries.append(entry[1])
+                else:
+                    self.hits += 1
+                    if many:
+                        return copy.deepcopy(entries)
+                    return copy.deepcopy(entries[0]) if entries else None
+            self._lookups.pop(key, None)
+            self.misses += 1
+            return NOT_CACHED
+
+    def set(self, key, result, many=False):
+        """Cache the result of a lookup.
+
+        :param result: an entry or None, or a list of entries if ``many``.
+
+        """
+        if many:
+            entries = result
+        else:
+            entries = [] if result is None else [result]
+        ttl = self.ttl if entries else self.negative_ttl
+        if ttl <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            for dn, attrs in entries:
+                self._entries.pop(dn, None)
+                self._entries[dn] = (now + self.ttl,
+                                     copy.deepcopy((dn, attrs)))
+            self._lookups.pop(key, None)
+            self._lookups[key] = (now + ttl,
+                                  tuple(dn for dn, _attrs in entries),
+                                  many)
+            for items in (self._entries, self._lookups):
+                while len(items) > self.max_entries:
+                    items.popitem(last=False)
+
+    def invalidate(self, dns=None):
+        """Drop the given entries, or everything if no DNs are given.
+
+        Any change may make an entry match a lookup it did not match before,
+        so the lookups that found nothing and those cached with ``many`` are
+        dropped along with the entries.
+
+        """
+        with self._lock:
+            if dns is None:
+                self._entries.clear()
+                self._lookups.clear()
+                return
+            for dn in dns:
+                self._entries.pop(dn, None)
+            for key, (_expires, found, many) in list(self._lookups.items()):
+                if many or not found:
+                    del self._lookups[key]
+
+
+def _change_filter_value(attribute, timestamp):
+    """Format a time for an ordering match on a change attribute."""
+    value = time.strftime('%Y%m%d%H%M%S', time.gmtime(timestamp))
+    if attribute == 'entryCSN':
+        # A CSN is the GeneralizedTime with microseconds followed by the
+        # change count, server ID and modification number.
+        return value + '.000000Z#000000#000#000000'
+    return value + 'Z'
+
+
+def _clears_entry_cache(func):
+    """Clear the entry cache once the decorated write has been attempted."""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            self._clear_entry_cache()
+    return wrapper
+
+
 class BaseLdap(object):
     DEFAULT_OU = None
     DEFAULT_STRUCTURAL_CLASSES = None
@@ -1150,6 +1616,8 @@ class BaseLdap(object):
         self.pool_retry_delay = conf.ldap.pool_retry_delay
         self.pool_conn_timeout = conf.ldap.pool_connection_timeout
         self.pool_conn_lifetime = conf.ldap.pool_connection_lifetime
+        self.pool_eject_failures = conf.ldap.pool_eject_failures
+        self.pool_eject_time = conf.ldap.pool_eject_time
 
         # End user authentication pool specific config attributes
         self.use_auth_pool = self.use_pool and conf.ldap.use_auth_pool
@@ -1209,6 +1677,16 @@ class BaseLdap(object):
 
         self.subtree_delete_enabled = conf.ldap.allow_subtree_delete
 
+        self.entry_cache = None
+        if conf.ldap.entry_cache_ttl > 0:
+            self.entry_cache = EntryCache(conf.ldap.entry_cache_ttl,
+                                          conf.ldap.entry_cache_negative_ttl,
+                                          conf.ldap.entry_cache_size)
+        self.entry_cache_poll_interval = conf.ldap.entry_cache_poll_interval
+        self.entry_cache_change_attr = conf.ldap.entry_cache_change_attribute
+        self._last_cache_poll = None
+        self._next_cache_poll = 0
+
     def _not_found(self, object_id):
         if self.NotFound is None:
             return exception.NotFound(target=object_id)
@@ -1268,7 +1746,9 @@ class BaseLdap(object):
                      pool_retry_max=self.pool_retry_max,
                      pool_retry_delay=self.pool_retry_delay,
                      pool_conn_timeout=self.pool_conn_timeout,
-                     pool_conn_lifetime=pool_conn_lifetime
+                     pool_conn_lifetime=pool_conn_lifetime,
+                     pool_eject_failures=self.pool_eject_failures,
+                     pool_eject_time=self.pool_eject_time
                      )
 
         if user is None:
@@ -1400,6 +1880,47 @@ class BaseLdap(object):
                                          details=_('Duplicate ID, %s.') %
                                          values['id'])
 
+    def _clear_entry_cache(self):
+        if self.entry_cache is not None:
+            self.entry_cache.invalidate()
+
+    def _poll_entry_cache(self):
+        """Drop the cached entries changed since the last poll.
+
+        Successive searches overlap by one poll interval to allow for the
+        clocks of keystone and the directory differing.
+
+        """
+        if not self.entry_cache_poll_interval:
+            return
+        now = time.time()
+        if now < self._next_cache_poll:
+            return
+        since = self._last_cache_poll
+        self._last_cache_poll = now
+        self._next_cache_poll = now + self.entry_cache_poll_interval
+        if since is None:
+            return
+
+        query = u'(&(objectClass=%s)(%s>=%s))' % (
+            self.object_class,
+            self.entry_cache_change_attr,
+            _change_filter_value(self.entry_cache_change_attr,
+                                 since - self.entry_cache_poll_interval))
+        try:
+            with self.get_connection() as conn:
+                changed = conn.search_s(self.tree_dn, self.LDAP_SCOPE,
+                                        query, DN_ONLY)
+        except ldap.LDAPError as e:
+            LOG.warn(_LW('Unable to search for changed %(name)s entries, '
+                         'clearing the entry cache: %(error)s'),
+                     {'name': self.options_name, 'error': e})
+            self.entry_cache.invalidate()
+            return
+        if changed:
+            self.entry_cache.invalidate([dn for dn, _attrs in changed])
+
+    @_clears_entry_cache
     def create(self, values):
         self.affirm_unique(values)
         object_classes = self.structural_classes + [self.object_class]
@@ -1428,6 +1949,17 @@ class BaseLdap(object):
         return values
 
     def _ldap_get(self, object_id, ldap_filter=None):
+        if self.entry_cache is None:
+            return self._ldap_search_by_id(object_id, ldap_filter)
+        self._poll_entry_cache()
+        key = ('get', object_id, ldap_filter)
+        res = self.entry_cache.get(key)
+        if res is NOT_CACHED:
+            res = self._ldap_search_by_id(object_id, ldap_filter)
+            self.entry_cache.set(key, res)
+        return res
+
+    def _ldap_search_by_id(self, object_id, ldap_filter=None):
         query = (u'(&(%(id_attr)s=%(id)s)'
                  u'%(filter)s'
                  u'(objectClass=%(object_class)s))'
@@ -1452,22 +1984,56 @@ class BaseLdap(object):
         except IndexError:
             return None
 
-    def _ldap_get_all(self, ldap_filter=None):
+    def _ldap_get_all(self, ldap_filter=None, conn=None):
+        """Yield the matching entries, a page at a time when paging.
+
+        The entries are searched for with ``conn`` if given, or else with
+        a new connection.
+
+        """
+        if conn is None:
+            with self.get_connection() as conn:
+                for entry in self._ldap_get_all(ldap_filter, conn):
+                    yield entry
+            return
+
         query = u'(&%s(objectClass=%s)(%s=*))' % (
             ldap_filter or self.ldap_filter or '',
             self.object_class,
             self.id_attr)
-        with self.get_connection() as conn:
-            try:
-                attrs = list(set(([self.id_attr] +
-                                  list(self.attribute_mapping.values()) +
-                                  list(self.extra_attr_mapping.keys()))))
-                return conn.search_s(self.tree_dn,
-                                     self.LDAP_SCOPE,
-                                     query,
-                                     attrs)
-            except ldap.NO_SUCH_OBJECT:
-                return []
+        try:
+            attrs = list(set(([self.id_attr] +
+                              list(self.attribute_mapping.values()) +
+                              list(self.extra_attr_mapping.keys()))))
+            for entry in conn.search_iter(self.tree_dn,
+                                          self.LDAP_SCOPE,
+                                          query,
+                                          attrs):
+                yield entry
+        except ldap.NO_SUCH_OBJECT:
+            return
+
+    def _ldap_get_all_cached(self, ldap_filter):
+        """Return the matching entries, read through the entry cache.
+
+        The entries are also cached as the results of looking each of them
+        up by ID, so that for example the groups of a user are prefetched
+        by listing them. ``ldap_filter`` must therefore include the
+        configured filter, ``self.ldap_filter``.
+
+        """
+        if self.entry_cache is None:
+            return list(self._ldap_get_all(ldap_filter))
+        self._poll_entry_cache()
+        key = ('all', ldap_filter)
+        entries = self.entry_cache.get(key)
+        if entries is NOT_CACHED:
+            entries = list(self._ldap_get_all(ldap_filter))
+            self.entry_cache.set(key, entries, many=True)
+            for entry in entries:
+                object_id = self._ldap_res_to_model(entry)['id']
+                self.entry_cache.set(('get', object_id, None), entry)
+        return entries
 
     def _ldap_get_list(self, search_base, scope, query_params=None,
                        attrlist=None):
@@ -1495,15 +2061,52 @@ class BaseLdap(object):
         query = (u'(%s=%s)' % (self.attribute_mapping['name'],
                                ldap.filter.escape_filter_chars(
                                    six.text_type(name))))
-        res = self.get_all(query)
+        refs = self.iter_all(query)
         try:
-            return res[0]
-        except IndexError:
-            raise self._not_found(name)
+            for ref in refs:
+                return ref
+        finally:
+            # Stop the search rather than leave it running.
+            refs.close()
+        raise self._not_found(name)
+
+    def iter_all(self, ldap_filter=None):
+        """Yield the matching objects as their entries are received."""
+        for x in self._ldap_get_all(ldap_filter):
+            yield self._ldap_res_to_model(x)
 
     def get_all(self, ldap_filter=None):
-        return [self._ldap_res_to_model(x)
-                for x in self._ldap_get_all(ldap_filter)]
+        return list(self.iter_all(ldap_filter))
+
+    def _any_value_filter(self, attribute, values):
+        return u'(|%s)' % ''.join(
+            u'(%s=%s)' % (attribute,
+                          ldap.filter.escape_filter_chars(six.text_type(v)))
+            for v in set(values))
+
+    def get_all_by_ids(self, object_ids):
+        """Get the objects with the given IDs in a single search.
+
+        IDs without a matching object are skipped.
+
+        """
+        if not object_ids:
+            return []
+        query = u'(&%s%s)' % (self.ldap_filter or '',
+                              self._any_value_filter(self.id_attr,
+                                                     object_ids))
+        return self.get_all(query)
+
+    def get_all_by_names(self, names):
+        """Get the objects with the given names in a single search.
+
+        Names without a matching object are skipped.
+
+        """
+        if not names:
+            return []
+        return self.get_all(
+            self._any_value_filter(self.attribute_mapping['name'], names))
 
     def update(self, object_id, values, old_obj=None):
         if old_obj is None:
@@ -1555,9 +2158,12 @@ class BaseLdap(object):
                     conn.modify_s(self._id_to_dn(object_id), modlist)
                 except ldap.NO_SUCH_OBJECT:
                     raise self._not_found(object_id)
+                finally:
+                    self._clear_entry_cache()
 
         return self.get(object_id)
 
+    @_clears_entry_cache
     def delete(self, object_id):
         with self.get_connection() as conn:
             try:
@@ -1565,6 +2171,7 @@ class BaseLdap(object):
             except ldap.NO_SUCH_OBJECT:
                 raise self._not_found(object_id)
 
+    @_clears_entry_cache
     def deleteTree(self, object_id):
         tree_delete_control = ldap.controls.LDAPControl(CONTROL_TREEDELETE,
                                                         0,
@@ -1602,6 +2209,7 @@ class BaseLdap(object):
                 else:
                     LOG.debug('No entries in LDAP subtree %s', dn)
 
+    @_clears_entry_cache
     def add_member(self, member_dn, member_list_dn):
         """Add member to the member list.
 
@@ -1625,6 +2233,7 @@ class BaseLdap(object):
             except ldap.NO_SUCH_OBJECT:
                 raise self._not_found(member_list_dn)
 
+    @_clears_entry_cache
     def remove_member(self, member_dn, member_list_dn):
         """Remove member from the member list.
 
@@ -1642,6 +2251,7 @@ class BaseLdap(object):
             except ldap.NO_SUCH_OBJECT:
                 raise self._not_found(member_list_dn)
 
+    @_clears_entry_cache
     def _delete_tree_nodes(self, search_base, scope, query_params=None):
         query = u'(objectClass=%s)' % self.object_class
         if query_params:
@@ -1863,19 +2473,20 @@ class EnabledEmuMixIn(BaseLdap):
                 ref['enabled'] = self._get_enabled(object_id, conn)
             return ref
 
-    def get_all(self, ldap_filter=None):
+    def iter_all(self, ldap_filter=None):
         if 'enabled' not in self.attribute_ignore and self.enabled_emulation:
-            # had to copy BaseLdap.get_all here to ldap_filter by DN
-            tenant_list = [self._ldap_res_to_model(x)
-                           for x in self._ldap_get_all(ldap_filter)
-                           if x[0] != self.enabled_emulation_dn]
+            # had to copy BaseLdap.iter_all here to ldap_filter by DN
             with self.get_connection() as conn:
-                for tenant_ref in tenant_list:
+                for x in self._ldap_get_all(ldap_filter, conn):
+                    if x[0] == self.enabled_emulation_dn:
+                        continue
+                    tenant_ref = self._ldap_res_to_model(x)
                     tenant_ref['enabled'] = self._get_enabled(
                         tenant_ref['id'], conn)
-            return tenant_list
+                    yield tenant_ref
         else:
-            return super(EnabledEmuMixIn, self).get_all(ldap_filter)
+            for ref in super(EnabledEmuMixIn, self).iter_all(ldap_filter):
+                yield ref
 
     def update(self, object_id, values, old_obj=None):
         if 'enabled' not in self.attribute_ignore and self.enabled_emulation:
@@ -0,0 +1,366 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Password hashing and verification in a pool of worker processes.
+
+Hashing a password takes tens of milliseconds of CPU time, during which an
+eventlet server cannot run any other green thread. When ``[identity]
+password_hash_workers`` is set, passwords are hashed and verified by that
+many worker processes instead, and the requesting thread waits for the
+result without blocking the others.
+
+At most ``[identity] password_hash_queue_size`` requests wait for a worker,
+and each waits at most ``[identity] password_hash_timeout`` seconds for its
+answer. Requests beyond the queue size, and requests whose worker fails or
+times out, are rejected as ServiceUnavailable rather than hashed by the
+requesting thread, which would block every other request.
+
+Successful verifications of a user's password can also be remembered for
+``[identity] verified_password_cache_ttl`` seconds, so that users such as
+services that authenticate many times a minute skip the hash.
+
+"""
+
+import collections
+import hashlib
+import hmac
+import itertools
+import multiprocessing
+import os
+import select
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+import six
+from six.moves import queue
+
+from keystone.common import utils
+from keystone import exception
+from keystone.i18n import _LW
+
+
+CONF = cfg.CONF
+LOG = log.getLogger(__name__)
+
+
+def _worker(conn):
+    """Run the functions received over a pipe until it is closed."""
+    while True:
+        try:
+            sequence, func, args = conn.recv()
+        except EOFError:
+            return
+        started = time.time()
+        try:
+            result = func(*args)
+        except Exception:
+            # The caller runs the function again to raise the error itself.
+            conn.send((sequence, False, None, 0))
+        else:
+            conn.send((sequence, True, result, time.time() - started))
+
+
+class HashingPool(object):
+    """A pool of worker processes hashing and verifying passwords.
+
+    The number of requests, of requests rejected or failed, and the time
+    requests waited for a worker and took to hash are exposed by
+    ``get_statistics()``.
+
+    """
+
+    def __init__(self, workers, queue_size, timeout):
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._processes = {}
+        self._idle = queue.Queue()
+        for i in range(workers):
+            self._idle.put(self._start_worker())
+
+        self._waiting = 0
+        self.requests = 0
+        self.inline = 0
+        self.rejected = 0
+        self.failed = 0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+        self.total_hash_time = 0.0
+
+    def _start_worker(self):
+        conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_worker, args=(child_conn,))
+        process.daemon = True
+        process.start()
+        child_conn.close()
+        self._processes[conn] = process
+        return conn
+
+    def _replace_worker(self, conn):
+        LOG.warning(_LW('Password hashing worker %d failed, replacing it.'),
+                    self._processes[conn].pid)
+        self._processes.pop(conn).terminate()
+        conn.close()
+        return self._start_worker()
+
+    def _call(self, conn, func, args):
+        """Send a request to a worker and return its answer.
+
+        Returns None if the worker did not answer this request within the
+        timeout.
+
+        """
+        sequence = next(self._sequence)
+        conn.send((sequence, func, args))
+        # Wait with select, which yields to other green threads under
+        # eventlet, rather than blocking in recv().
+        readable, _, _ = select.select([conn.fileno()], [], [], self.timeout)
+        if not readable:
+            return None
+        answer = conn.recv()
+        if answer[0] != sequence:
+            return None
+        return answer[1:]
+
+    def run(self, func, *args):
+        """Return ``func(*args)``, as run by a worker process.
+
+        :raises: exception.ServiceUnavailable if ``queue_size`` requests are
+                 already waiting for a worker, or if the worker fails or
+                 does not answer within ``timeout`` seconds.
+
+        """
+        with self._lock:
+            self.requests += 1
+            if self._waiting >= self.queue_size:
+                self.rejected += 1
+                raise exception.ServiceUnavailable()
+            self._waiting += 1
+
+        queued = time.time()
+        try:
+            conn = self._idle.get()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        answer = None
+        try:
+            answer = self._call(conn, func, args)
+        except (EOFError, IOError, OSError):
+            pass
+        finally:
+            # Unless its answer was read, including when the waiting thread
+            # is killed, the worker may still answer into the pipe, where
+            # the next request would read it, so it is replaced.
+            if answer is None:
+                conn = self._replace_worker(conn)
+            self._idle.put(conn)
+
+        if answer is None:
+            with self._lock:
+                self.failed += 1
+            raise exception.ServiceUnavailable()
+
+        succeeded, result, hash_time = answer
+        if not succeeded:
+            # Invalid input is rejected before any hashing, so the error is
+            # cheap to raise again here.
+            with self._lock:
+                self.inline += 1
+            return func(*args)
+
+        queue_wait = time.time() - queued - hash_time
+        with self._lock:
+            self.total_queue_wait += queue_wait
+            self.max_queue_wait = max(self.max_queue_wait, queue_wait)
+            self.total_hash_time += hash_time
+        return result
+
+    def get_statistics(self):
+        with self._lock:
+            pooled = max(self.requests - self.inline - self.rejected -
+                         self.failed, 1)
+            return {'workers': len(self._processes),
+                    'waiting': self._waiting,
+                    'requests': self.requests,
+                    'inline': self.inline,
+                    'rejected': self.rejected,
+                    'failed': self.failed,
+                    'queue_wait': self.total_queue_wait / pooled,
+                    'max_queue_wait': self.max_queue_wait,
+                    'hash_time': self.total_hash_time / pooled}
+
+    def close(self):
+        for conn, process in list(self._processes.items()):
+            process.terminate()
+            conn.close()
+        self._processes.clear()
+
+
+def _utf8(value):
+    if isinstance(value, six.text_type):
+        return value.encode('utf-8')
+    return value
+
+
+class VerifiedPasswordCache(object):
+    """A short-lived cache of successful password verifications.
+
+    A verification is remembered as the user ID and an HMAC of the password
+    and the hash it was verified against, made with a key generated by each
+    process, so neither the password nor anything that could be attacked
+    offline to find it is kept. A changed password has a different hash,
+    so it never matches a verification of the old one.
+
+    Verifications expire ``ttl`` seconds after they were made, however often
+    they are used, and at most ``max_size`` of them are kept.
+
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._key = os.urandom(32)
+        self._lock = threading.Lock()
+        self._verified = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _cache_key(self, user_id, password, hashed):
+        digest = hmac.new(self._key,
+                          b'\0'.join([_utf8(password), _utf8(hashed)]),
+                          hashlib.sha256).digest()
+        return (user_id, digest)
+
+    def is_verified(self, user_id, password, hashed):
+        """Whether the password was recently verified against the hash."""
+        key = self._cache_key(user_id, password, hashed)
+        with self._lock:
+            expires = self._verified.get(key)
+            if expires is not None and expires > time.time():
+                self.hits += 1
+                return True
+            self._verified.pop(key, None)
+            self.misses += 1
+            return False
+
+    def add(self, user_id, password, hashed):
+        key = self._cache_key(user_id, password, hashed)
+        with self._lock:
+            self._verified.pop(key, None)
+            self._verified[key] = time.time() + self.ttl
+            while len(self._verified) > self.max_size:
+                self._verified.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._verified.clear()
+
+
+_POOL = None
+_POOL_PID = None
+_POOL_LOCK = threading.Lock()
+
+_VERIFIED = None
+
+
+def get_pool():
+    """Return this process's hashing pool, or None if it is disabled.
+
+    The pool is started on first use, so that each server worker process
+    starts its own.
+
+    """
+    global _POOL, _POOL_PID
+
+    if CONF.identity.password_hash_workers <= 0:
+        return None
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_PID != os.getpid():
+            _POOL = HashingPool(CONF.identity.password_hash_workers,
+                                CONF.identity.password_hash_queue_size,
+                                CONF.identity.password_hash_timeout)
+            _POOL_PID = os.getpid()
+        return _POOL
+
+
+def get_verified_password_cache():
+    """Return the verified password cache, or None if it is disabled."""
+    global _VERIFIED
+
+    if CONF.identity.verified_password_cache_ttl <= 0:
+        return None
+    with _POOL_LOCK:
+        if _VERIFIED is None:
+            _VERIFIED = VerifiedPasswordCache(
+                CONF.identity.verified_password_cache_ttl,
+                CONF.identity.verified_password_cache_size)
+        return _VERIFIED
+
+
+def reset():
+    global _POOL, _VERIFIED
+
+    with _POOL_LOCK:
+        if _POOL is not None and _POOL_PID == os.getpid():
+            _POOL.close()
+        _POOL = None
+        _VERIFIED = None
+
+
+def _run(func, *args):
+    pool = get_pool()
+    if pool is None:
+        return func(*args)
+    return pool.run(func, *args)
+
+
+def hash_password(password):
+    """Hash a password, as ``utils.hash_password`` does."""
+    return _run(utils.hash_password, password)
+
+
+def check_password(password, hashed):
+    """Check a password against a hash, as ``utils.check_password`` does."""
+    if password is None or hashed is None:
+        return False
+    return _run(utils.check_password, password, hashed)
+
+
+def check_user_password(user_id, password, hashed):
+    """Check a user's password, through the verified password cache."""
+    if password is None or hashed is None:
+        return False
+    cache = get_verified_password_cache()
+    if not isinstance(password, six.string_types):
+        # Leave invalid passwords to be rejected by check_password().
+        cache = None
+    if cache is not None and cache.is_verified(user_id, password, hashed):
+        return True
+    if not check_password(password, hashed):
+        return False
+    if cache is not None:
+        cache.add(user_id, password, hashed)
+    return True
+
+
+def hash_user_password(user):
+    """Hash a user dict's password without modifying the passed-in dict."""
+    password = user.get('password')
+    if password is None:
+        return user
+
+    return dict(user, password=hash_password(password))
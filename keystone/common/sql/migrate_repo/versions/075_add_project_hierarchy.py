@@ -0,0 +1,64 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import sqlalchemy as sql
+
+
+_PROJECT_TABLE_NAME = 'project'
+_PROJECT_HIERARCHY_TABLE_NAME = 'project_hierarchy'
+
+
+def _closure_rows(parents):
+    """Yield (ancestor, descendant, depth) rows for every project.
+
+    Projects whose ancestry contains a circular reference or a missing
+    parent are left out; the resource backend walks parent_id for those.
+
+    """
+    for project_id in parents:
+        ancestors = [project_id]
+        parent_id = parents[project_id]
+        while parent_id is not None:
+            if parent_id in ancestors or parent_id not in parents:
+                break
+            ancestors.append(parent_id)
+            parent_id = parents[parent_id]
+        else:
+            for depth, ancestor_id in enumerate(ancestors):
+                yield {'ancestor_id': ancestor_id,
+                       'descendant_id': project_id,
+                       'depth': depth}
+
+
+def upgrade(migrate_engine):
+    meta = sql.MetaData()
+    meta.bind = migrate_engine
+
+    project_hierarchy_table = sql.Table(
+        _PROJECT_HIERARCHY_TABLE_NAME,
+        meta,
+        sql.Column('ancestor_id', sql.String(64), primary_key=True),
+        sql.Column('descendant_id', sql.String(64), primary_key=True),
+        sql.Column('depth', sql.Integer, nullable=False),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8')
+    project_hierarchy_table.create(migrate_engine, checkfirst=True)
+    sql.Index('ix_project_hierarchy_descendant_id',
+              project_hierarchy_table.c.descendant_id).create()
+
+    project_table = sql.Table(_PROJECT_TABLE_NAME, meta, autoload=True)
+    query = sql.select([project_table.c.id, project_table.c.parent_id])
+    parents = dict((row.id, row.parent_id)
+                   for row in migrate_engine.execute(query))
+    rows = list(_closure_rows(parents))
+    if rows:
+        migrate_engine.execute(project_hierarchy_table.insert(), rows)
@@ -28,7 +28,8 @@ from oslo_log import log
 from oslo_serialization import jsonutils
 from oslo_utils import strutils
 from oslo_utils import timeutils
-import passlib.hash
+import passlib.context
+import passlib.registry
 import six
 from six import moves
 
@@ -126,11 +127,45 @@ def hash_user_password(user):
     return dict(user, password=hash_password(password))
 
 
+# The schemes passwords may be hashed with, see
+# [identity] password_hash_algorithm.
+PASSWORD_HASH_SCHEMES = ('sha512_crypt', 'bcrypt', 'scrypt', 'pbkdf2_sha512')
+
+_CRYPT_CONTEXTS = {}
+
+
+def _get_crypt_context():
+    """Return the passlib context for the configured hashing scheme.
+
+    The context hashes with the configured scheme and cost, verifies hashes
+    made with any of the known schemes, and reports any other hash as
+    needing to be rehashed.
+
+    """
+    scheme = CONF.identity.password_hash_algorithm
+    rounds = CONF.identity.password_hash_rounds
+    if rounds is None and scheme == 'sha512_crypt':
+        rounds = CONF.crypt_strength
+
+    context = _CRYPT_CONTEXTS.get((scheme, rounds))
+    if context is None:
+        available = passlib.registry.list_crypt_handlers()
+        schemes = [scheme] + [s for s in PASSWORD_HASH_SCHEMES
+                              if s != scheme and s in available]
+        settings = {}
+        if rounds is not None:
+            for setting in ('default_rounds', 'min_rounds', 'max_rounds'):
+                settings['%s__%s' % (scheme, setting)] = rounds
+        context = passlib.context.CryptContext(
+            schemes=schemes, default=scheme, deprecated='auto', **settings)
+        _CRYPT_CONTEXTS[(scheme, rounds)] = context
+    return context
+
+
 def hash_password(password):
     """Hash a password. Hard."""
     password_utf8 = verify_length_and_trunc_password(password).encode('utf-8')
-    return passlib.hash.sha512_crypt.encrypt(
-        password_utf8, rounds=CONF.crypt_strength)
+    return _get_crypt_context().hash(password_utf8)
 
 
 def check_password(password, hashed):
@@ -143,7 +178,19 @@ def check_password(password, hashed):
     if password is None or hashed is None:
         return False
     password_utf8 = verify_length_and_trunc_password(password).encode('utf-8')
-    return passlib.hash.sha512_crypt.verify(password_utf8, hashed)
+    return _get_crypt_context().verify(password_utf8, hashed)
+
+
+def password_needs_rehash(hashed):
+    """Whether a hash was not made with the configured scheme and cost.
+
+    Hashes not made by any of the known schemes are left alone.
+
+    """
+    try:
+        return _get_crypt_context().needs_update(hashed)
+    except ValueError:
+        return False
 
 
 def attr_as_boolean(val_attr):
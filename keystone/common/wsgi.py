@@ -62,7 +62,8 @@ def validate_token_bind(context, token_ref):
     if bind_mode == 'disabled':
         return
 
-    if not isinstance(token_ref, token_model.KeystoneToken):
+    if not isinstance(token_ref, (token_model.KeystoneToken,
+                                  token_model.KeystoneTokenView)):
         raise exception.UnexpectedError(_('token reference must be a '
                                           'KeystoneToken type, got: %s') %
                                         type(token_ref))
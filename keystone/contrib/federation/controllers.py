@@ -337,7 +337,8 @@ class Auth(auth_controllers.Auth):
         sp_url = service_provider.get('sp_url')
 
         token_id = auth['identity']['token']['id']
-        token_data = self.token_provider_api.validate_token(token_id)
+        token_data = authorization.validate_token(
+            self.token_provider_api, context.get('environment'), token_id)
         token_ref = token_model.KeystoneToken(token_id, token_data)
 
         if not token_ref.project_scoped:
@@ -56,6 +56,8 @@ class Manager(manager.Manager):
 
     def __init__(self):
         super(Manager, self).__init__(CONF.federation.driver)
+        # Compiled rules of each mapping, keyed by mapping ID
+        self._rule_processors = {}
 
     def get_enabled_service_providers(self):
         """List enabled service providers for Service Catalog
@@ -83,10 +85,31 @@ class Manager(manager.Manager):
         service_providers = self.driver.get_enabled_service_providers()
         return [normalize(sp) for sp in service_providers]
 
+    def update_mapping(self, mapping_id, mapping_ref):
+        mapping = self.driver.update_mapping(mapping_id, mapping_ref)
+        self._rule_processors.pop(mapping_id, None)
+        return mapping
+
+    def delete_mapping(self, mapping_id):
+        self.driver.delete_mapping(mapping_id)
+        self._rule_processors.pop(mapping_id, None)
+
+    def _get_rule_processor(self, mapping):
+        """Return a processor for the rules of a mapping.
+
+        Processors are kept per mapping and only recompiled when the rules
+        change, including changes made through other processes.
+
+        """
+        rule_processor = self._rule_processors.get(mapping['id'])
+        if rule_processor is None or rule_processor.rules != mapping['rules']:
+            rule_processor = utils.RuleProcessor(mapping['rules'])
+            self._rule_processors[mapping['id']] = rule_processor
+        return rule_processor
+
     def evaluate(self, idp_id, protocol_id, assertion_data):
         mapping = self.get_mapping_from_idp_and_protocol(idp_id, protocol_id)
-        rules = mapping['rules']
-        rule_processor = utils.RuleProcessor(rules)
+        rule_processor = self._get_rule_processor(mapping)
         mapped_properties = rule_processor.process(assertion_data)
         return mapped_properties, mapping['id']
 
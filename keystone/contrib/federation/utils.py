@@ -13,6 +13,8 @@
 """Utilities for Federation Extension."""
 
 import ast
+import collections
+import functools
 import re
 
 import jsonschema
@@ -236,7 +238,8 @@ def validate_idp(idp, protocol, assertion):
         raise exception.Forbidden(msg)
 
 
-def validate_groups_in_backend(group_ids, mapping_id, identity_api):
+def validate_groups_in_backend(group_ids, mapping_id, identity_api,
+                               group_lookup=None):
     """Iterate over group ids and make sure they are present in the backend/
 
     This call is not transactional.
@@ -250,13 +253,16 @@ def validate_groups_in_backend(group_ids, mapping_id, identity_api):
                          backend
     :type identity_api: identity.Manager
 
+    :param group_lookup: lookups already made while handling this request
+    :type group_lookup: GroupLookup
+
     :raises: exception.MappedGroupNotFound
 
     """
+    group_lookup = group_lookup or GroupLookup(identity_api)
+    groups = group_lookup.get_groups(group_ids)
     for group_id in group_ids:
-        try:
-            identity_api.get_group(group_id)
-        except exception.GroupNotFound:
+        if group_id not in groups:
             raise exception.MappedGroupNotFound(
                 group_id=group_id, mapping_id=mapping_id)
 
@@ -283,10 +289,8 @@ def validate_groups(group_ids, mapping_id, identity_api):
     validate_groups_in_backend(group_ids, mapping_id, identity_api)
 
 
-# TODO(marek-denis): Optimize this function, so the number of calls to the
-# backend are minimized.
 def transform_to_group_ids(group_names, mapping_id,
-                           identity_api, resource_api):
+                           identity_api, resource_api, group_lookup=None):
     """Transform groups identitified by name/domain to their ids
 
     Function accepts list of groups identified by a name and domain giving
@@ -319,37 +323,106 @@ def transform_to_group_ids(group_names, mapping_id,
     :param identity_api: identity_api object
     :param resource_api: resource manager object
 
+    :param group_lookup: lookups already made while handling this request
+    :type group_lookup: GroupLookup
+
     :returns: generator object with group ids
 
     :raises: excepton.MappedGroupNotFound: in case asked group doesn't
         exist in the backend.
 
     """
+    group_lookup = group_lookup or GroupLookup(identity_api, resource_api)
 
-    def resolve_domain(domain):
-        """Return domain id.
-
-        Input is a dictionary with a domain identified either by a ``id`` or a
-        ``name``. In the latter case system will attempt to fetch domain object
-        from the backend.
-
-        :returns: domain's id
-        :rtype: str
-
-        """
-        domain_id = (domain.get('id') or
-                     resource_api.get_domain_by_name(
-                     domain.get('name')).get('id'))
-        return domain_id
+    # Resolve each domain once, then look up all of its groups together.
+    names_by_domain = collections.OrderedDict()
+    for group in group_names:
+        domain_id = group_lookup.get_domain_id(group['domain'])
+        names_by_domain.setdefault(domain_id, []).append(group['name'])
+    groups_by_domain = {
+        domain_id: group_lookup.get_groups_by_names(names, domain_id)
+        for domain_id, names in names_by_domain.items()}
 
     for group in group_names:
-        try:
-            group_dict = identity_api.get_group_by_name(
-                group['name'], resolve_domain(group['domain']))
-            yield group_dict['id']
-        except exception.GroupNotFound:
+        domain_id = group_lookup.get_domain_id(group['domain'])
+        group_dict = groups_by_domain[domain_id].get(group['name'])
+        if group_dict is None:
             LOG.debug('Skip mapping group %s; has no entry in the backend',
                       group['name'])
+        else:
+            yield group_dict['id']
+
+
+class GroupLookup(object):
+    """Bulk group and domain lookups, remembered for a single request.
+
+    Mapping a federated assertion may name hundreds of groups; looking them
+    up together, and only once, keeps the number of backend calls per
+    authentication down to a few.
+
+    """
+
+    def __init__(self, identity_api, resource_api=None):
+        self.identity_api = identity_api
+        self.resource_api = resource_api
+        self._domain_ids = {}
+        self._groups_by_id = {}
+        self._groups_by_name = {}
+
+    def get_domain_id(self, domain):
+        """Return the id of a domain identified by ``id`` or ``name``."""
+        if domain.get('id'):
+            return domain['id']
+        name = domain.get('name')
+        if name not in self._domain_ids:
+            self._domain_ids[name] = (
+                self.resource_api.get_domain_by_name(name).get('id'))
+        return self._domain_ids[name]
+
+    def get_groups(self, group_ids):
+        """Return a dict of the existing groups among ``group_ids``."""
+        missing = set(group_id for group_id in group_ids
+                      if group_id not in self._groups_by_id)
+        if missing:
+            groups = self.identity_api.list_groups_from_ids(list(missing))
+            self._groups_by_id.update(_match_groups(missing, groups, 'id'))
+        return {group_id: self._groups_by_id[group_id]
+                for group_id in group_ids
+                if self._groups_by_id[group_id] is not None}
+
+    def get_groups_by_names(self, group_names, domain_id):
+        """Return a dict of the existing groups of a domain, by name."""
+        missing = set(name for name in group_names
+                      if (domain_id, name) not in self._groups_by_name)
+        if missing:
+            groups = self.identity_api.list_groups_by_names(list(missing),
+                                                            domain_id)
+            for name, group in _match_groups(missing, groups,
+                                             'name').items():
+                self._groups_by_name[(domain_id, name)] = group
+            for group in groups:
+                self._groups_by_id.setdefault(group['id'], group)
+        return {name: self._groups_by_name[(domain_id, name)]
+                for name in group_names
+                if self._groups_by_name[(domain_id, name)] is not None}
+
+
+def _match_groups(requested, groups, key):
+    """Map each requested id or name to its group, or to None.
+
+    Backends such as LDAP match ids and names case-insensitively, so a
+    returned group that wasn't asked for exactly is matched
+    case-insensitively instead.
+
+    """
+    exact = {}
+    inexact = {}
+    for group in groups:
+        exact[group[key]] = group
+        if group[key] not in requested:
+            inexact.setdefault(group[key].lower(), group)
+    return {value: exact.get(value) or inexact.get(value.lower())
+            for value in requested}
 
 
 def get_assertion_params_from_env(context):
@@ -366,8 +439,73 @@ class UserType(object):
     LOCAL = 'local'
 
 
+def _compile_pattern(pattern):
+    """Return a search function for a regex requirement value."""
+    try:
+        return re.compile(pattern).search
+    except (re.error, TypeError):
+        # NOTE: Invalid patterns keep failing when the requirement is
+        # evaluated rather than when the mapping is compiled.
+        return functools.partial(re.search, pattern)
+
+
+class _Requirement(object):
+    """A remote requirement of a mapping rule, prepared for evaluation.
+
+    The values of ``any_one_of`` and ``not_any_of`` are held as compiled
+    regexes or a frozenset, and those of ``whitelist`` and ``blacklist`` as
+    frozensets.
+
+    """
+
+    def __init__(self, requirement):
+        self.type = requirement['type']
+        self.regex = bool(requirement.get('regex', False))
+
+        self.eval_type = None
+        self.values = None
+        for eval_type in (RuleProcessor._EvalType.ANY_ONE_OF,
+                          RuleProcessor._EvalType.NOT_ANY_OF):
+            values = requirement.get(eval_type)
+            if values is not None:
+                self.eval_type = eval_type
+                if self.regex:
+                    self.values = [_compile_pattern(v) for v in values]
+                else:
+                    self.values = frozenset(values)
+                break
+
+        self.blacklist = requirement.get(RuleProcessor._EvalType.BLACKLIST)
+        if self.blacklist is not None:
+            self.blacklist = frozenset(self.blacklist)
+        self.whitelist = requirement.get(RuleProcessor._EvalType.WHITELIST)
+        if self.whitelist is not None:
+            self.whitelist = frozenset(self.whitelist)
+
+
+class _Rule(object):
+    """A mapping rule with its remote requirements prepared for evaluation.
+
+    ``required_types`` holds the assertion attributes without which the rule
+    can never apply, i.e. those of its ``any_one_of`` and ``not_any_of``
+    requirements.
+
+    """
+
+    def __init__(self, rule):
+        self.local = rule['local']
+        self.requirements = [_Requirement(r) for r in rule['remote']]
+        self.required_types = frozenset(r.type for r in self.requirements
+                                        if r.eval_type is not None)
+
+
 class RuleProcessor(object):
-    """A class to process assertions and mapping rules."""
+    """A class to process assertions and mapping rules.
+
+    The rules are compiled once, so a processor can be kept around and used
+    for any number of assertions.
+
+    """
 
     class _EvalType(object):
         """Mapping rule evaluation types."""
@@ -388,6 +526,15 @@ class RuleProcessor(object):
         """
 
         self.rules = rules
+        self._rules = [_Rule(rule) for rule in rules]
+
+        # Index the rules by the assertion attributes they require, so that
+        # rules that cannot apply to an assertion are skipped up front.
+        self._rules_requiring = {}
+        for index, rule in enumerate(self._rules):
+            for requirement_type in rule.required_types:
+                self._rules_requiring.setdefault(
+                    requirement_type, set()).add(index)
 
     def process(self, assertion_data):
         """Transform assertion to a dictionary of user name and group ids
@@ -451,8 +598,16 @@ class RuleProcessor(object):
         identity_values = []
 
         LOG.debug('rules: %s', self.rules)
-        for rule in self.rules:
-            direct_maps = self._verify_all_requirements(rule['remote'],
+        skipped = set()
+        for requirement_type, indexes in self._rules_requiring.items():
+            if requirement_type not in assertion:
+                skipped.update(indexes)
+
+        for index, rule in enumerate(self._rules):
+            if index in skipped:
+                continue
+
+            direct_maps = self._verify_all_requirements(rule.requirements,
                                                         assertion)
 
             # If the compare comes back as None, then the rule did not apply
@@ -464,9 +619,9 @@ class RuleProcessor(object):
             # directly to the array of saved values. However, if there is
             # a direct mapping, then perform variable replacement.
             if not direct_maps:
-                identity_values += rule['local']
+                identity_values += rule.local
             else:
-                for local in rule['local']:
+                for local in rule.local:
                     new_local = self._update_local_mapping(local, direct_maps)
                     identity_values.append(new_local)
 
@@ -626,10 +781,10 @@ class RuleProcessor(object):
         to blacklist or whitelist rules and finally return the values in
         order, to be directly mapped.
 
-        :param requirements: list of remote requirements from rules
-        :type requirements: list
+        :param requirements: compiled remote requirements of a rule
+        :type requirements: list of _Requirement
 
-        Example requirements::
+        Example of the requirements they are compiled from::
 
             [
                 {
@@ -671,27 +826,8 @@ class RuleProcessor(object):
         direct_maps = DirectMaps()
 
         for requirement in requirements:
-            requirement_type = requirement['type']
-            regex = requirement.get('regex', False)
-
-            any_one_values = requirement.get(self._EvalType.ANY_ONE_OF)
-            if any_one_values is not None:
-                if self._evaluate_requirement(any_one_values,
-                                              requirement_type,
-                                              self._EvalType.ANY_ONE_OF,
-                                              regex,
-                                              assertion):
-                    continue
-                else:
-                    return None
-
-            not_any_values = requirement.get(self._EvalType.NOT_ANY_OF)
-            if not_any_values is not None:
-                if self._evaluate_requirement(not_any_values,
-                                              requirement_type,
-                                              self._EvalType.NOT_ANY_OF,
-                                              regex,
-                                              assertion):
+            if requirement.eval_type is not None:
+                if self._evaluate_requirement(requirement, assertion):
                     continue
                 else:
                     return None
@@ -699,19 +835,16 @@ class RuleProcessor(object):
             # If 'any_one_of' or 'not_any_of' are not found, then values are
             # within 'type'. Attempt to find that 'type' within the assertion,
             # and filter these values if 'whitelist' or 'blacklist' is set.
-            direct_map_values = assertion.get(requirement_type)
+            direct_map_values = assertion.get(requirement.type)
             if direct_map_values:
-                blacklisted_values = requirement.get(self._EvalType.BLACKLIST)
-                whitelisted_values = requirement.get(self._EvalType.WHITELIST)
-
                 # If a blacklist or whitelist is used, we want to map to the
                 # whole list instead of just its values separately.
-                if blacklisted_values is not None:
+                if requirement.blacklist is not None:
                     direct_map_values = [v for v in direct_map_values
-                                         if v not in blacklisted_values]
-                elif whitelisted_values is not None:
+                                         if v not in requirement.blacklist]
+                elif requirement.whitelist is not None:
                     direct_map_values = [v for v in direct_map_values
-                                         if v in whitelisted_values]
+                                         if v in requirement.whitelist]
 
                 direct_maps.add(direct_map_values)
 
@@ -720,14 +853,13 @@ class RuleProcessor(object):
         return direct_maps
 
     def _evaluate_values_by_regex(self, values, assertion_values):
-        for value in values:
+        for search in values:
             for assertion_value in assertion_values:
-                if re.search(value, assertion_value):
+                if search(assertion_value):
                     return True
         return False
 
-    def _evaluate_requirement(self, values, requirement_type,
-                              eval_type, regex, assertion):
+    def _evaluate_requirement(self, requirement, assertion):
         """Evaluate the incoming requirement and assertion.
 
         If the requirement type does not exist in the assertion data, then
@@ -735,14 +867,9 @@ class RuleProcessor(object):
         assertion values. Otherwise, grab the intersection of the values
         and use that to compare against the evaluation type.
 
-        :param values: list of allowed values, defined in the requirement
-        :type values: list
-        :param requirement_type: key to look for in the assertion
-        :type requirement_type: string
-        :param eval_type: determine how to evaluate requirements
-        :type eval_type: string
-        :param regex: perform evaluation with regex
-        :type regex: boolean
+        :param requirement: compiled ``any_one_of`` or ``not_any_of``
+                            requirement
+        :type requirement: _Requirement
         :param assertion: dict of attributes from the IdP
         :type assertion: dict
 
@@ -750,18 +877,19 @@ class RuleProcessor(object):
 
         """
 
-        assertion_values = assertion.get(requirement_type)
+        assertion_values = assertion.get(requirement.type)
         if not assertion_values:
             return False
 
-        if regex:
-            any_match = self._evaluate_values_by_regex(values,
+        if requirement.regex:
+            any_match = self._evaluate_values_by_regex(requirement.values,
                                                        assertion_values)
         else:
-            any_match = bool(set(values).intersection(set(assertion_values)))
-        if any_match and eval_type == self._EvalType.ANY_ONE_OF:
+            any_match = not requirement.values.isdisjoint(assertion_values)
+        if any_match and requirement.eval_type == self._EvalType.ANY_ONE_OF:
             return True
-        if not any_match and eval_type == self._EvalType.NOT_ANY_OF:
+        if (not any_match and
+                requirement.eval_type == self._EvalType.NOT_ANY_OF):
             return True
 
         return False
@@ -13,7 +13,9 @@
 """Main entry point into the Revoke service."""
 
 import abc
+import collections
 import datetime
+import threading
 
 from oslo_config import cfg
 from oslo_log import log
@@ -21,7 +23,6 @@ from oslo_log import versionutils
 from oslo_utils import timeutils
 import six
 
-from keystone.common import cache
 from keystone.common import dependency
 from keystone.common import extension
 from keystone.common import manager
@@ -54,8 +55,6 @@ EXTENSION_DATA = {
 extension.register_admin_extension(EXTENSION_DATA['alias'], EXTENSION_DATA)
 extension.register_public_extension(EXTENSION_DATA['alias'], EXTENSION_DATA)
 
-MEMOIZE = cache.get_memoization_decorator(section='revoke')
-
 
 def revoked_before_cutoff_time():
     expire_delta = datetime.timedelta(
@@ -81,6 +80,8 @@ class Manager(manager.Manager):
         super(Manager, self).__init__(CONF.revoke.driver)
         self._register_listeners()
         self.model = model
+        self._tree_lock = threading.Lock()
+        self._reset_revoke_tree()
 
     def _user_callback(self, service, resource_type, operation,
                        payload):
@@ -206,12 +207,88 @@ class Manager(manager.Manager):
     def revoke_by_domain_role_assignment(self, domain_id, role_id):
         self.revoke(model.RevokeEvent(domain_id=domain_id, role_id=role_id))
 
-    @MEMOIZE
+    def _reset_revoke_tree(self):
+        self._revoke_tree = model.RevokeTree()
+        # Events currently in the tree, ordered by revoked_at, so that pruned
+        # events can be popped off the front.
+        self._tree_events = collections.deque()
+        # Events in the tree indexed by their path, used to restore the leaf
+        # of any surviving event sharing a path with a pruned one.
+        self._tree_paths = {}
+        self._tree_event_keys = set()
+        self._last_fetch = None
+        self._last_rebuild = None
+        self._next_poll = None
+
+    @staticmethod
+    def _event_key(event):
+        return tuple(getattr(event, attr) for attr in model.REVOKE_KEYS)
+
+    def _add_tree_event(self, event):
+        key = self._event_key(event)
+        if key in self._tree_event_keys:
+            return
+        self._tree_event_keys.add(key)
+        self._revoke_tree.add_event(event)
+        self._tree_events.append(event)
+        self._tree_paths.setdefault(
+            tuple(model.attr_keys(event)), []).append(event)
+        if self._last_fetch is None or event.revoked_at > self._last_fetch:
+            self._last_fetch = event.revoked_at
+
+    def _prune_tree_events(self, oldest):
+        while self._tree_events and self._tree_events[0].revoked_at < oldest:
+            event = self._tree_events.popleft()
+            self._tree_event_keys.discard(self._event_key(event))
+            path = tuple(model.attr_keys(event))
+            siblings = self._tree_paths[path]
+            siblings.remove(event)
+            self._revoke_tree.remove_event(event)
+            if siblings:
+                # The leaf only records the latest issued_before for a path,
+                # so re-add the survivors in case it was just removed.
+                self._revoke_tree.add_events(siblings)
+            else:
+                del self._tree_paths[path]
+
     def _get_revoke_tree(self):
-        events = self.driver.list_events()
-        revoke_tree = model.RevokeTree(revoke_events=events)
+        """Return the per-process revocation tree, synchronized with the
+        backend.
+
+        The backend is polled at most every ``[revoke] poll_interval``
+        seconds, unless this process revoked something since. The tree is
+        maintained incrementally: only events revoked at most ``[revoke]
+        fetch_overlap`` seconds before the newest known event are read from
+        the driver and added, and events older than the revocation cutoff are
+        removed. The tree is rebuilt from scratch every ``[revoke]
+        cache_time`` seconds, or on every call when ``[revoke] caching`` is
+        disabled, as a safety net against events written with a ``revoked_at``
+        skewed by more than the overlap.
 
-        return revoke_tree
+        """
+        now = timeutils.utcnow()
+        with self._tree_lock:
+            if (not CONF.revoke.caching or self._last_rebuild is None or
+                    timeutils.delta_seconds(self._last_rebuild, now) >
+                    CONF.revoke.cache_time):
+                self._reset_revoke_tree()
+                self._last_rebuild = now
+                last_fetch = None
+            elif self._next_poll is not None and now < self._next_poll:
+                return self._revoke_tree
+            elif self._last_fetch is not None:
+                last_fetch = self._last_fetch - datetime.timedelta(
+                    seconds=CONF.revoke.fetch_overlap)
+            else:
+                last_fetch = None
+
+            for event in self.driver.list_events(last_fetch=last_fetch):
+                self._add_tree_event(event)
+            self._prune_tree_events(revoked_before_cutoff_time())
+            self._next_poll = now + datetime.timedelta(
+                seconds=CONF.revoke.poll_interval)
+
+            return self._revoke_tree
 
     def check_token(self, token_values):
         """Checks the values from a token against the revocation list
@@ -226,9 +303,26 @@ class Manager(manager.Manager):
         if self._get_revoke_tree().is_revoked(token_values):
             raise exception.TokenNotFound(_('Failed to validate token'))
 
+    def check_tokens(self, token_values_list):
+        """Checks the values from several tokens against the revocation list
+
+        All tokens are checked against the same snapshot of the revocation
+        tree, which is only synchronized with the backend once.
+
+        :param token_values_list: list of dictionaries of values from tokens,
+         as accepted by check_token
+
+        :returns: list of booleans, True for each token that is revoked
+
+        """
+        revoke_tree = self._get_revoke_tree()
+        return [revoke_tree.is_revoked(token_values)
+                for token_values in token_values_list]
+
     def revoke(self, event):
         self.driver.revoke(event)
-        self._get_revoke_tree.invalidate(self)
+        # Make the revocation take effect in this process right away.
+        self._next_poll = None
 
 
 @six.add_metaclass(abc.ABCMeta)
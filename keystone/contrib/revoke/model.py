@@ -58,6 +58,14 @@ ALTERNATIVES = {
 
 REVOKE_KEYS = _NAMES + _EVENT_ARGS
 
+# The levels walked by the compiled matcher: the event attribute name and the
+# token fields compared against it. ``None`` marks the role level, which is
+# matched against the list of roles in the token.
+_MATCH_LEVELS = tuple(
+    (name, None if name == 'role_id' else tuple(ALTERNATIVES.get(name,
+                                                                 [name])))
+    for name in _EVENT_NAMES)
+
 
 def blank_token_data(issued_at):
     token_data = dict()
@@ -131,12 +139,16 @@ class RevokeTree(object):
 
     The Tree is an index to quickly match tokens against events.
     Each node is a hashtable of key=value combinations from revocation events.
-    The
+
+    Alongside ``revoke_map`` the tree keeps a compiled index of the same
+    events, keyed directly by attribute values (``None`` for the wildcard),
+    which ``is_revoked`` walks iteratively without building any keys.
 
     """
 
     def __init__(self, revoke_events=None):
         self.revoke_map = dict()
+        self._index = dict()
         self.add_events(revoke_events)
 
     def add_event(self, event):
@@ -157,6 +169,11 @@ class RevokeTree(object):
         revoke_map['issued_before'] = max(
             event.issued_before, revoke_map.get(
                 'issued_before', event.issued_before))
+
+        index = self._index
+        for name in _EVENT_NAMES:
+            index = index.setdefault(getattr(event, name) or None, {})
+        index['issued_before'] = revoke_map['issued_before']
         return event
 
     def remove_event(self, event):
@@ -187,6 +204,22 @@ class RevokeTree(object):
             if not any(child):
                 del parent[key]
 
+        stack = []
+        index = self._index
+        for name in _EVENT_NAMES:
+            key = getattr(event, name) or None
+            nxt = index.get(key)
+            if nxt is None:
+                break
+            stack.append((index, key, nxt))
+            index = nxt
+        else:
+            if event.issued_before == index['issued_before']:
+                index.pop('issued_before')
+        for parent, key, child in reversed(stack):
+            if not child:
+                del parent[key]
+
     def add_events(self, revoke_events):
         return list(map(self.add_event, revoke_events or []))
 
@@ -251,8 +284,44 @@ class RevokeTree(object):
            'assignment_domain_id', 'trust_id', 'trustor_id', 'trustee_id'
            'consumer_id', 'access_token_id'
 
+        This walks the compiled index level by level, keeping the set of
+        nodes that still match the token; it gives the same answer as
+        searching ``revoke_map`` with ``_search``.
+
         """
-        return self._search(self.revoke_map, _EVENT_NAMES, token_data)
+        nodes = [self._index]
+        for name, alt_names in _MATCH_LEVELS:
+            next_nodes = []
+            values = None
+            for node in nodes:
+                subtree = node.get(None)
+                if subtree:
+                    next_nodes.append(subtree)
+                    if len(node) == 1:
+                        # Only the wildcard branch exists at this node.
+                        continue
+                if values is None:
+                    if alt_names is None:
+                        values = token_data.get('roles', [])
+                    else:
+                        values = [token_data[alt_name]
+                                  for alt_name in alt_names]
+                for value in values:
+                    if value is None:
+                        continue
+                    subtree = node.get(value)
+                    if subtree:
+                        next_nodes.append(subtree)
+            if not next_nodes:
+                return False
+            nodes = next_nodes
+
+        issued_at = token_data['issued_at']
+        for node in nodes:
+            issued_before = node.get('issued_before')
+            if issued_before is not None and issued_before > issued_at:
+                return True
+        return False
 
 
 def build_token_values_v2(access, default_domain_id):
@@ -17,6 +17,7 @@ import uuid
 
 from oslo_log import log
 
+from keystone.common import authorization
 from keystone.common import dependency
 from keystone.common import extension
 from keystone.common import wsgi
@@ -54,7 +55,8 @@ class UserController(identity.controllers.User):
         token_id = context.get('token_id')
         original_password = user.get('original_password')
 
-        token_data = self.token_provider_api.validate_token(token_id)
+        token_data = authorization.validate_token(
+            self.token_provider_api, context.get('environment'), token_id)
         token_ref = token_model.KeystoneToken(token_id=token_id,
                                               token_data=token_data)
 
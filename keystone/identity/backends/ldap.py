@@ -20,7 +20,6 @@ from oslo_log import log
 import six
 
 from keystone.common import clean
-from keystone.common import driver_hints
 from keystone.common import ldap as common_ldap
 from keystone.common import models
 from keystone import exception
@@ -134,6 +133,14 @@ class Identity(identity.Driver):
         # parameter left in so this matches the Driver specification
         return self.group.get_filtered_by_name(group_name)
 
+    def list_groups_from_ids(self, group_ids):
+        return self.group.get_all_filtered_by_ids(group_ids)
+
+    def list_groups_by_names(self, group_names, domain_id):
+        # domain_id will already have been handled in the Manager layer,
+        # parameter left in so this matches the Driver specification
+        return self.group.get_all_filtered_by_names(group_names)
+
     def update_group(self, group_id, group):
         self.group.check_allow_update()
         if 'name' in group:
@@ -176,14 +183,16 @@ class Identity(identity.Driver):
         return users
 
     def check_user_in_group(self, user_id, group_id):
-        user_refs = self.list_users_in_group(group_id, driver_hints.Hints())
-        for x in user_refs:
-            if x['id'] == user_id:
+        # NOTE: The membership is checked against the groups of the user,
+        # which are found with a single search and are cached along with
+        # the user when the entry cache is enabled, rather than by fetching
+        # every member of the group.
+        group_ref = self.group.get(group_id)
+        user_ref = self._get_user(user_id)
+        for x in self.group.list_user_groups(user_ref['dn']):
+            if x['id'] == group_ref['id']:
                 break
         else:
-            # Try to fetch the user to see if it even exists.  This
-            # will raise a more accurate exception.
-            self.get_user(user_id)
             raise exception.NotFound(_("User '%(user_id)s' not found in"
                                        " group '%(group_id)s'") %
                                      {'user_id': user_id,
@@ -265,7 +274,8 @@ class UserApi(common_ldap.EnabledEmuMixIn, common_ldap.BaseLdap):
 
     def get_all_filtered(self, hints):
         query = self.filter_query(hints)
-        return [self.filter_attributes(user) for user in self.get_all(query)]
+        return [self.filter_attributes(user)
+                for user in self.iter_all(query)]
 
     def filter_attributes(self, user):
         return identity.filter_user(common_ldap.filter_entity(user))
@@ -354,7 +364,8 @@ class GroupApi(common_ldap.BaseLdap):
         query = '(%s=%s)%s' % (self.member_attribute,
                                user_dn_esc,
                                self.ldap_filter or '')
-        return self.get_all(query)
+        return [self._ldap_res_to_model(x)
+                for x in self._ldap_get_all_cached(query)]
 
     def list_user_groups_filtered(self, user_dn, hints):
         """Return a filtered list of groups for which the user is a member."""
@@ -363,7 +374,9 @@ class GroupApi(common_ldap.BaseLdap):
         query = '(%s=%s)%s' % (self.member_attribute,
                                user_dn_esc,
                                self.ldap_filter or '')
-        return self.get_all_filtered(hints, query)
+        query = self.filter_query(hints, query)
+        return [common_ldap.filter_entity(self._ldap_res_to_model(x))
+                for x in self._ldap_get_all_cached(query)]
 
     def list_group_users(self, group_id):
         """Return a list of user dns which are members of a group."""
@@ -396,4 +409,12 @@ class GroupApi(common_ldap.BaseLdap):
     def get_all_filtered(self, hints, query=None):
         query = self.filter_query(hints, query)
         return [common_ldap.filter_entity(group)
-                for group in self.get_all(query)]
+                for group in self.iter_all(query)]
+
+    def get_all_filtered_by_ids(self, group_ids):
+        return [common_ldap.filter_entity(group)
+                for group in self.get_all_by_ids(group_ids)]
+
+    def get_all_filtered_by_names(self, group_names):
+        return [common_ldap.filter_entity(group)
+                for group in self.get_all_by_names(group_names)]
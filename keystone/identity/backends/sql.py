@@ -14,6 +14,7 @@
 
 from oslo_config import cfg
 
+from keystone.common import password_hashing
 from keystone.common import sql
 from keystone.common import utils
 from keystone import exception
@@ -31,7 +32,7 @@ class User(sql.ModelBase, sql.DictBase):
     id = sql.Column(sql.String(64), primary_key=True)
     name = sql.Column(sql.String(255), nullable=False)
     domain_id = sql.Column(sql.String(64), nullable=False)
-    password = sql.Column(sql.String(128))
+    password = sql.Column(sql.String(255))
     enabled = sql.Column(sql.Boolean)
     extra = sql.Column(sql.JsonBlob())
     default_project_id = sql.Column(sql.String(64))
@@ -92,7 +93,8 @@ class Identity(identity.Driver):
         https://blueprints.launchpad.net/keystone/+spec/sql-identiy-pam
 
         """
-        return utils.check_password(password, user_ref.password)
+        return password_hashing.check_user_password(user_ref.id, password,
+                                                    user_ref.password)
 
     # Identity interface
     def authenticate(self, user_id, password):
@@ -104,13 +106,29 @@ class Identity(identity.Driver):
             raise AssertionError(_('Invalid user / password'))
         if not self._check_password(password, user_ref):
             raise AssertionError(_('Invalid user / password'))
+        self._rehash_password(session, user_ref, password)
         return identity.filter_user(user_ref.to_dict())
 
+    def _rehash_password(self, session, user_ref, password):
+        """Rehash a verified password stored with an outdated scheme or cost.
+
+        The stored hash is only replaced if it has not changed since it was
+        verified, so that a concurrent password change is not overwritten.
+
+        """
+        if not utils.password_needs_rehash(user_ref.password):
+            return
+        hashed = password_hashing.hash_password(password)
+        with session.begin():
+            session.query(User).filter_by(
+                id=user_ref.id, password=user_ref.password).update(
+                    {'password': hashed}, synchronize_session=False)
+
     # user crud
 
     @sql.handle_conflicts(conflict_type='user')
     def create_user(self, user_id, user):
-        user = utils.hash_user_password(user)
+        user = password_hashing.hash_user_password(user)
         session = sql.get_session()
         with session.begin():
             user_ref = User.from_dict(user)
@@ -152,7 +170,7 @@ class Identity(identity.Driver):
         with session.begin():
             user_ref = self._get_user(session, user_id)
             old_user_dict = user_ref.to_dict()
-            user = utils.hash_user_password(user)
+            user = password_hashing.hash_user_password(user)
             for k in user:
                 old_user_dict[k] = user[k]
             new_user = User.from_dict(old_user_dict)
@@ -276,6 +294,23 @@ class Identity(identity.Driver):
             raise exception.GroupNotFound(group_id=group_name)
         return group_ref.to_dict()
 
+    def list_groups_from_ids(self, group_ids):
+        if not group_ids:
+            return []
+        session = sql.get_session()
+        query = session.query(Group)
+        query = query.filter(Group.id.in_(set(group_ids)))
+        return [ref.to_dict() for ref in query]
+
+    def list_groups_by_names(self, group_names, domain_id):
+        if not group_names:
+            return []
+        session = sql.get_session()
+        query = session.query(Group)
+        query = query.filter(Group.name.in_(set(group_names)))
+        query = query.filter_by(domain_id=domain_id)
+        return [ref.to_dict() for ref in query]
+
     @sql.handle_conflicts(conflict_type='group')
     def update_group(self, group_id, group):
         session = sql.get_session()
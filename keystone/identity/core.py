@@ -15,6 +15,7 @@
 """Main entry point into the Identity service."""
 
 import abc
+import collections
 import functools
 import os
 import uuid
@@ -892,6 +893,44 @@ class Manager(manager.Manager):
         return self._set_domain_id_and_mapping(
             ref, domain_id, driver, mapping.EntityType.GROUP)
 
+    @domains_configured
+    @exception_translated('group')
+    def list_groups_from_ids(self, group_ids):
+        """Get the groups with the given IDs, skipping any that don't exist.
+
+        The IDs are resolved with one driver call per backend rather than one
+        per group.
+
+        """
+        local_ids = collections.OrderedDict()
+        for group_id in group_ids:
+            try:
+                domain_id, driver, entity_id = (
+                    self._get_domain_driver_and_entity_id(group_id))
+            except exception.PublicIDNotFound:
+                continue
+            local_ids.setdefault((domain_id, driver), []).append(entity_id)
+
+        ref_list = []
+        for (domain_id, driver), entity_ids in local_ids.items():
+            refs = driver.list_groups_from_ids(entity_ids)
+            ref_list.extend(self._set_domain_id_and_mapping(
+                refs, domain_id, driver, mapping.EntityType.GROUP))
+        return ref_list
+
+    @domains_configured
+    @exception_translated('group')
+    def list_groups_by_names(self, group_names, domain_id):
+        """Get the groups of a domain with the given names.
+
+        Names without a matching group are skipped.
+
+        """
+        driver = self._select_identity_driver(domain_id)
+        ref_list = driver.list_groups_by_names(group_names, domain_id)
+        return self._set_domain_id_and_mapping(
+            ref_list, domain_id, driver, mapping.EntityType.GROUP)
+
     @domains_configured
     @exception_translated('group')
     def update_group(self, group_id, group, initiator=None):
@@ -940,6 +979,7 @@ class Manager(manager.Manager):
             user_entity_id, user_driver, group_entity_id, group_driver)
 
         group_driver.add_user_to_group(user_entity_id, group_entity_id)
+        self.emit_group_membership_changed(group_id)
 
     @domains_configured
     @exception_translated('group')
@@ -960,6 +1000,7 @@ class Manager(manager.Manager):
 
         group_driver.remove_user_from_group(user_entity_id, group_entity_id)
         self.emit_invalidate_user_token_persistence(user_id)
+        self.emit_group_membership_changed(group_id)
 
     @notifications.internal(notifications.INVALIDATE_USER_TOKEN_PERSISTENCE)
     def emit_invalidate_user_token_persistence(self, user_id):
@@ -973,6 +1014,15 @@ class Manager(manager.Manager):
         """
         pass
 
+    @notifications.internal(notifications.GROUP_MEMBERSHIP_CHANGED)
+    def emit_group_membership_changed(self, group_id):
+        """Emit a notification to the callback system on membership changes.
+
+        :param group_id: group identifier
+        :type group_id: string
+        """
+        pass
+
     @notifications.internal(
         notifications.INVALIDATE_USER_PROJECT_TOKEN_PERSISTENCE)
     def emit_invalidate_grant_token_persistence(self, user_project):
@@ -1258,6 +1308,41 @@ class Driver(object):
         """
         raise exception.NotImplemented()  # pragma: no cover
 
+    def list_groups_from_ids(self, group_ids):
+        """List the groups with the given IDs.
+
+        Drivers should override this to fetch the groups in one call; by
+        default each group is looked up in turn.
+
+        :returns: a list of group_refs, without the IDs that were not found
+
+        """
+        group_refs = []
+        for group_id in group_ids:
+            try:
+                group_refs.append(self.get_group(group_id))
+            except exception.GroupNotFound:
+                pass
+        return group_refs
+
+    def list_groups_by_names(self, group_names, domain_id):
+        """List the groups of a domain with the given names.
+
+        Drivers should override this to fetch the groups in one call; by
+        default each group is looked up in turn.
+
+        :returns: a list of group_refs, without the names that were not found
+
+        """
+        group_refs = []
+        for group_name in group_names:
+            try:
+                group_refs.append(self.get_group_by_name(group_name,
+                                                         domain_id))
+            except exception.GroupNotFound:
+                pass
+        return group_refs
+
     @abc.abstractmethod
     def update_group(self, group_id, group):
         """Updates an existing group.
@@ -183,9 +183,10 @@ class AuthContextMiddleware(wsgi.Middleware):
         context['environment'] = request.environ
 
         try:
-            token_ref = token_model.KeystoneToken(
+            token_ref = token_model.KeystoneTokenView(
                 token_id=token_id,
-                token_data=self.token_provider_api.validate_token(token_id))
+                token_data=authorization.validate_token(
+                    self.token_provider_api, request.environ, token_id))
             # TODO(gyee): validate_token_bind should really be its own
             # middleware
             wsgi.validate_token_bind(context, token_ref)
@@ -208,3 +209,12 @@ class AuthContextMiddleware(wsgi.Middleware):
         auth_context = self._build_auth_context(request)
         LOG.debug('RBAC: auth_context: %s', auth_context)
         request.environ[authorization.AUTH_CONTEXT_ENV] = auth_context
+
+    def process_response(self, request, response):
+        validations = request.environ.get(authorization.TOKEN_VALIDATIONS_ENV)
+        if validations:
+            LOG.debug('RBAC: %(count)d token validation(s) for %(method)s '
+                      '%(path)s', {'count': validations,
+                                   'method': request.method,
+                                   'path': request.path})
+        return response
@@ -12,6 +12,8 @@
 
 """Unified in-memory token model."""
 
+import functools
+
 from keystoneclient.common import cms
 from oslo_config import cfg
 from oslo_utils import timeutils
@@ -337,3 +339,87 @@ class KeystoneToken(dict):
         if self.version is V3:
             return self.get('methods', [])
         return []
+
+
+def _cached_property(fget):
+    """A property computed on first access and then kept in ``_cache``."""
+    name = fget.__name__
+
+    @functools.wraps(fget)
+    def get(self):
+        try:
+            return self._cache[name]
+        except KeyError:
+            value = self._cache[name] = fget(self)
+            return value
+
+    return property(get)
+
+
+class KeystoneTokenView(object):
+    """A read-only, lazily evaluated view of validated token data.
+
+    Provides the accessors of KeystoneToken, and read access to the token
+    body, without copying the token data: each accessor is computed on
+    first access and then kept. Neither the token data nor the values
+    returned may be modified while the view is in use.
+
+    """
+
+    __slots__ = ('token_id', 'token_data', 'version', '_body', '_cache')
+
+    def __init__(self, token_id, token_data):
+        self.token_data = token_data
+        if 'access' in token_data:
+            self._body = token_data['access']
+            self.version = V2
+        elif 'token' in token_data and 'methods' in token_data['token']:
+            self._body = token_data['token']
+            self.version = V3
+        else:
+            raise exception.UnsupportedTokenVersionException()
+        self.token_id = token_id
+        self._cache = {}
+
+        if self.project_scoped and self.domain_scoped:
+            raise exception.UnexpectedError(_('Found invalid token: scoped to '
+                                              'both project and domain.'))
+
+    __repr__ = KeystoneToken.__dict__['__repr__']
+
+    @_cached_property
+    def short_id(self):
+        return cms.cms_hash_token(self.token_id,
+                                  mode=CONF.token.hash_algorithm)
+
+    def __getitem__(self, key):
+        return self._body[key]
+
+    def __contains__(self, key):
+        return key in self._body
+
+    def __iter__(self):
+        return iter(self._body)
+
+    def __len__(self):
+        return len(self._body)
+
+    def get(self, key, default=None):
+        return self._body.get(key, default)
+
+    def keys(self):
+        return self._body.keys()
+
+    def values(self):
+        return self._body.values()
+
+    def items(self):
+        return self._body.items()
+
+
+# The accessors of KeystoneToken only read the token body through the
+# mapping interface, so the view shares them, kept after first access.
+for _name, _attribute in list(vars(KeystoneToken).items()):
+    if isinstance(_attribute, property):
+        setattr(KeystoneTokenView, _name, _cached_property(_attribute.fget))
+del _name, _attribute
@@ -91,6 +91,10 @@ INVALIDATE_USER_TOKEN_PERSISTENCE = 'invalidate_user_tokens'
 INVALIDATE_USER_PROJECT_TOKEN_PERSISTENCE = 'invalidate_user_project_tokens'
 INVALIDATE_USER_OAUTH_CONSUMER_TOKENS = 'invalidate_user_consumer_tokens'
 
+# NOTE: Internal notification sent when users are added to or removed from a
+# group, so that caches of group derived data can be refreshed
+GROUP_MEMBERSHIP_CHANGED = 'group_membership_changed'
+
 
 class Audit(object):
     """Namespace for audit notification functions.
@@ -15,9 +15,15 @@
 
 """Policy engine for keystone"""
 
+import ast
+import collections
+import re
+import threading
+
 from oslo_config import cfg
 from oslo_log import log
 from oslo_policy import policy as common_policy
+import six
 
 from keystone import exception
 from keystone import policy
@@ -27,18 +33,239 @@ CONF = cfg.CONF
 LOG = log.getLogger(__name__)
 
 
+# Matches the attributes a check interpolates from the target, e.g.
+# ``%(target.user.domain_id)s``.
+_TARGET_ATTRIBUTE = re.compile(r'%\(([^)]*)\)')
+
+
+class ActionDependencies(object):
+    """The credential and target attributes a policy decision depends on.
+
+    ``credentials`` and ``target`` are frozensets of attribute names, or
+    None when the rule uses a check, such as an http check, whose result
+    does not depend on the credentials and target alone.
+
+    """
+
+    def __init__(self, credentials, target):
+        self.credentials = credentials
+        self.target = target
+
+    @property
+    def cacheable(self):
+        return self.credentials is not None and self.target is not None
+
+    @property
+    def constant_for_roles(self):
+        """Whether the decision only depends on the caller's roles."""
+        return (self.cacheable and not self.target and
+                self.credentials <= frozenset(['roles']))
+
+    @classmethod
+    def merge(cls, dependencies):
+        credentials = frozenset()
+        target = frozenset()
+        for deps in dependencies:
+            if not deps.cacheable:
+                return _UNKNOWN_DEPENDENCIES
+            credentials |= deps.credentials
+            target |= deps.target
+        return cls(credentials, target)
+
+
+_NO_DEPENDENCIES = ActionDependencies(frozenset(), frozenset())
+_UNKNOWN_DEPENDENCIES = ActionDependencies(None, None)
+
+
+class CompiledRules(object):
+    """The attribute dependencies of each rule of a set of policy rules.
+
+    The rule tree of every rule is walked once, when the rules are compiled.
+    Actions without a rule of their own, which fall back to the default
+    rule, are compiled the first time they are looked up.
+
+    """
+
+    def __init__(self, rules):
+        self._rules = rules
+        self._dependencies = {}
+        for name in list(rules):
+            self.dependencies(name)
+
+    def dependencies(self, action):
+        """Return the ActionDependencies of the rule for an action."""
+        try:
+            return self._dependencies[action]
+        except KeyError:
+            pass
+        deps = self._compile_rule(action, set())
+        self._dependencies[action] = deps
+        return deps
+
+    def _compile_rule(self, name, in_progress):
+        if name in self._dependencies:
+            return self._dependencies[name]
+        if name in in_progress:
+            # A rule that refers back to itself adds nothing.
+            return _NO_DEPENDENCIES
+        try:
+            check = self._rules[name]
+        except KeyError:
+            # Missing rules fail the same way every time.
+            return _NO_DEPENDENCIES
+        in_progress.add(name)
+        deps = self._compile_check(check, in_progress)
+        in_progress.discard(name)
+        return deps
+
+    def _compile_check(self, check, in_progress):
+        if isinstance(check, (common_policy.AndCheck, common_policy.OrCheck)):
+            return ActionDependencies.merge(
+                self._compile_check(c, in_progress) for c in check.rules)
+        if isinstance(check, common_policy.NotCheck):
+            return self._compile_check(check.rule, in_progress)
+        if isinstance(check, common_policy.RuleCheck):
+            return self._compile_rule(check.match, in_progress)
+        if isinstance(check, (common_policy.TrueCheck,
+                              common_policy.FalseCheck)):
+            return _NO_DEPENDENCIES
+        if isinstance(check, common_policy.RoleCheck):
+            return ActionDependencies(frozenset(['roles']),
+                                      _target_attributes(check.match))
+        if isinstance(check, common_policy.GenericCheck):
+            try:
+                # The kind may be a literal rather than a credential.
+                ast.literal_eval(check.kind)
+                credentials = frozenset()
+            except (ValueError, SyntaxError):
+                credentials = frozenset([check.kind.split('.')[0]])
+            return ActionDependencies(credentials,
+                                      _target_attributes(check.match))
+        return _UNKNOWN_DEPENDENCIES
+
+
+def _target_attributes(match):
+    return frozenset(_TARGET_ATTRIBUTE.findall(match))
+
+
+class DecisionCache(object):
+    """A bounded LRU cache of policy decisions.
+
+    Decisions are keyed by the action and a fingerprint of the credential and
+    target attributes its rule reads. The cache holds at most
+    ``[policy] decision_cache_size`` decisions and is disabled when that is 0.
+    It is cleared whenever the policy rules change, such as when the policy
+    file is reloaded.
+
+    The number of cache hits and misses are exposed as ``hits`` and
+    ``misses``.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._decisions = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return CONF.policy.decision_cache_size > 0
+
+    def get(self, key):
+        """Return the cached decision for a key, or None."""
+        with self._lock:
+            try:
+                result = self._decisions.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            # Re-insert the decision to mark it as the most recently used.
+            self._decisions[key] = result
+            self.hits += 1
+            return result
+
+    def set(self, key, result):
+        with self._lock:
+            self._decisions.pop(key, None)
+            self._decisions[key] = result
+            while len(self._decisions) > CONF.policy.decision_cache_size:
+                self._decisions.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._decisions.clear()
+
+
+def _fingerprint(value):
+    """Return a hashable equivalent of a credentials or target value.
+
+    :raises: TypeError if the value cannot be fingerprinted.
+
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((k, _fingerprint(v))
+                            for k, v in six.iteritems(value)))
+    if isinstance(value, (list, tuple)):
+        return tuple(_fingerprint(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_fingerprint(v) for v in value)
+    hash(value)
+    return value
+
+
+def _fingerprint_attributes(values, names):
+    return tuple((name, name in values, _fingerprint(values.get(name)))
+                 for name in sorted(names))
+
+
+class _Enforcer(common_policy.Enforcer):
+    """An Enforcer that compiles its rules and clears cached decisions.
+
+    The rules are compiled and the decision cache cleared whenever the rules
+    change.
+
+    """
+
+    _compiled = None
+
+    @property
+    def compiled(self):
+        if self._compiled is None:
+            self._compiled = CompiledRules(self.rules)
+        return self._compiled
+
+    def set_rules(self, rules, overwrite=True, use_conf=False):
+        # NOTE: Rules from a policy directory are merged in on every load,
+        # so only changed rules invalidate the compiled rules and the cached
+        # decisions.
+        if overwrite or any(str(self.rules.get(name)) != str(rule)
+                            for name, rule in six.iteritems(rules)):
+            self._compiled = None
+            _DECISIONS.clear()
+        super(_Enforcer, self).set_rules(rules, overwrite=overwrite,
+                                         use_conf=use_conf)
+
+    def clear(self):
+        self._compiled = None
+        _DECISIONS.clear()
+        super(_Enforcer, self).clear()
+
+
 _ENFORCER = None
+_DECISIONS = DecisionCache()
 
 
 def reset():
     global _ENFORCER
     _ENFORCER = None
+    _DECISIONS.clear()
 
 
 def init():
     global _ENFORCER
     if not _ENFORCER:
-        _ENFORCER = common_policy.Enforcer(CONF)
+        _ENFORCER = _Enforcer(CONF)
 
 
 def enforce(credentials, action, target, do_raise=True):
@@ -60,6 +287,9 @@ def enforce(credentials, action, target, do_raise=True):
     """
     init()
 
+    if _DECISIONS.enabled:
+        return _cached_enforce(credentials, action, target, do_raise)
+
     # Add the exception arguments if asked to do a raise
     extra = {}
     if do_raise:
@@ -69,6 +299,46 @@ def enforce(credentials, action, target, do_raise=True):
     return _ENFORCER.enforce(action, target, credentials, **extra)
 
 
+def _cached_enforce(credentials, action, target, do_raise):
+    # Pick up any change to the policy file first, so that decisions made
+    # with the old rules are cleared before the cache is consulted.
+    _ENFORCER.load_rules()
+
+    key = None
+    dependencies = _ENFORCER.compiled.dependencies(action)
+    if dependencies.cacheable:
+        try:
+            key = (action,
+                   _fingerprint_attributes(credentials,
+                                           dependencies.credentials),
+                   _fingerprint_attributes(target, dependencies.target))
+        except TypeError:
+            pass
+
+    result = None
+    if key is not None:
+        result = _DECISIONS.get(key)
+    if result is None:
+        result = _ENFORCER.enforce(action, target, credentials)
+        if key is not None:
+            _DECISIONS.set(key, result)
+
+    if do_raise and not result:
+        raise exception.ForbiddenAction(action=action)
+    return result
+
+
+def get_dependencies(action):
+    """Return the attributes the policy decision for an action depends on.
+
+    :returns: an ActionDependencies
+
+    """
+    init()
+    _ENFORCER.load_rules()
+    return _ENFORCER.compiled.dependencies(action)
+
+
 class Policy(policy.Driver):
     def enforce(self, credentials, action, target):
         LOG.debug('enforce %(action)s: %(credentials)s', {
@@ -76,6 +346,9 @@ class Policy(policy.Driver):
             'credentials': credentials})
         enforce(credentials, action, target)
 
+    def get_target_attributes(self, action):
+        return get_dependencies(action).target
+
     def create_policy(self, policy_id, policy):
         raise exception.NotImplemented()
 
@@ -96,6 +96,16 @@ class Driver(object):
         """
         raise exception.NotImplemented()  # pragma: no cover
 
+    def get_target_attributes(self, action):
+        """Return the target attributes the rule for an action reads.
+
+        :returns: a set of flattened target attribute names, such as
+                  ``target.user.domain_id``, or None if the attributes read
+                  cannot be determined
+
+        """
+        return None
+
     @abc.abstractmethod
     def create_policy(self, policy_id, policy):
         """Store a policy blob.
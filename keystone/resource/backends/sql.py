@@ -12,6 +12,7 @@
 
 from oslo_config import cfg
 from oslo_log import log
+import sqlalchemy
 
 from keystone.common import clean
 from keystone.common import sql
@@ -89,46 +90,117 @@ class Resource(keystone_resource.Driver):
         project_refs = query.all()
         return [project_ref.to_dict() for project_ref in project_refs]
 
-    def list_projects_in_subtree(self, project_id):
-        with sql.transaction() as session:
-            children = self._get_children(session, [project_id])
-            subtree = []
-            examined = set([project_id])
-            while children:
-                children_ids = set()
-                for ref in children:
-                    if ref['id'] in examined:
-                        msg = _LE('Circular reference or a repeated '
-                                  'entry found in projects hierarchy - '
-                                  '%(project_id)s.')
-                        LOG.error(msg, {'project_id': ref['id']})
-                        return
-                    children_ids.add(ref['id'])
-
-                examined.update(children_ids)
-                subtree += children
-                children = self._get_children(session, children_ids)
-            return subtree
-
-    def list_project_parents(self, project_id):
-        with sql.transaction() as session:
-            project = self._get_project(session, project_id).to_dict()
-            parents = []
-            examined = set()
-            while project.get('parent_id') is not None:
-                if project['id'] in examined:
+    def _walk_projects_in_subtree(self, session, project_id):
+        children = self._get_children(session, [project_id])
+        subtree = []
+        examined = set([project_id])
+        while children:
+            children_ids = set()
+            for ref in children:
+                if ref['id'] in examined:
                     msg = _LE('Circular reference or a repeated '
                               'entry found in projects hierarchy - '
                               '%(project_id)s.')
-                    LOG.error(msg, {'project_id': project['id']})
+                    LOG.error(msg, {'project_id': ref['id']})
                     return
+                children_ids.add(ref['id'])
+
+            examined.update(children_ids)
+            subtree += children
+            children = self._get_children(session, children_ids)
+        return subtree
+
+    def list_projects_in_subtree(self, project_id):
+        with sql.transaction() as session:
+            query = session.query(ProjectHierarchy.depth, Project)
+            query = query.join(
+                Project, Project.id == ProjectHierarchy.descendant_id)
+            query = query.filter(ProjectHierarchy.ancestor_id == project_id)
+            rows = query.order_by(ProjectHierarchy.depth).all()
+            if not rows:
+                # NOTE: Projects missing from the hierarchy index (for
+                # instance ones caught in a circular reference) are resolved
+                # by walking parent_id instead.
+                return self._walk_projects_in_subtree(session, project_id)
+            return [project_ref.to_dict() for depth, project_ref in rows
+                    if depth > 0]
+
+    def _walk_project_parents(self, session, project_id):
+        project = self._get_project(session, project_id).to_dict()
+        parents = []
+        examined = set()
+        while project.get('parent_id') is not None:
+            if project['id'] in examined:
+                msg = _LE('Circular reference or a repeated '
+                          'entry found in projects hierarchy - '
+                          '%(project_id)s.')
+                LOG.error(msg, {'project_id': project['id']})
+                return
+
+            examined.add(project['id'])
+            parent_project = self._get_project(
+                session, project['parent_id']).to_dict()
+            parents.append(parent_project)
+            project = parent_project
+        return parents
 
-                examined.add(project['id'])
-                parent_project = self._get_project(
-                    session, project['parent_id']).to_dict()
-                parents.append(parent_project)
-                project = parent_project
-            return parents
+    def list_project_parents(self, project_id):
+        with sql.transaction() as session:
+            query = session.query(ProjectHierarchy.depth, Project)
+            query = query.join(
+                Project, Project.id == ProjectHierarchy.ancestor_id)
+            query = query.filter(ProjectHierarchy.descendant_id == project_id)
+            rows = query.order_by(ProjectHierarchy.depth).all()
+            if not rows:
+                return self._walk_project_parents(session, project_id)
+            return [project_ref.to_dict() for depth, project_ref in rows
+                    if depth > 0]
+
+    def _index_project(self, session, project_id, parent_id):
+        """Add a project to the hierarchy index below its parent.
+
+        A project whose parent is not indexed is left out of the index as
+        well, so that its ancestry is always complete when present.
+
+        """
+        rows = [ProjectHierarchy(ancestor_id=project_id,
+                                 descendant_id=project_id, depth=0)]
+        if parent_id is not None:
+            query = session.query(ProjectHierarchy)
+            parent_rows = query.filter_by(descendant_id=parent_id).all()
+            if not parent_rows:
+                return False
+            rows.extend(ProjectHierarchy(ancestor_id=ref.ancestor_id,
+                                         descendant_id=project_id,
+                                         depth=ref.depth + 1)
+                        for ref in parent_rows)
+        session.add_all(rows)
+        return True
+
+    def _reindex_subtree(self, session, project_id):
+        """Rebuild the hierarchy index of a project that changed parent."""
+        query = session.query(ProjectHierarchy.descendant_id)
+        query = query.filter_by(ancestor_id=project_id)
+        subtree_ids = set(ref.descendant_id for ref in query)
+        subtree_ids.add(project_id)
+        query = session.query(ProjectHierarchy)
+        query = query.filter(ProjectHierarchy.descendant_id.in_(subtree_ids))
+        query.delete(synchronize_session=False)
+        session.flush()
+
+        subtree = self._walk_projects_in_subtree(session, project_id)
+        if subtree is None:
+            # The walk already logged the circular reference, leave the
+            # affected projects out of the index.
+            return
+        project_ref = self._get_project(session, project_id)
+        if not self._index_project(session, project_id,
+                                   project_ref.parent_id):
+            return
+        session.flush()
+        for ref in subtree:
+            self._index_project(session, ref['id'], ref['parent_id'])
+            session.flush()
 
     def is_leaf_project(self, project_id):
         with sql.transaction() as session:
@@ -142,6 +214,7 @@ class Resource(keystone_resource.Driver):
         with sql.transaction() as session:
             tenant_ref = Project.from_dict(tenant)
             session.add(tenant_ref)
+            self._index_project(session, tenant_ref.id, tenant_ref.parent_id)
             return tenant_ref.to_dict()
 
     @sql.handle_conflicts(conflict_type='project')
@@ -151,6 +224,7 @@ class Resource(keystone_resource.Driver):
 
         with sql.transaction() as session:
             tenant_ref = self._get_project(session, tenant_id)
+            old_parent_id = tenant_ref.parent_id
             old_project_dict = tenant_ref.to_dict()
             for k in tenant:
                 old_project_dict[k] = tenant[k]
@@ -159,12 +233,20 @@ class Resource(keystone_resource.Driver):
                 if attr != 'id':
                     setattr(tenant_ref, attr, getattr(new_project, attr))
             tenant_ref.extra = new_project.extra
+            if tenant_ref.parent_id != old_parent_id:
+                session.flush()
+                self._reindex_subtree(session, tenant_id)
             return tenant_ref.to_dict(include_extra_dict=True)
 
     @sql.handle_conflicts(conflict_type='project')
     def delete_project(self, tenant_id):
         with sql.transaction() as session:
             tenant_ref = self._get_project(session, tenant_id)
+            query = session.query(ProjectHierarchy)
+            query = query.filter(sqlalchemy.or_(
+                ProjectHierarchy.ancestor_id == tenant_id,
+                ProjectHierarchy.descendant_id == tenant_id))
+            query.delete(synchronize_session=False)
             session.delete(tenant_ref)
 
     # domain crud
@@ -258,3 +340,22 @@ class Project(sql.ModelBase, sql.DictBase):
     # Unique constraint across two columns to create the separation
     # rather than just only 'name' being unique
     __table_args__ = (sql.UniqueConstraint('domain_id', 'name'), {})
+
+
+class ProjectHierarchy(sql.ModelBase, sql.ModelDictMixin):
+    """Closure table of the project hierarchy.
+
+    Holds a row for every (ancestor, descendant) pair, including each project
+    paired with itself at depth 0, so that parents and subtrees are read with
+    a single indexed query.
+
+    """
+
+    __tablename__ = 'project_hierarchy'
+    attributes = ['ancestor_id', 'descendant_id', 'depth']
+    ancestor_id = sql.Column(sql.String(64), primary_key=True)
+    descendant_id = sql.Column(sql.String(64), primary_key=True)
+    depth = sql.Column(sql.Integer, nullable=False)
+    __table_args__ = (
+        sql.Index('ix_project_hierarchy_descendant_id', 'descendant_id'),
+        {})
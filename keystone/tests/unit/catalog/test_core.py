@@ -10,6 +10,7 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import mock
 from oslo_config import cfg
 
 from keystone.catalog import core
@@ -86,3 +87,33 @@ class FormatUrlTests(unit.BaseTestCase):
                   'user_id': 'B'}
         self.assertIsNone(core.format_url(url_template, values,
                           silent_keyerror_failures=['tenant_id']))
+
+    def test_url_template_records_keys(self):
+        url_template = ('http://$(public_bind_host)s:$(admin_port)d/'
+                        '$(tenant_id)s/$(user_id)s')
+        template = core._get_url_template(url_template)
+        self.assertEqual(['public_bind_host', 'admin_port', 'tenant_id',
+                          'user_id'], template.keys)
+        self.assertIs(template, core._get_url_template(url_template))
+
+    def test_allowed_keyerror_does_not_raise(self):
+        url_template = 'http://server/$(tenant_id)s'
+        with mock.patch.object(core.utils, 'WhiteListedItemFilter') as filt:
+            self.assertIsNone(core.format_url(
+                url_template, {}, silent_keyerror_failures=['tenant_id']))
+        # The URL is not formatted with the '%' operator.
+        self.assertFalse(filt.called)
+
+    def test_raises_malformed_on_wrong_type_before_allowed_keyerror(self):
+        # Substitutions are made from left to right, so an error before the
+        # missing key is still raised.
+        self.assertRaises(exception.MalformedEndpoint,
+                          core.format_url,
+                          'http://$(public_bind_host)d/$(tenant_id)s',
+                          {'public_bind_host': 'something'},
+                          silent_keyerror_failures=['tenant_id'])
+
+    def test_formatting_escaped_percent(self):
+        self.assertEqual('http://server/100%',
+                         core.format_url('http://$(public_bind_host)s/100%%',
+                                         {'public_bind_host': 'server'}))
@@ -24,6 +24,7 @@ from testtools import matchers
 from keystone.common import driver_hints
 from keystone.common import ldap as ks_ldap
 from keystone.common.ldap import core as common_ldap_core
+from keystone import exception
 from keystone.tests import unit as tests
 from keystone.tests.unit import default_fixtures
 from keystone.tests.unit import fakeldap
@@ -389,6 +390,207 @@ class LDAPPagedResultsTest(tests.TestCase):
                              ldap.SCOPE_SUBTREE,
                              'objectclass=*')
 
+    @mock.patch.object(fakeldap.FakeLdap, 'search_ext')
+    @mock.patch.object(fakeldap.FakeLdap, 'result3')
+    def test_paged_search_iter_pipelines_pages(self, mock_result3,
+                                               mock_search_ext):
+        page_ctrl_oid = ldap.controls.SimplePagedResultsControl.controlType
+
+        def page(dn, cookie):
+            ctrl = mock.Mock(controlType=page_ctrl_oid, cookie=cookie,
+                             controlValue=(0, cookie))
+            return (ldap.RES_SEARCH_RESULT, [(dn, {'cn': ['junk']})], 1,
+                    [ctrl])
+
+        mock_result3.side_effect = [page('cn=a,dc=example,dc=test', 'more'),
+                                    page('cn=b,dc=example,dc=test', '')]
+
+        conn = self.identity_api.user.get_connection()
+        conn.page_size = 1
+        entries = conn.search_iter('dc=example,dc=test',
+                                   ldap.SCOPE_SUBTREE,
+                                   'objectclass=*')
+
+        dn, attrs = next(entries)
+        self.assertEqual(u'cn=a,dc=example,dc=test', dn)
+        self.assertEqual({'cn': [u'junk']}, attrs)
+        # The second page was requested before the first was handed over.
+        self.assertEqual(2, mock_search_ext.call_count)
+        self.assertEqual([u'cn=b,dc=example,dc=test'],
+                         [entry_dn for entry_dn, _attrs in entries])
+        self.assertEqual(2, mock_search_ext.call_count)
+
+    @mock.patch.object(fakeldap.FakeLdap, 'abandon')
+    @mock.patch.object(fakeldap.FakeLdap, 'search_ext')
+    @mock.patch.object(fakeldap.FakeLdap, 'result3')
+    def test_paged_search_iter_abandons_unread_page(self, mock_result3,
+                                                    mock_search_ext,
+                                                    mock_abandon):
+        page_ctrl_oid = ldap.controls.SimplePagedResultsControl.controlType
+        ctrl = mock.Mock(controlType=page_ctrl_oid, cookie='more',
+                         controlValue=(0, 'more'))
+        mock_result3.return_value = (
+            ldap.RES_SEARCH_RESULT,
+            [('cn=a,dc=example,dc=test', {'cn': ['junk']})], 1, [ctrl])
+        mock_search_ext.side_effect = [1, 2]
+
+        conn = self.identity_api.user.get_connection()
+        conn.page_size = 1
+        entries = conn.search_iter('dc=example,dc=test',
+                                   ldap.SCOPE_SUBTREE,
+                                   'objectclass=*')
+        next(entries)
+        self.assertFalse(mock_abandon.called)
+
+        # Stopping early abandons the page that was requested in advance.
+        entries.close()
+        mock_abandon.assert_called_once_with(2)
+
+
+class EntryCacheTest(tests.BaseTestCase):
+    """Tests the LDAP entry cache in keystone.common.ldap.core."""
+
+    def setUp(self):
+        super(EntryCacheTest, self).setUp()
+        self.cache = common_ldap_core.EntryCache(ttl=60, negative_ttl=10,
+                                                 max_entries=2)
+        self.now = 1000.0
+        time_patcher = mock.patch.object(common_ldap_core.time, 'time',
+                                         side_effect=lambda: self.now)
+        time_patcher.start()
+        self.addCleanup(time_patcher.stop)
+
+    def test_entries_expire(self):
+        entry = ('cn=a,dc=example,dc=test', {'cn': ['a']})
+        self.cache.set('a', entry)
+        self.assertEqual(entry, self.cache.get('a'))
+
+        self.now += 60
+        self.assertIs(common_ldap_core.NOT_CACHED, self.cache.get('a'))
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(1, self.cache.misses)
+
+    def test_misses_expire_sooner(self):
+        self.cache.set('a', None)
+        self.assertIsNone(self.cache.get('a'))
+
+        self.now += 10
+        self.assertIs(common_ldap_core.NOT_CACHED, self.cache.get('a'))
+
+    def test_dropping_an_entry_drops_its_lookups(self):
+        a = ('cn=a,dc=example,dc=test', {'cn': ['a']})
+        b = ('cn=b,dc=example,dc=test', {'cn': ['b']})
+        self.cache.set('all', [a, b], many=True)
+        self.cache.set('a', a)
+        self.assertEqual([a, b], self.cache.get('all'))
+
+        self.cache.invalidate([b[0]])
+        self.assertIs(common_ldap_core.NOT_CACHED, self.cache.get('all'))
+        self.assertEqual(a, self.cache.get('a'))
+
+    def test_cached_entries_are_copies(self):
+        entry = ('cn=a,dc=example,dc=test', {'cn': ['a']})
+        self.cache.set('a', entry)
+        self.cache.get('a')[1]['cn'].append('b')
+        self.assertEqual(entry, self.cache.get('a'))
+
+    def test_size_is_bounded(self):
+        for name in ('a', 'b', 'c'):
+            self.cache.set(name, ('cn=%s,dc=example,dc=test' % name, {}))
+        self.assertIs(common_ldap_core.NOT_CACHED, self.cache.get('a'))
+        self.assertIsNotNone(self.cache.get('c'))
+
+
+class LDAPEntryCacheIdentityTest(tests.TestCase):
+    """Tests the identity LDAP backend with the entry cache enabled."""
+
+    def setUp(self):
+        super(LDAPEntryCacheIdentityTest, self).setUp()
+        self.clear_database()
+
+        ks_ldap.register_handler('fake://', fakeldap.FakeLdap)
+        self.addCleanup(common_ldap_core._HANDLERS.clear)
+
+        self.load_backends()
+        self.load_fixtures(default_fixtures)
+
+        # The driver is called directly to bypass the identity cache.
+        self.driver = self.identity_api.driver
+
+    def clear_database(self):
+        for shelf in fakeldap.FakeShelves:
+            fakeldap.FakeShelves[shelf].clear()
+
+    def config_overrides(self):
+        super(LDAPEntryCacheIdentityTest, self).config_overrides()
+        self.config_fixture.config(group='identity', driver='ldap')
+        self.config_fixture.config(group='ldap', entry_cache_ttl=300,
+                                   entry_cache_poll_interval=60)
+
+    def config_files(self):
+        config_files = super(LDAPEntryCacheIdentityTest, self).config_files()
+        config_files.append(tests.dirs.tests_conf('backend_ldap.conf'))
+        return config_files
+
+    def _create_user(self):
+        user = {'name': uuid.uuid4().hex, 'password': uuid.uuid4().hex,
+                'enabled': True, 'domain_id': CONF.identity.default_domain_id}
+        return self.identity_api.create_user(user)
+
+    def test_get_user_is_cached_until_updated(self):
+        user = self._create_user()
+        self.driver.get_user(user['id'])
+        hits = self.driver.user.entry_cache.hits
+        self.driver.get_user(user['id'])
+        self.assertEqual(hits + 1, self.driver.user.entry_cache.hits)
+
+        email = uuid.uuid4().hex
+        self.identity_api.update_user(user['id'], {'email': email})
+        self.assertEqual(email, self.driver.get_user(user['id'])['email'])
+
+    def test_missing_user_is_cached(self):
+        user_id = uuid.uuid4().hex
+        self.assertRaises(exception.UserNotFound,
+                          self.driver.get_user, user_id)
+        hits = self.driver.user.entry_cache.hits
+        self.assertRaises(exception.UserNotFound,
+                          self.driver.get_user, user_id)
+        self.assertEqual(hits + 1, self.driver.user.entry_cache.hits)
+
+    def test_groups_are_prefetched_with_membership(self):
+        user = self._create_user()
+        group = {'name': uuid.uuid4().hex,
+                 'domain_id': CONF.identity.default_domain_id}
+        group = self.identity_api.create_group(group)
+        self.identity_api.add_user_to_group(user['id'], group['id'])
+        self.driver.list_groups_for_user(user['id'],
+                                         driver_hints.Hints())
+
+        misses = self.driver.group.entry_cache.misses
+        self.driver.check_user_in_group(user['id'], group['id'])
+        self.assertEqual(misses, self.driver.group.entry_cache.misses)
+
+        self.identity_api.remove_user_from_group(user['id'], group['id'])
+        self.assertRaises(exception.NotFound,
+                          self.driver.check_user_in_group,
+                          user['id'], group['id'])
+
+    def test_poll_drops_changed_entries(self):
+        user = self._create_user()
+        user_dn = self.driver.user.get(user['id'])['dn']
+        self.driver.user._last_cache_poll = 3600
+        self.driver.user._next_cache_poll = 0
+
+        with mock.patch.object(fakeldap.FakeLdap, 'search_s',
+                               return_value=[(user_dn, {})]) as search:
+            self.driver.user._poll_entry_cache()
+        self.assertIn('(modifyTimestamp>=19700101005900Z)',
+                      search.call_args[0][2])
+
+        misses = self.driver.user.entry_cache.misses
+        self.driver.user.get(user['id'])
+        self.assertEqual(misses + 1, self.driver.user.entry_cache.misses)
+
 
 class CommonLdapTestCase(tests.BaseTestCase):
     """These test cases call functions in keystone.common.ldap."""
@@ -0,0 +1,161 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import time
+import uuid
+
+import mock
+
+from keystone.common import password_hashing
+from keystone.common import utils
+from keystone import exception
+from keystone.tests import unit as tests
+
+
+class HashingPoolTestCase(tests.TestCase):
+
+    def setUp(self):
+        super(HashingPoolTestCase, self).setUp()
+        self.pool = password_hashing.HashingPool(workers=1, queue_size=1,
+                                                 timeout=1)
+        self.addCleanup(self.pool.close)
+
+    def test_hash_and_check_password(self):
+        password = uuid.uuid4().hex
+        hashed = self.pool.run(utils.hash_password, password)
+        self.assertTrue(utils.check_password(password, hashed))
+        self.assertTrue(self.pool.run(utils.check_password, password, hashed))
+        self.assertFalse(self.pool.run(utils.check_password,
+                                       uuid.uuid4().hex, hashed))
+
+    def test_runs_in_worker(self):
+        self.assertNotEqual(os.getpid(), self.pool.run(os.getpid))
+
+        stats = self.pool.get_statistics()
+        self.assertEqual(1, stats['requests'])
+        self.assertEqual(0, stats['inline'])
+
+    def test_full_queue_rejected(self):
+        self.pool.queue_size = 0
+        self.assertRaises(exception.ServiceUnavailable,
+                          self.pool.run, os.getpid)
+        self.assertEqual(1, self.pool.get_statistics()['rejected'])
+
+    def test_error_raised_in_caller(self):
+        self.assertRaises(ValueError, self.pool.run, int, 'not a number')
+
+    def test_failed_worker_replaced(self):
+        for process in self.pool._processes.values():
+            process.terminate()
+            process.join()
+
+        self.assertRaises(exception.ServiceUnavailable,
+                          self.pool.run, os.getpid)
+        self.assertNotEqual(os.getpid(), self.pool.run(os.getpid))
+
+    def test_hung_worker_replaced(self):
+        self.assertRaises(exception.ServiceUnavailable,
+                          self.pool.run, time.sleep, 5)
+        self.assertEqual(1, self.pool.get_statistics()['failed'])
+        self.assertNotEqual(os.getpid(), self.pool.run(os.getpid))
+
+    def test_interrupted_request_does_not_leak_answer(self):
+        worker_pid = self.pool.run(os.getpid)
+        with mock.patch.object(password_hashing.select, 'select',
+                               side_effect=KeyboardInterrupt):
+            self.assertRaises(KeyboardInterrupt, self.pool.run, os.getpid)
+
+        # The answer to the interrupted request is left unread, so its
+        # worker is replaced rather than answering the next request.
+        self.assertNotEqual(worker_pid, self.pool.run(os.getpid))
+        self.assertTrue(self.pool.run(utils.check_password, 'right',
+                                      utils.hash_password('right')))
+        self.assertFalse(self.pool.run(utils.check_password, 'wrong',
+                                       utils.hash_password('right')))
+
+
+class PasswordHashingTestCase(tests.TestCase):
+
+    def setUp(self):
+        super(PasswordHashingTestCase, self).setUp()
+        self.addCleanup(password_hashing.reset)
+
+    def test_pool_disabled_by_default(self):
+        self.assertIsNone(password_hashing.get_pool())
+
+    def test_hash_and_check_password_with_pool(self):
+        self.config_fixture.config(group='identity', password_hash_workers=1)
+        password = uuid.uuid4().hex
+        user = password_hashing.hash_user_password({'password': password})
+        self.assertTrue(password_hashing.check_password(password,
+                                                        user['password']))
+        self.assertFalse(password_hashing.check_password(None,
+                                                         user['password']))
+        self.assertEqual(2, password_hashing.get_pool().requests)
+
+
+class VerifiedPasswordCacheTestCase(tests.TestCase):
+
+    def setUp(self):
+        super(VerifiedPasswordCacheTestCase, self).setUp()
+        self.config_fixture.config(group='identity',
+                                   verified_password_cache_ttl=60,
+                                   verified_password_cache_size=2)
+        self.addCleanup(password_hashing.reset)
+
+        self.user_id = uuid.uuid4().hex
+        self.password = uuid.uuid4().hex
+        self.hashed = utils.hash_password(self.password)
+
+    def _check(self, password=None, hashed=None):
+        with mock.patch.object(utils, 'check_password',
+                               wraps=utils.check_password) as check:
+            verified = password_hashing.check_user_password(
+                self.user_id, password or self.password,
+                hashed or self.hashed)
+        return verified, check.called
+
+    def test_verification_is_remembered(self):
+        self.assertEqual((True, True), self._check())
+        self.assertEqual((True, False), self._check())
+
+    def test_failed_verification_is_not_remembered(self):
+        wrong = uuid.uuid4().hex
+        self.assertEqual((False, True), self._check(password=wrong))
+        self.assertEqual((False, True), self._check(password=wrong))
+
+    def test_changed_hash_is_verified(self):
+        self._check()
+        new_hash = utils.hash_password(uuid.uuid4().hex)
+        self.assertEqual((False, True), self._check(hashed=new_hash))
+
+    def test_verification_expires(self):
+        self._check()
+        with mock.patch.object(password_hashing.time, 'time',
+                               return_value=password_hashing.time.time() + 60):
+            self.assertEqual((True, True), self._check())
+
+    def test_size_is_bounded(self):
+        self._check()
+        cache = password_hashing.get_verified_password_cache()
+        cache.add(uuid.uuid4().hex, uuid.uuid4().hex, self.hashed)
+        cache.add(uuid.uuid4().hex, uuid.uuid4().hex, self.hashed)
+        self.assertEqual((True, True), self._check())
+
+    def test_password_is_not_stored(self):
+        self._check()
+        cache = password_hashing.get_verified_password_cache()
+        self.assertNotIn(self.password, repr(cache._verified))
+        self.assertNotIn(self.password.encode('utf-8'),
+                         b''.join(digest for _user_id, digest
+                                  in cache._verified))
@@ -43,6 +43,35 @@ class UtilsTestCase(tests.BaseTestCase):
         self.assertTrue(common_utils.check_password(password, hashed))
         self.assertFalse(common_utils.check_password(wrong, hashed))
 
+    def test_hash_with_configured_scheme(self):
+        password = uuid.uuid4().hex
+        self.config_fixture.config(group='identity',
+                                   password_hash_algorithm='pbkdf2_sha512',
+                                   password_hash_rounds=1000)
+        hashed = common_utils.hash_password(password)
+        self.assertTrue(hashed.startswith('$pbkdf2-sha512$1000$'))
+        self.assertTrue(common_utils.check_password(password, hashed))
+        self.assertFalse(common_utils.password_needs_rehash(hashed))
+
+    def test_check_password_of_other_scheme(self):
+        password = uuid.uuid4().hex
+        hashed = common_utils.hash_password(password)
+        self.config_fixture.config(group='identity',
+                                   password_hash_algorithm='pbkdf2_sha512')
+        self.assertTrue(common_utils.check_password(password, hashed))
+        self.assertFalse(common_utils.check_password(uuid.uuid4().hex,
+                                                     hashed))
+        self.assertTrue(common_utils.password_needs_rehash(hashed))
+
+    def test_password_needs_rehash_for_other_cost(self):
+        hashed = common_utils.hash_password(uuid.uuid4().hex)
+        self.assertFalse(common_utils.password_needs_rehash(hashed))
+        self.config_fixture.config(crypt_strength=CONF.crypt_strength + 1)
+        self.assertTrue(common_utils.password_needs_rehash(hashed))
+
+    def test_unknown_hash_does_not_need_rehash(self):
+        self.assertFalse(common_utils.password_needs_rehash('not a hash'))
+
     def test_verify_normal_password_strict(self):
         self.config_fixture.config(strict_password_check=False)
         password = uuid.uuid4().hex
@@ -10,6 +10,9 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import re
+
+import mock
 
 from keystone.auth.plugins import mapped
 from keystone.contrib.federation import utils as mapping_utils
@@ -609,3 +612,106 @@ class MappingRuleEngineTests(unit.BaseTestCase):
             self.assertEqual(exp_user_name, mapped_properties['user']['name'])
             self.assertEqual('abc123%40example.com',
                              mapped_properties['user']['id'])
+
+    def test_rule_processor_is_reusable(self):
+        mapping = mapping_fixtures.MAPPING_LARGE
+        rp = mapping_utils.RuleProcessor(mapping['rules'])
+        for assertion in (mapping_fixtures.ADMIN_ASSERTION,
+                          mapping_fixtures.EMPLOYEE_ASSERTION,
+                          mapping_fixtures.CONTRACTOR_ASSERTION):
+            expected = mapping_utils.RuleProcessor(
+                mapping['rules']).process(assertion)
+            self.assertEqual(expected, rp.process(assertion))
+
+    def test_rules_requiring_missing_attributes_are_skipped(self):
+        rules = [
+            {
+                'local': [{'group': {'id': 'missing'}}],
+                'remote': [{'type': 'Missing', 'any_one_of': ['x']}]
+            },
+            {
+                'local': [{'group': {'id': 'present'}}],
+                'remote': [{'type': 'UserName'},
+                           {'type': 'Email', 'not_any_of': ['x']}]
+            }
+        ]
+        rp = mapping_utils.RuleProcessor(rules)
+        with mock.patch.object(
+                rp, '_verify_all_requirements',
+                wraps=rp._verify_all_requirements) as verify:
+            values = rp.process(mapping_fixtures.ADMIN_ASSERTION)
+
+        self.assertEqual(1, verify.call_count)
+        self.assertEqual(['present'], values['group_ids'])
+
+    def test_invalid_regex_fails_when_evaluated(self):
+        rules = [
+            {
+                'local': [{'group': {'id': 'broken'}}],
+                'remote': [{'type': 'UserName',
+                            'any_one_of': ['['],
+                            'regex': True}]
+            }
+        ]
+        rp = mapping_utils.RuleProcessor(rules)
+        self.assertEqual([], rp.process({'Email': 'x'})['group_ids'])
+        self.assertRaises(re.error, rp.process, {'UserName': 'x'})
+
+
+class GroupLookupTests(unit.BaseTestCase):
+
+    def setUp(self):
+        super(GroupLookupTests, self).setUp()
+        self.groups = [{'id': 'id%d' % x, 'name': 'group%d' % x,
+                        'domain_id': 'domain_id'} for x in range(3)]
+        self.identity_api = mock.Mock()
+        self.identity_api.list_groups_from_ids.side_effect = (
+            lambda ids: [g for g in self.groups if g['id'] in ids])
+        self.identity_api.list_groups_by_names.side_effect = (
+            lambda names, domain_id: [g for g in self.groups
+                                      if g['name'] in names])
+        self.resource_api = mock.Mock()
+        self.resource_api.get_domain_by_name.return_value = {
+            'id': 'domain_id'}
+
+    def test_transform_to_group_ids_looks_up_groups_together(self):
+        group_names = [
+            {'name': 'group0', 'domain': {'id': 'domain_id'}},
+            {'name': 'group1', 'domain': {'name': 'domain_name'}},
+            {'name': 'missing', 'domain': {'name': 'domain_name'}},
+            {'name': 'group2', 'domain': {'name': 'domain_name'}},
+        ]
+        group_ids = list(mapping_utils.transform_to_group_ids(
+            group_names, 'mapping_id', self.identity_api, self.resource_api))
+
+        self.assertEqual(['id0', 'id1', 'id2'], group_ids)
+        self.resource_api.get_domain_by_name.assert_called_once_with(
+            'domain_name')
+        self.assertEqual(1, self.identity_api.list_groups_by_names.call_count)
+
+    def test_group_lookup_is_remembered_for_the_request(self):
+        group_lookup = mapping_utils.GroupLookup(self.identity_api,
+                                                 self.resource_api)
+        group_names = [{'name': 'group1', 'domain': {'id': 'domain_id'}}]
+        self.assertEqual(['id1'], list(mapping_utils.transform_to_group_ids(
+            group_names, 'mapping_id', self.identity_api, self.resource_api,
+            group_lookup=group_lookup)))
+
+        # The group found by name is already known by its id.
+        mapping_utils.validate_groups_in_backend(
+            ['id1'], 'mapping_id', self.identity_api,
+            group_lookup=group_lookup)
+        self.assertFalse(self.identity_api.list_groups_from_ids.called)
+
+        self.assertEqual(['id1'], list(mapping_utils.transform_to_group_ids(
+            group_names, 'mapping_id', self.identity_api, self.resource_api,
+            group_lookup=group_lookup)))
+        self.assertEqual(1, self.identity_api.list_groups_by_names.call_count)
+
+    def test_validate_groups_in_backend_raises_for_missing_group(self):
+        self.assertRaises(exception.MappedGroupNotFound,
+                          mapping_utils.validate_groups_in_backend,
+                          ['id0', 'missing'], 'mapping_id',
+                          self.identity_api)
+        self.identity_api.list_groups_from_ids.assert_called_once_with(
+            mock.ANY)
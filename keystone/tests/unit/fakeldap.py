@@ -239,7 +239,8 @@ class FakeLdap(core.LDAPHandler):
                 tls_req_cert='demand', chase_referrals=None, debug_level=None,
                 use_pool=None, pool_size=None, pool_retry_max=None,
                 pool_retry_delay=None, pool_conn_timeout=None,
-                pool_conn_lifetime=None):
+                pool_conn_lifetime=None, pool_eject_failures=None,
+                pool_eject_time=None):
         if url.startswith('fake://memory'):
             if url not in FakeShelves:
                 FakeShelves[url] = FakeShelve()
@@ -273,6 +274,8 @@ class FakeLdap(core.LDAPHandler):
         self.pool_retry_delay = pool_retry_delay
         self.pool_conn_timeout = pool_conn_timeout
         self.pool_conn_lifetime = pool_conn_lifetime
+        self.pool_eject_failures = pool_eject_failures
+        self.pool_eject_time = pool_eject_time
 
     def dn(self, dn):
         return core.utf8_decode(dn)
@@ -547,6 +550,9 @@ class FakeLdap(core.LDAPHandler):
                 resp_ctrl_classes=None):
         raise exception.NotImplemented()
 
+    def abandon(self, msgid):
+        raise exception.NotImplemented()
+
 
 class FakeLdapPool(FakeLdap):
     """Emulate the python-ldap API with pooled connections.
@@ -2771,6 +2771,30 @@ class IdentityTests(object):
                           uuid.uuid4().hex,
                           DEFAULT_DOMAIN_ID)
 
+    def test_list_groups_from_ids(self):
+        groups = []
+        for x in range(3):
+            group = {'domain_id': DEFAULT_DOMAIN_ID, 'name': uuid.uuid4().hex}
+            groups.append(self.identity_api.create_group(group))
+
+        group_refs = self.identity_api.list_groups_from_ids(
+            [groups[0]['id'], uuid.uuid4().hex, groups[2]['id']])
+        self.assertItemsEqual([groups[0], groups[2]], group_refs)
+        self.assertEqual([], self.identity_api.list_groups_from_ids([]))
+
+    def test_list_groups_by_names(self):
+        groups = []
+        for x in range(3):
+            group = {'domain_id': DEFAULT_DOMAIN_ID, 'name': uuid.uuid4().hex}
+            groups.append(self.identity_api.create_group(group))
+
+        group_refs = self.identity_api.list_groups_by_names(
+            [groups[0]['name'], uuid.uuid4().hex, groups[2]['name']],
+            DEFAULT_DOMAIN_ID)
+        self.assertItemsEqual([groups[0], groups[2]], group_refs)
+        self.assertEqual([], self.identity_api.list_groups_by_names(
+            [], DEFAULT_DOMAIN_ID))
+
     @tests.skip_if_cache_disabled('identity')
     def test_cache_layer_group_crud(self):
         group = {'domain_id': DEFAULT_DOMAIN_ID, 'name': uuid.uuid4().hex}
@@ -3943,6 +3967,19 @@ class TokenTests(object):
             exception.TokenNotFound,
             self.token_provider_api._persistence.delete_token, token_id)
 
+    def test_get_tokens(self):
+        token_id1, data = self.create_token_sample_data()
+        token_id2, data = self.create_token_sample_data()
+        token_id3, data = self.create_token_sample_data()
+        self.token_provider_api._persistence.delete_token(token_id3)
+        expired_id, data = self.create_token_sample_data(
+            expires=timeutils.utcnow() - datetime.timedelta(minutes=1))
+
+        token_refs = self.token_provider_api._persistence.get_tokens(
+            [token_id1, token_id2, token_id3, expired_id, uuid.uuid4().hex])
+        self.assertEqual(set([token_id1, token_id2]), set(token_refs))
+        self.assertEqual(token_id1, token_refs[token_id1]['id'])
+
     def create_token_sample_data(self, token_id=None, tenant_id=None,
                                  trust_id=None, user_id=None, expires=None):
         if token_id is None:
@@ -37,70 +37,140 @@ class KvsToken(tests.TestCase, test_backend.TokenTests):
             exception.NotImplemented,
             self.token_provider_api._persistence.flush_expired_tokens)
 
-    def _update_user_token_index_direct(self, user_key, token_id, new_data):
-        persistence = self.token_provider_api._persistence
-        token_list = persistence.driver._get_user_token_list_with_expiry(
-            user_key)
-        # Update the user-index so that the expires time is _actually_ expired
-        # since we do not do an explicit get on the token, we only reference
-        # the data in the user index (to save extra round-trips to the kvs
-        # backend).
-        for i, data in enumerate(token_list):
-            if data[0] == token_id:
-                token_list[i] = new_data
-                break
-        self.token_provider_api._persistence.driver._store.set(user_key,
-                                                               token_list)
+    def _expires_str(self, token_id):
+        token_ref = self.token_provider_api._persistence.get_token(token_id)
+        return utils.isotime(token_ref['expires'], subsecond=True)
+
+    def test_user_index_is_bucketed(self):
+        user_id = six.text_type(uuid.uuid4().hex)
+        token_id, data = self.create_token_sample_data(user_id=user_id)
+        token_id_2, data = self.create_token_sample_data(user_id=user_id)
+
+        driver = self.token_provider_api._persistence.driver
+        user_key = driver._prefix_user_id(user_id)
+        expected_buckets = sorted(set(
+            driver._index_bucket(timeutils.normalize_time(
+                timeutils.parse_isotime(self._expires_str(t))))
+            for t in (token_id, token_id_2)))
+        self.assertEqual({'buckets': expected_buckets},
+                         driver._store.get(
+                             driver._prefix_bucketed_index(user_key)))
+        self.assertRaises(exception.NotFound, driver._store.get, user_key)
+        self.assertEqual(
+            [(token_id, self._expires_str(token_id)),
+             (token_id_2, self._expires_str(token_id_2))],
+            driver._get_user_token_list_with_expiry(user_key))
 
     def test_cleanup_user_index_on_create(self):
         user_id = six.text_type(uuid.uuid4().hex)
+        driver = self.token_provider_api._persistence.driver
+        user_key = driver._prefix_user_id(user_id)
+        bucketed_index_key = driver._prefix_bucketed_index(user_key)
+
+        # Add an expired bucket directly, since tokens cannot be created
+        # already expired.
+        expired_bucket = driver._index_bucket(
+            timeutils.normalize_time(timeutils.utcnow()) -
+            datetime.timedelta(seconds=86400))
+        expired_bucket_key = driver._prefix_index_bucket(user_key,
+                                                         expired_bucket)
+        expired_token_id = uuid.uuid4().hex
+        expired = utils.isotime(
+            timeutils.utcnow() - datetime.timedelta(seconds=86400),
+            subsecond=True)
+        driver._store.set(expired_bucket_key, [(expired_token_id, expired)])
+        driver._store.set(bucketed_index_key, {'buckets': [expired_bucket]})
+
+        token_id, data = self.create_token_sample_data(user_id=user_id)
+
+        self.assertNotIn(expired_bucket,
+                         driver._store.get(bucketed_index_key)['buckets'])
+        self.assertRaises(exception.NotFound, driver._store.get,
+                          expired_bucket_key)
+        self.assertEqual([(token_id, self._expires_str(token_id))],
+                         driver._get_user_token_list_with_expiry(user_key))
+
+    def test_revoked_tokens_are_not_listed(self):
+        user_id = six.text_type(uuid.uuid4().hex)
+        token_id, data = self.create_token_sample_data(user_id=user_id)
+        token_id_2, data = self.create_token_sample_data(user_id=user_id)
+        token_persistence = self.token_provider_api._persistence
+        token_persistence.delete_token(token_id)
+        self.assertEqual([token_id_2],
+                         token_persistence.driver._list_tokens(user_id))
+
+    def test_legacy_user_index(self):
+        self.config_fixture.config(group='token', legacy_kvs_indexes=True)
+        user_id = six.text_type(uuid.uuid4().hex)
+        driver = self.token_provider_api._persistence.driver
+        user_key = driver._prefix_user_id(user_id)
+        token_id, data = self.create_token_sample_data(user_id=user_id)
+        item = (token_id, self._expires_str(token_id))
+
+        # Nodes of earlier releases read the index as a list, and add to it.
+        self.assertEqual([item], driver._store.get(user_key))
+        legacy_item = (uuid.uuid4().hex, self._expires_str(token_id))
+        driver._store.set(user_key, [item, legacy_item])
+        self.assertEqual([item, legacy_item],
+                         driver._get_user_token_list_with_expiry(user_key))
+
+        token_id_2, data = self.create_token_sample_data(user_id=user_id)
+        item_2 = (token_id_2, self._expires_str(token_id_2))
+        self.assertEqual([item, legacy_item, item_2],
+                         driver._store.get(user_key))
+
+    def test_legacy_revocation_list(self):
+        self.config_fixture.config(group='token', legacy_kvs_indexes=True)
+        driver = self.token_provider_api._persistence.driver
+        token_id, data = self.create_token_sample_data()
+        self.token_provider_api._persistence.delete_token(token_id)
+
+        # Nodes of earlier releases read the revocation list as a list.
+        self.assertEqual([token_id], [t['id'] for t in driver._store.get(
+            driver.revocation_key)])
+        self.assertEqual(driver._store.get(driver.revocation_key),
+                         driver.list_revoked_tokens())
+
+    def test_migrate_legacy_user_index(self):
+        user_id = six.text_type(uuid.uuid4().hex)
+        driver = self.token_provider_api._persistence.driver
+        user_key = driver._prefix_user_id(user_id)
         valid_token_id, data = self.create_token_sample_data(user_id=user_id)
-        expired_token_id, expired_data = self.create_token_sample_data(
-            user_id=user_id)
+        valid_item = (valid_token_id, self._expires_str(valid_token_id))
+        legacy_item = (uuid.uuid4().hex, self._expires_str(valid_token_id))
+        expired_item = (uuid.uuid4().hex, utils.isotime(
+            timeutils.utcnow() - datetime.timedelta(seconds=86400),
+            subsecond=True))
 
-        expire_delta = datetime.timedelta(seconds=86400)
+        # Write the index as a list, as earlier releases do.
+        driver._store.set(user_key, [expired_item, valid_item, legacy_item])
+        self.assertEqual([valid_item, expired_item, legacy_item],
+                         driver._get_user_token_list_with_expiry(user_key))
 
-        # NOTE(morganfainberg): Directly access the data cache since we need to
-        # get expired tokens as well as valid tokens.
-        token_persistence = self.token_provider_api._persistence
-        user_key = token_persistence.driver._prefix_user_id(user_id)
-        user_token_list = token_persistence.driver._store.get(user_key)
-        valid_token_ref = token_persistence.get_token(valid_token_id)
-        expired_token_ref = token_persistence.get_token(expired_token_id)
-        expected_user_token_list = [
-            (valid_token_id, utils.isotime(valid_token_ref['expires'],
-                                           subsecond=True)),
-            (expired_token_id, utils.isotime(expired_token_ref['expires'],
-                                             subsecond=True))]
-        self.assertEqual(expected_user_token_list, user_token_list)
-        new_expired_data = (expired_token_id,
-                            utils.isotime(
-                                (timeutils.utcnow() - expire_delta),
-                                subsecond=True))
-        self._update_user_token_index_direct(user_key, expired_token_id,
-                                             new_expired_data)
-        valid_token_id_2, valid_data_2 = self.create_token_sample_data(
-            user_id=user_id)
-        valid_token_ref_2 = token_persistence.get_token(valid_token_id_2)
-        expected_user_token_list = [
-            (valid_token_id, utils.isotime(valid_token_ref['expires'],
-                                           subsecond=True)),
-            (valid_token_id_2, utils.isotime(valid_token_ref_2['expires'],
-                                             subsecond=True))]
-        user_token_list = token_persistence.driver._store.get(user_key)
-        self.assertEqual(expected_user_token_list, user_token_list)
-
-        # Test that revoked tokens are removed from the list on create.
-        token_persistence.delete_token(valid_token_id_2)
         new_token_id, data = self.create_token_sample_data(user_id=user_id)
-        new_token_ref = token_persistence.get_token(new_token_id)
-        expected_user_token_list = [
-            (valid_token_id, utils.isotime(valid_token_ref['expires'],
-                                           subsecond=True)),
-            (new_token_id, utils.isotime(new_token_ref['expires'],
-                                         subsecond=True))]
-        user_token_list = token_persistence.driver._store.get(user_key)
-        self.assertEqual(expected_user_token_list, user_token_list)
+        self.assertRaises(exception.NotFound, driver._store.get, user_key)
+        self.assertEqual(
+            [valid_item, legacy_item,
+             (new_token_id, self._expires_str(new_token_id))],
+            driver._get_user_token_list_with_expiry(user_key))
+
+    def test_migrate_legacy_revocation_list(self):
+        driver = self.token_provider_api._persistence.driver
+        legacy_token_data = {
+            'id': uuid.uuid4().hex,
+            'expires': utils.isotime(
+                timeutils.utcnow() + datetime.timedelta(seconds=3600),
+                subsecond=True)}
+        driver._store.set(driver.revocation_key, [legacy_token_data])
+        self.assertEqual([legacy_token_data], driver.list_revoked_tokens())
+
+        token_id, data = self.create_token_sample_data()
+        self.token_provider_api._persistence.delete_token(token_id)
+        self.assertRaises(exception.NotFound, driver._store.get,
+                          driver.revocation_key)
+        revoked_ids = [t['id'] for t in driver.list_revoked_tokens()]
+        self.assertEqual(sorted([legacy_token_data['id'], token_id]),
+                         sorted(revoked_ids))
 
 
 class KvsCatalog(tests.TestCase, test_backend.CatalogTests):
@@ -2143,6 +2143,14 @@ class LDAPIdentityEnabledEmulation(LDAPIdentity):
             user_id=self.user_foo['id'],
             password=self.user_foo['password'])
 
+    def test_list_users_uses_one_connection(self):
+        driver = self.identity_api._select_identity_driver(
+            CONF.identity.default_domain_id)
+        with mock.patch.object(driver.user, 'get_connection',
+                               wraps=driver.user.get_connection) as mock_conn:
+            self.assertNotEqual([], self.identity_api.list_users())
+        self.assertEqual(1, mock_conn.call_count)
+
     def test_user_enable_attribute_mask(self):
         self.skipTest(
             "Enabled emulation conflicts with enabled mask")
@@ -14,13 +14,18 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import contextlib
+import uuid
+
+import ldap
 import ldappool
 import mock
 from oslo_config import cfg
 from oslotest import mockpatch
+from testtools import matchers
 
 from keystone.common.ldap import core as ldap_core
-from keystone.identity.backends import ldap
+from keystone.identity.backends import ldap as ldap_identity
 from keystone.tests import unit as tests
 from keystone.tests.unit import fakeldap
 from keystone.tests.unit import test_backend_ldap
@@ -33,6 +38,7 @@ class LdapPoolCommonTestMixin(object):
 
     def cleanup_pools(self):
         ldap_core.PooledLDAPHandler.connection_pools.clear()
+        ldap_core.PooledLDAPHandler.server_stats.clear()
 
     def test_handler_with_use_pool_enabled(self):
         # by default use_pool and use_auth_pool is enabled in test pool config
@@ -51,7 +57,7 @@ class LdapPoolCommonTestMixin(object):
         self.config_fixture.config(group='ldap', use_auth_pool=True)
         self.cleanup_pools()
 
-        user_api = ldap.UserApi(CONF)
+        user_api = ldap_identity.UserApi(CONF)
         handler = user_api.get_connection(user=None, password=None,
                                           end_user_auth=True)
         # use_auth_pool flag does not matter when use_pool is False
@@ -67,7 +73,7 @@ class LdapPoolCommonTestMixin(object):
         self.config_fixture.config(group='ldap', use_auth_pool=False)
         self.cleanup_pools()
 
-        user_api = ldap.UserApi(CONF)
+        user_api = ldap_identity.UserApi(CONF)
         handler = user_api.get_connection(user=None, password=None,
                                           end_user_auth=True)
         self.assertIsInstance(handler.conn, ldap_core.PythonLDAPHandler)
@@ -78,6 +84,18 @@ class LdapPoolCommonTestMixin(object):
                                           end_user_auth=False)
         self.assertIsInstance(handler.conn, ldap_core.PooledLDAPHandler)
 
+    def test_pool_statistics(self):
+        self.identity_api.get_user.invalidate(self.identity_api,
+                                              self.user_foo['id'])
+        self.identity_api.get_user(self.user_foo['id'])
+
+        stats = ldap_core.PooledLDAPHandler.get_statistics()[CONF.ldap.url]
+        self.assertEqual(CONF.ldap.url, stats['url'])
+        self.assertEqual(0, stats['in_use'])
+        self.assertThat(stats['acquired'], matchers.GreaterThan(0))
+        self.assertEqual(0, stats['errors'])
+        self.assertFalse(stats['ejected'])
+
     def test_pool_size_set(self):
         # get related connection manager instance
         ldappool_cm = self.conn_pools[CONF.ldap.url]
@@ -240,3 +258,140 @@ class LdapIdentitySqlAssignment(LdapPoolCommonTestMixin,
         self.identity_api.get_user(self.user_foo['id'])
         mocked_method.assert_any_call(CONF.ldap.user)
         mocked_method.assert_any_call(CONF.ldap.password)
+
+
+class ServerPoolTests(tests.BaseTestCase):
+    """Tests spreading pooled connections across LDAP servers."""
+
+    def _server(self, url, error=None):
+        manager = mock.Mock()
+
+        @contextlib.contextmanager
+        def connection(who, cred):
+            if error is not None:
+                raise error
+            yield url
+
+        manager.connection.side_effect = connection
+        return manager, ldap_core.ServerStats(url)
+
+    def test_split_urls(self):
+        self.assertEqual(['ldap://a', 'ldap://b', 'ldap://c'],
+                         ldap_core.split_urls('ldap://a, ldap://b ldap://c'))
+
+    def test_connections_spread_by_load(self):
+        pool = ldap_core.ServerPool([self._server('ldap://a'),
+                                     self._server('ldap://b')], 3, 30)
+        with pool.connection('who', 'cred') as first:
+            with pool.connection('who', 'cred') as second:
+                self.assertNotEqual(first, second)
+
+    def test_slow_server_given_less_work(self):
+        slow = self._server('ldap://slow')
+        fast = self._server('ldap://fast')
+        slow[1].response_time = 1.0
+        fast[1].response_time = 0.01
+        pool = ldap_core.ServerPool([slow, fast], 3, 30)
+
+        with pool.connection('who', 'cred') as conn:
+            self.assertEqual('ldap://fast', conn)
+            with pool.connection('who', 'cred') as conn:
+                self.assertEqual('ldap://fast', conn)
+
+    def test_failing_server_is_ejected(self):
+        failing = self._server('ldap://failing', error=ldap.SERVER_DOWN())
+        working = self._server('ldap://working')
+        pool = ldap_core.ServerPool([failing, working], 1, 30)
+
+        for i in range(3):
+            with pool.connection('who', 'cred') as conn:
+                self.assertEqual('ldap://working', conn)
+
+        self.assertEqual(1, failing[0].connection.call_count)
+        self.assertTrue(failing[1].as_dict()['ejected'])
+        self.assertEqual(1.0, failing[1].as_dict()['error_rate'])
+        self.assertEqual(3, working[1].as_dict()['acquired'])
+
+    def test_error_raised_when_every_server_fails(self):
+        pool = ldap_core.ServerPool(
+            [self._server('ldap://a', error=ldap.SERVER_DOWN()),
+             self._server('ldap://b', error=ldap.SERVER_DOWN())], 3, 30)
+
+        def connect():
+            with pool.connection('who', 'cred'):
+                pass
+
+        self.assertRaises(ldap.SERVER_DOWN, connect)
+
+    def test_release_recorded_when_abandoned(self):
+        pool = ldap_core.ServerPool([self._server('ldap://a')], 3, 30)
+        stats = pool.servers[0][1]
+        conn_ctxt = pool.connection('who', 'cred')
+        conn_ctxt.__enter__()
+        self.assertEqual(1, stats.in_use)
+
+        # Closing the context without exiting it, as garbage collection
+        # does, still releases the connection.
+        del conn_ctxt
+        self.assertEqual(0, stats.in_use)
+        self.assertEqual(1, stats.requests)
+
+    def _pooled_handler(self, *urls):
+        def server(url):
+            conn = mock.Mock()
+            conn.get_lifetime.return_value = 0
+
+            @contextlib.contextmanager
+            def connection(who, cred):
+                yield conn
+
+            manager = mock.Mock()
+            manager.connection.side_effect = connection
+            return manager, ldap_core.ServerStats(url)
+
+        handler = ldap_core.PooledLDAPHandler()
+        handler.conn_pool = ldap_core.ServerPool(
+            [server(url) for url in urls], 3, 30)
+        return handler
+
+    def test_pinned_connection(self):
+        handler = self._pooled_handler('ldap://a', 'ldap://b')
+        with handler.pinned_connection():
+            first = handler.search_ext('cn=a', ldap.SCOPE_SUBTREE)
+            second = handler.search_ext('cn=a', ldap.SCOPE_SUBTREE)
+            self.assertIs(first[0], second[0])
+        self.assertEqual(0, sum(stats.in_use for _manager, stats
+                                in handler.conn_pool.servers))
+
+        # Without pinning, the second search goes to the idle server.
+        first = handler.search_ext('cn=a', ldap.SCOPE_SUBTREE)
+        second = handler.search_ext('cn=a', ldap.SCOPE_SUBTREE)
+        self.assertIsNot(first[0], second[0])
+
+    def test_pinned_connection_shared_by_all_requests(self):
+        handler = self._pooled_handler('ldap://a')
+        with handler.pinned_connection():
+            msgid = handler.search_ext('cn=a', ldap.SCOPE_SUBTREE)
+            handler.search_s('cn=a', ldap.SCOPE_BASE)
+            handler.modify_s('cn=a', [])
+        # A single pooled connection was taken for all the requests.
+        manager, stats = handler.conn_pool.servers[0]
+        self.assertEqual(1, manager.connection.call_count)
+        conn = msgid[0]
+        conn.search_s.assert_called_once_with(
+            'cn=a', ldap.SCOPE_BASE, '(objectClass=*)', None, 0)
+        conn.modify_s.assert_called_once_with('cn=a', [])
+
+    def test_pool_size_divided_between_servers(self):
+        urls = ['fakepool://memory/%s' % uuid.uuid4().hex for i in range(3)]
+        for url in urls:
+            self.addCleanup(ldap_core.PooledLDAPHandler.connection_pools.pop,
+                            url, None)
+            self.addCleanup(ldap_core.PooledLDAPHandler.server_stats.pop,
+                            url, None)
+        handler = ldap_core.PooledLDAPHandler()
+        handler.Connector = fakeldap.FakeLdapPool
+        handler.connect(','.join(urls), pool_size=10)
+        self.assertEqual([4, 4, 4],
+                         [handler.connection_pools[url].size
+                          for url in urls])
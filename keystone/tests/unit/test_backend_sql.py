@@ -13,13 +13,16 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import datetime
 import functools
+import random
 import uuid
 
 import mock
 from oslo_config import cfg
 from oslo_db import exception as db_exception
 from oslo_db import options
+from oslo_utils import timeutils
 from six.moves import range
 import sqlalchemy
 from sqlalchemy import exc
@@ -29,6 +32,7 @@ from keystone.common import driver_hints
 from keystone.common import sql
 from keystone import exception
 from keystone.identity.backends import sql as identity_sql
+from keystone.resource.backends import sql as resource_sql
 from keystone.tests import unit as tests
 from keystone.tests.unit import default_fixtures
 from keystone.tests.unit.ksfixtures import database
@@ -125,7 +129,7 @@ class SqlModels(SqlTests):
     def test_user_model(self):
         cols = (('id', sql.String, 64),
                 ('name', sql.String, 255),
-                ('password', sql.String, 128),
+                ('password', sql.String, 255),
                 ('domain_id', sql.String, 64),
                 ('default_project_id', sql.String, 64),
                 ('enabled', sql.Boolean, None),
@@ -158,6 +162,12 @@ class SqlModels(SqlTests):
                 ('is_domain', sql.Boolean, False))
         self.assertExpectedSchema('project', cols)
 
+    def test_project_hierarchy_model(self):
+        cols = (('ancestor_id', sql.String, 64),
+                ('descendant_id', sql.String, 64),
+                ('depth', sql.Integer, None))
+        self.assertExpectedSchema('project_hierarchy', cols)
+
     def test_role_assignment_model(self):
         cols = (('type', sql.Enum, None),
                 ('actor_id', sql.String, 64),
@@ -178,6 +188,29 @@ class SqlIdentity(SqlTests, test_backend.IdentityTests):
         user_ref = self.identity_api._get_user(session, self.user_foo['id'])
         self.assertNotEqual(user_ref['password'], self.user_foo['password'])
 
+    def _stored_password(self, user_id):
+        session = sql.get_session()
+        return self.identity_api._get_user(session, user_id)['password']
+
+    def test_password_rehashed_on_authenticate(self):
+        old_hash = self._stored_password(self.user_foo['id'])
+        self.config_fixture.config(group='identity',
+                                   password_hash_algorithm='pbkdf2_sha512',
+                                   password_hash_rounds=1000)
+
+        self.identity_api.authenticate(context={},
+                                       user_id=self.user_foo['id'],
+                                       password=self.user_foo['password'])
+        new_hash = self._stored_password(self.user_foo['id'])
+        self.assertNotEqual(old_hash, new_hash)
+        self.assertThat(new_hash, matchers.StartsWith('$pbkdf2-sha512$'))
+
+        # The upgraded hash is verified and left as it is.
+        self.identity_api.authenticate(context={},
+                                       user_id=self.user_foo['id'],
+                                       password=self.user_foo['password'])
+        self.assertEqual(new_hash, self._stored_password(self.user_foo['id']))
+
     def test_delete_user_with_project_association(self):
         user = {'name': uuid.uuid4().hex,
                 'domain_id': DEFAULT_DOMAIN_ID,
@@ -334,6 +367,79 @@ class SqlIdentity(SqlTests, test_backend.IdentityTests):
         self.assertEqual(arbitrary_value, ref[arbitrary_key])
         self.assertEqual(arbitrary_value, ref['extra'][arbitrary_key])
 
+    def _create_project_chain(self, length):
+        projects = []
+        parent_id = None
+        for i in range(length):
+            project = {'id': uuid.uuid4().hex,
+                       'name': uuid.uuid4().hex,
+                       'domain_id': DEFAULT_DOMAIN_ID,
+                       'parent_id': parent_id}
+            self.resource_api.create_project(project['id'], project)
+            projects.append(project)
+            parent_id = project['id']
+        return projects
+
+    def _get_project_hierarchy(self, project_id):
+        session = sql.get_session()
+        query = session.query(resource_sql.ProjectHierarchy)
+        query = query.filter_by(descendant_id=project_id)
+        return dict((ref.ancestor_id, ref.depth) for ref in query)
+
+    def test_project_hierarchy_index(self):
+        root, child, grandchild = self._create_project_chain(3)
+
+        self.assertEqual({grandchild['id']: 0, child['id']: 1, root['id']: 2},
+                         self._get_project_hierarchy(grandchild['id']))
+
+        parents = self.resource_api.list_project_parents(grandchild['id'])
+        self.assertEqual([child['id'], root['id']],
+                         [ref['id'] for ref in parents])
+
+        subtree = self.resource_api.list_projects_in_subtree(root['id'])
+        self.assertEqual([child['id'], grandchild['id']],
+                         [ref['id'] for ref in subtree])
+
+    def test_project_hierarchy_reindexed_on_parent_change(self):
+        root, child, grandchild = self._create_project_chain(3)
+        other_root = self._create_project_chain(1)[0]
+
+        # NOTE: The manager does not allow parent_id to be updated, so use
+        # the driver directly.
+        child['parent_id'] = other_root['id']
+        self.resource_api.driver.update_project(child['id'], child)
+
+        self.assertEqual({grandchild['id']: 0, child['id']: 1,
+                          other_root['id']: 2},
+                         self._get_project_hierarchy(grandchild['id']))
+        self.assertEqual(
+            [], self.resource_api.list_projects_in_subtree(root['id']))
+        subtree = self.resource_api.list_projects_in_subtree(
+            other_root['id'])
+        self.assertEqual([child['id'], grandchild['id']],
+                         [ref['id'] for ref in subtree])
+
+    def test_project_hierarchy_removed_on_delete(self):
+        root, child = self._create_project_chain(2)
+        self.resource_api.delete_project(child['id'])
+
+        self.assertEqual({}, self._get_project_hierarchy(child['id']))
+        self.assertEqual({root['id']: 0},
+                         self._get_project_hierarchy(root['id']))
+
+    def test_unindexed_project_hierarchy_is_walked(self):
+        root, child, grandchild = self._create_project_chain(3)
+        session = sql.get_session()
+        with session.begin():
+            session.query(resource_sql.ProjectHierarchy).delete()
+
+        parents = self.resource_api.list_project_parents(grandchild['id'])
+        self.assertEqual([child['id'], root['id']],
+                         [ref['id'] for ref in parents])
+        subtree = self.resource_api.list_projects_in_subtree(root['id'])
+        self.assertEqual([child['id'], grandchild['id']],
+                         [ref['id'] for ref in subtree])
+
     def test_update_user_returns_extra(self):
         """This tests for backwards-compatibility with an essex/folsom bug.
 
@@ -539,6 +645,61 @@ class SqlToken(SqlTests, test_backend.TokenTests):
             self.assertThat(mock_delete.call_args_list,
                             matchers.HasLength(len(ITERS)))
 
+    def _create_token_expiring_at(self, expires):
+        token_id = uuid.uuid4().hex
+        data = {'id': token_id, 'expires': expires, 'trust_id': None,
+                'user': {'id': 'testuserid'}}
+        self.token_provider_api._persistence.create_token(token_id, data)
+        return token_id
+
+    def _list_token_ids(self):
+        session = sql.get_session()
+        return set(t[0] for t in session.query(token_sql.TokenModel.id))
+
+    def test_flush_expired_tokens_batch_driver(self):
+        now = timeutils.utcnow()
+        expired_ids = [
+            self._create_token_expiring_at(now - datetime.timedelta(hours=i))
+            for i in range(3, 0, -1)]
+        valid_id = self._create_token_expiring_at(
+            now + datetime.timedelta(hours=1))
+
+        driver = self.token_provider_api._persistence.driver
+        self.assertEqual(2, driver.flush_expired_tokens_batch(2))
+        self.assertEqual(set(expired_ids[2:] + [valid_id]),
+                         self._list_token_ids())
+
+        self.assertEqual(1, driver.flush_expired_tokens_batch(2))
+        self.assertEqual(0, driver.flush_expired_tokens_batch(2))
+        self.assertEqual(set([valid_id]), self._list_token_ids())
+
+    def test_flush_expired_tokens_batch_range(self):
+        now = timeutils.utcnow()
+        expired_ids = [
+            self._create_token_expiring_at(now - datetime.timedelta(hours=i))
+            for i in range(3, 0, -1)]
+
+        driver = self.token_provider_api._persistence.driver
+        removed = driver.flush_expired_tokens_batch(
+            10, lower_bound=now - datetime.timedelta(hours=3),
+            upper_bound=now - datetime.timedelta(hours=2))
+        self.assertEqual(1, removed)
+        self.assertEqual(set([expired_ids[0], expired_ids[2]]),
+                         self._list_token_ids())
+
+    def test_flush_expired_tokens_batch_future_upper_bound(self):
+        now = timeutils.utcnow()
+        self._create_token_expiring_at(now - datetime.timedelta(hours=1))
+        valid_id = self._create_token_expiring_at(
+            now + datetime.timedelta(hours=1))
+
+        # Tokens that have not expired yet are kept whatever the bound.
+        driver = self.token_provider_api._persistence.driver
+        removed = driver.flush_expired_tokens_batch(
+            10, upper_bound=now + datetime.timedelta(hours=2))
+        self.assertEqual(1, removed)
+        self.assertEqual(set([valid_id]), self._list_token_ids())
+
     def test_expiry_range_batched(self):
         upper_bound_mock = mock.Mock(side_effect=[1, "final value"])
         sess_mock = mock.Mock()
@@ -607,6 +768,63 @@ class SqlCatalog(SqlTests, test_backend.CatalogTests):
         catalog = self.catalog_api.get_catalog('fake-user', 'fake-tenant')
         self.assertEqual({}, catalog)
 
+    def _create_service_with_endpoint(self, url):
+        service = {
+            'id': uuid.uuid4().hex,
+            'type': uuid.uuid4().hex,
+            'name': uuid.uuid4().hex,
+            'description': uuid.uuid4().hex,
+        }
+        self.catalog_api.create_service(service['id'], service.copy())
+        endpoint = {
+            'id': uuid.uuid4().hex,
+            'region_id': None,
+            'service_id': service['id'],
+            'interface': 'public',
+            'url': url,
+        }
+        self.catalog_api.create_endpoint(endpoint['id'], endpoint.copy())
+        return service, endpoint
+
+    def _get_v3_catalog_urls(self, service_id, user_id, project_id):
+        catalog = self.catalog_api.get_v3_catalog(user_id, project_id)
+        return [endpoint['url'] for svc in catalog if svc['id'] == service_id
+                for endpoint in svc['endpoints']]
+
+    def test_catalog_is_formatted_per_project(self):
+        service, endpoint = self._create_service_with_endpoint(
+            'http://localhost/$(tenant_id)s/$(user_id)s')
+        self.assertEqual(
+            ['http://localhost/project-a/user'],
+            self._get_v3_catalog_urls(service['id'], 'user', 'project-a'))
+        self.assertEqual(
+            ['http://localhost/project-b/user'],
+            self._get_v3_catalog_urls(service['id'], 'user', 'project-b'))
+        self.assertEqual(
+            [], self._get_v3_catalog_urls(service['id'], 'user', None))
+
+    @tests.skip_if_cache_disabled('catalog')
+    def test_compiled_catalog_is_invalidated_on_change(self):
+        service, endpoint = self._create_service_with_endpoint(
+            'http://localhost/')
+        self.assertEqual(
+            ['http://localhost/'],
+            self._get_v3_catalog_urls(service['id'], 'user', 'project'))
+
+        # Updating the endpoint bypassing the catalog api does not send a
+        # notification, so the compiled catalog is still used.
+        self.catalog_api.driver.update_endpoint(endpoint['id'],
+                                                {'url': 'http://other/'})
+        self.assertEqual(
+            ['http://localhost/'],
+            self._get_v3_catalog_urls(service['id'], 'user', 'project'))
+
+        self.catalog_api.update_endpoint(endpoint['id'],
+                                         {'url': 'http://another/'})
+        self.assertEqual(
+            ['http://another/'],
+            self._get_v3_catalog_urls(service['id'], 'user', 'project'))
+
     def test_get_catalog_with_empty_public_url(self):
         service = {
             'id': uuid.uuid4().hex,
@@ -732,7 +950,145 @@ class SqlPolicy(SqlTests, test_backend.PolicyTests):
 
 
 class SqlInheritance(SqlTests, test_backend.InheritanceTests):
-    pass
+
+    def _create_effective_roles_fixture(self):
+        domain = {'id': uuid.uuid4().hex, 'name': uuid.uuid4().hex}
+        self.resource_api.create_domain(domain['id'], domain)
+        projects = []
+        for parent_id in (None, 0, 1, 0):
+            project = {'id': uuid.uuid4().hex,
+                       'name': uuid.uuid4().hex,
+                       'domain_id': domain['id'],
+                       'parent_id': (None if parent_id is None
+                                     else projects[parent_id]['id'])}
+            self.resource_api.create_project(project['id'], project)
+            projects.append(project)
+        roles = []
+        for i in range(4):
+            role = {'id': uuid.uuid4().hex, 'name': uuid.uuid4().hex}
+            self.role_api.create_role(role['id'], role)
+            roles.append(role)
+        return domain, projects, roles
+
+    def _get_roles_per_source(self, user_id, project_id):
+        with mock.patch.object(
+                self.assignment_api.driver,
+                'list_role_ids_for_user_on_project',
+                side_effect=exception.NotImplemented()):
+            return self.assignment_api.get_roles_for_user_and_project(
+                user_id, project_id)
+
+    def test_effective_roles_match_per_source_resolution(self):
+        self.config_fixture.config(group='os_inherit', enabled=True)
+        domain, projects, roles = self._create_effective_roles_fixture()
+        generator = random.Random(1234)
+
+        for trial in range(20):
+            user = {'name': uuid.uuid4().hex,
+                    'domain_id': domain['id'],
+                    'password': uuid.uuid4().hex}
+            user = self.identity_api.create_user(user)
+            actors = [{'user_id': user['id']}]
+            for i in range(3):
+                group = {'name': uuid.uuid4().hex,
+                         'domain_id': domain['id']}
+                group = self.identity_api.create_group(group)
+                actors.append({'group_id': group['id']})
+                if i < 2:
+                    self.identity_api.add_user_to_group(user['id'],
+                                                        group['id'])
+
+            targets = [{'domain_id': domain['id']}]
+            targets += [{'project_id': project['id']}
+                        for project in projects]
+            for i in range(generator.randint(0, 12)):
+                grant = dict(generator.choice(actors))
+                grant.update(generator.choice(targets))
+                self.assignment_api.create_grant(
+                    generator.choice(roles)['id'],
+                    inherited_to_projects=generator.choice((True, False)),
+                    **grant)
+
+            for os_inherit in (True, False):
+                self.config_fixture.config(group='os_inherit',
+                                           enabled=os_inherit)
+                for project in projects:
+                    self.assertItemsEqual(
+                        self._get_roles_per_source(user['id'],
+                                                   project['id']),
+                        self.assignment_api.get_roles_for_user_and_project(
+                            user['id'], project['id']))
+            self.config_fixture.config(group='os_inherit', enabled=True)
+
+    def _assert_effective_assignments_current(self):
+        expected = self.assignment_api._list_effective_role_assignments(
+            None, None, None, None, None, None)
+        self.assertItemsEqual(
+            expected, self.assignment_api.list_role_assignments(
+                effective=True))
+
+    def test_all_effective_assignments_follow_changes(self):
+        self.config_fixture.config(group='os_inherit', enabled=True)
+        domain, projects, roles = self._create_effective_roles_fixture()
+        user = {'name': uuid.uuid4().hex,
+                'domain_id': domain['id'],
+                'password': uuid.uuid4().hex}
+        user = self.identity_api.create_user(user)
+        group = {'name': uuid.uuid4().hex, 'domain_id': domain['id']}
+        group = self.identity_api.create_group(group)
+        self._assert_effective_assignments_current()
+
+        self.assignment_api.create_grant(
+            roles[0]['id'], group_id=group['id'], domain_id=domain['id'],
+            inherited_to_projects=True)
+        self.assignment_api.create_grant(
+            roles[1]['id'], user_id=user['id'],
+            project_id=projects[1]['id'], inherited_to_projects=True)
+        self._assert_effective_assignments_current()
+
+        self.identity_api.add_user_to_group(user['id'], group['id'])
+        self._assert_effective_assignments_current()
+
+        project = {'id': uuid.uuid4().hex,
+                   'name': uuid.uuid4().hex,
+                   'domain_id': domain['id'],
+                   'parent_id': projects[2]['id']}
+        self.resource_api.create_project(project['id'], project)
+        self._assert_effective_assignments_current()
+
+        self.identity_api.remove_user_from_group(user['id'], group['id'])
+        self._assert_effective_assignments_current()
+
+        self.assignment_api.delete_grant(
+            roles[1]['id'], user_id=user['id'],
+            project_id=projects[1]['id'], inherited_to_projects=True)
+        self._assert_effective_assignments_current()
+
+        self.resource_api.delete_project(project['id'])
+        self.identity_api.delete_group(group['id'])
+        self._assert_effective_assignments_current()
+
+    def test_all_effective_assignments_filtered_by_role(self):
+        domain, projects, roles = self._create_effective_roles_fixture()
+        group = {'name': uuid.uuid4().hex, 'domain_id': domain['id']}
+        group = self.identity_api.create_group(group)
+        for role in roles[:2]:
+            self.assignment_api.create_grant(
+                role['id'], group_id=group['id'],
+                project_id=projects[0]['id'])
+        user = {'name': uuid.uuid4().hex,
+                'domain_id': domain['id'],
+                'password': uuid.uuid4().hex}
+        user = self.identity_api.create_user(user)
+        self.identity_api.add_user_to_group(user['id'], group['id'])
+
+        refs = self.assignment_api.list_role_assignments(
+            role_id=roles[0]['id'], effective=True)
+        self.assertEqual([{'user_id': user['id'],
+                           'project_id': projects[0]['id'],
+                           'role_id': roles[0]['id'],
+                           'indirect': {'group_id': group['id']}}],
+                         refs)
 
 
 class SqlTokenCacheInvalidation(SqlTests, test_backend.TokenCacheInvalidation):
@@ -12,11 +12,13 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import datetime
 import os
 import uuid
 
 import mock
 from oslo_config import cfg
+from oslo_utils import timeutils
 from six.moves import range
 
 from keystone.cmd import cli
@@ -25,6 +27,7 @@ from keystone.i18n import _
 from keystone import resource
 from keystone.tests import unit as tests
 from keystone.tests.unit.ksfixtures import database
+from keystone.token.persistence.backends import sql as token_sql
 
 
 CONF = cfg.CONF
@@ -32,15 +35,66 @@ CONF = cfg.CONF
 
 class CliTestCase(tests.SQLDriverOverrides, tests.TestCase):
     def config_files(self):
+        self.config_fixture.register_cli_opt(cli.command_opt)
+        self.addCleanup(self.cleanup)
         config_files = super(CliTestCase, self).config_files()
         config_files.append(tests.dirs.tests_conf('backend_sql.conf'))
         return config_files
 
+    def cleanup(self):
+        CONF.reset()
+        CONF.unregister_opt(cli.command_opt)
+
+    def config(self, config_files):
+        CONF(args=['token_flush'], project='keystone',
+             default_config_files=config_files)
+
     def test_token_flush(self):
         self.useFixture(database.Database())
         self.load_backends()
         cli.TokenFlush.main()
 
+    def test_token_flush_in_batches(self):
+        self.useFixture(database.Database())
+        self.load_backends()
+        persistence = self.token_provider_api._persistence
+        expires = timeutils.utcnow() - datetime.timedelta(minutes=1)
+        for i in range(5):
+            token_id = uuid.uuid4().hex
+            persistence.create_token(token_id, {
+                'id': token_id, 'expires': expires, 'trust_id': None,
+                'user': {'id': 'testuserid'}})
+
+        with mock.patch('__builtin__.print') as mock_print:
+            cli.TokenFlush.flush(batch_size=2)
+        # Progress is printed after two full batches and a final partial one.
+        self.assertEqual(3, mock_print.call_count)
+        self.assertEqual(0, persistence.driver.flush_expired_tokens_batch(2))
+
+    def test_token_flush_deadline(self):
+        self.useFixture(database.Database())
+        self.load_backends()
+        with mock.patch.object(token_sql.Token, 'flush_expired_tokens_batch',
+                               return_value=2) as flush_batch:
+            with mock.patch('__builtin__.print'):
+                cli.TokenFlush.flush(batch_size=2, deadline=0)
+        self.assertEqual(1, flush_batch.call_count)
+
+    def test_token_flush_rejects_future_expired_before(self):
+        self.useFixture(database.Database())
+        self.load_backends()
+        persistence = self.token_provider_api._persistence
+        expires = timeutils.utcnow() + datetime.timedelta(hours=1)
+        token_id = uuid.uuid4().hex
+        persistence.create_token(token_id, {
+            'id': token_id, 'expires': expires, 'trust_id': None,
+            'user': {'id': 'testuserid'}})
+
+        self.assertRaises(
+            SystemExit, cli.TokenFlush.flush, batch_size=2,
+            expired_before=expires + datetime.timedelta(minutes=1))
+        self.assertIsNotNone(persistence.get_token(token_id))
+
 
 class CliDomainConfigAllTestCase(tests.SQLDriverOverrides, tests.TestCase):
 
@@ -168,6 +168,146 @@ class PolicyTestCase(BasePolicyTestCase):
         rules.enforce(admin_credentials, uppercase_action, self.target)
 
 
+class PolicyDecisionCacheTestCase(BasePolicyTestCase):
+    def setUp(self):
+        super(PolicyDecisionCacheTestCase, self).setUp()
+        rules.init()
+        self.rules = {
+            "example:allowed": [],
+            "example:denied": [["false:false"]],
+            "example:get_http": [["http:http://www.example.com"]],
+            "example:my_file": [["role:compute_admin"],
+                                ["project_id:%(project_id)s"]],
+        }
+        self._set_rules()
+        self.credentials = {'project_id': 'fake', 'roles': ['member']}
+
+    def config_overrides(self):
+        super(PolicyDecisionCacheTestCase, self).config_overrides()
+        self.config_fixture.config(group='policy', decision_cache_size=2)
+
+    def _set_rules(self):
+        these_rules = common_policy.Rules.from_dict(self.rules)
+        rules._ENFORCER.set_rules(these_rules)
+
+    def _enforce_counting(self, action, target, credentials=None):
+        """Enforce the action, returning the cache hits and misses it made."""
+        hits, misses = rules._DECISIONS.hits, rules._DECISIONS.misses
+        rules.enforce(credentials or self.credentials, action, target)
+        return (rules._DECISIONS.hits - hits,
+                rules._DECISIONS.misses - misses)
+
+    def test_decision_is_cached(self):
+        action = "example:my_file"
+        self.assertEqual((0, 1), self._enforce_counting(
+            action, {'project_id': 'fake'}))
+        self.assertEqual((1, 0), self._enforce_counting(
+            action, {'project_id': 'fake'}))
+
+        # A different target or different credentials is a different key.
+        self.assertRaises(exception.ForbiddenAction, self._enforce_counting,
+                          action, {'project_id': 'another'})
+        self.assertEqual((0, 1), self._enforce_counting(
+            action, {'project_id': 'fake'},
+            credentials={'project_id': 'fake', 'roles': ['compute_admin']}))
+
+    def test_denied_decision_is_cached(self):
+        action = "example:denied"
+        self.assertRaises(exception.ForbiddenAction, rules.enforce,
+                          self.credentials, action, {})
+        hits = rules._DECISIONS.hits
+        self.assertRaises(exception.ForbiddenAction, rules.enforce,
+                          self.credentials, action, {})
+        self.assertFalse(rules.enforce(self.credentials, action, {},
+                                       do_raise=False))
+        self.assertEqual(hits + 2, rules._DECISIONS.hits)
+
+    def test_cache_is_bounded(self):
+        action = "example:my_file"
+        for project_id in ('a', 'b', 'c'):
+            self._enforce_counting(
+                action, {'project_id': project_id},
+                credentials={'project_id': project_id, 'roles': []})
+        self.assertEqual(2, len(rules._DECISIONS._decisions))
+        # The least recently used decision was evicted.
+        self.assertEqual((0, 1), self._enforce_counting(
+            action, {'project_id': 'a'},
+            credentials={'project_id': 'a', 'roles': []}))
+
+    def test_changed_rules_clear_cache(self):
+        action = "example:allowed"
+        rules.enforce(self.credentials, action, {})
+        self.rules[action] = [["false:false"]]
+        self._set_rules()
+        self.assertRaises(exception.ForbiddenAction, rules.enforce,
+                          self.credentials, action, {})
+
+    def test_unread_attributes_share_decision(self):
+        action = "example:my_file"
+        target = {'project_id': 'fake', 'name': 'one'}
+        credentials = dict(self.credentials, user_id='one')
+        self.assertEqual((0, 1), self._enforce_counting(
+            action, target, credentials=credentials))
+
+        # The rule reads neither the user_id nor the target name.
+        target = {'project_id': 'fake', 'name': 'two'}
+        credentials = dict(self.credentials, user_id='two')
+        self.assertEqual((1, 0), self._enforce_counting(
+            action, target, credentials=credentials))
+
+    def test_http_check_is_not_cached(self):
+        responses = ['True', 'False']
+
+        def fakeurlopen(url, post_data):
+            return six.StringIO(responses.pop(0))
+
+        action = "example:get_http"
+        with mock.patch.object(urlrequest, 'urlopen', fakeurlopen):
+            self.assertEqual((0, 0), self._enforce_counting(action, {}))
+            self.assertRaises(exception.ForbiddenAction, rules.enforce,
+                              self.credentials, action, {})
+
+
+class PolicyCompilerTestCase(tests.BaseTestCase):
+
+    def _compile(self, filename):
+        with open(tests.dirs.etc(filename)) as policy_file:
+            return rules.CompiledRules(
+                common_policy.Rules.load_json(policy_file.read()))
+
+    def test_role_and_credential_dependencies(self):
+        compiled = self._compile('policy.json')
+        deps = compiled.dependencies('identity:list_users')
+        self.assertEqual(frozenset(['roles', 'is_admin']), deps.credentials)
+        self.assertEqual(frozenset(), deps.target)
+        self.assertFalse(deps.constant_for_roles)
+
+    def test_target_dependencies(self):
+        compiled = self._compile('policy.v3cloudsample.json')
+        deps = compiled.dependencies('identity:list_users')
+        self.assertEqual(frozenset(['roles', 'domain_id']), deps.credentials)
+        self.assertEqual(frozenset(['domain_id']), deps.target)
+
+        deps = compiled.dependencies('identity:get_user')
+        self.assertEqual(frozenset(['target.user.domain_id']), deps.target)
+
+    def test_constant_for_roles(self):
+        compiled = self._compile('policy.v3cloudsample.json')
+        self.assertTrue(
+            compiled.dependencies('identity:get_region').constant_for_roles)
+        self.assertTrue(
+            compiled.dependencies('admin_required').constant_for_roles)
+
+    def test_http_check_dependencies_are_unknown(self):
+        compiled = rules.CompiledRules(common_policy.Rules.from_dict({
+            "example:get_http": [["role:admin"],
+                                 ["http:http://www.example.com"]],
+        }))
+        deps = compiled.dependencies('example:get_http')
+        self.assertFalse(deps.cacheable)
+        self.assertIsNone(deps.target)
+
+
 class DefaultPolicyTestCase(BasePolicyTestCase):
     def setUp(self):
         super(DefaultPolicyTestCase, self).setUp()
@@ -169,6 +169,96 @@ class RevokeTests(object):
         # should no longer throw an exception
         self.revoke_api.check_token(token_values)
 
+    def test_revoke_tree_fetches_only_new_events(self):
+        token_values = _sample_blank_token()
+        token_values['user_id'] = _new_id()
+        self.revoke_api.revoke_by_user(_new_id())
+        self.revoke_api.check_token(token_values)
+
+        with mock.patch.object(self.revoke_api.driver, 'list_events',
+                               wraps=self.revoke_api.driver.list_events) as m:
+            self.revoke_api.revoke_by_user(token_values['user_id'])
+            self.assertRaises(exception.TokenNotFound,
+                              self.revoke_api.check_token,
+                              token_values)
+            last_fetch = m.call_args[1]['last_fetch']
+            self.assertIsNotNone(last_fetch)
+
+    def test_revoke_tree_fetch_overlap(self):
+        self.config_fixture.config(group='revoke', fetch_overlap=300)
+        self.revoke_api.revoke_by_user(_new_id())
+        self.revoke_api.check_token(_sample_blank_token())
+        newest = max(e.revoked_at for e in self.revoke_api.list_events())
+
+        self.revoke_api.revoke_by_user(_new_id())
+        with mock.patch.object(self.revoke_api.driver, 'list_events',
+                               return_value=[]) as m:
+            self.revoke_api.check_token(_sample_blank_token())
+        self.assertEqual(newest - datetime.timedelta(seconds=300),
+                         m.call_args[1]['last_fetch'])
+
+    def test_revoke_tree_poll_interval(self):
+        self.config_fixture.config(group='revoke', poll_interval=3600,
+                                   cache_time=86400)
+        token_values = _sample_blank_token()
+        token_values['user_id'] = _new_id()
+        self.revoke_api.check_token(token_values)
+
+        with mock.patch.object(self.revoke_api.driver, 'list_events',
+                               wraps=self.revoke_api.driver.list_events) as m:
+            # The backend is not polled again before the interval is over.
+            self.revoke_api.check_token(token_values)
+            self.assertFalse(m.called)
+
+            # Revocations by another process are picked up once it is.
+            self.revoke_api.driver.revoke(
+                model.RevokeEvent(user_id=token_values['user_id']))
+            self.revoke_api.check_token(token_values)
+            later = timeutils.utcnow() + datetime.timedelta(seconds=3601)
+            with mock.patch.object(timeutils, 'utcnow', return_value=later):
+                self.assertRaises(exception.TokenNotFound,
+                                  self.revoke_api.check_token,
+                                  token_values)
+            self.assertEqual(1, m.call_count)
+
+    def test_revoke_tree_poll_interval_local_revoke(self):
+        self.config_fixture.config(group='revoke', poll_interval=3600)
+        token_values = _sample_blank_token()
+        token_values['user_id'] = _new_id()
+        self.revoke_api.check_token(token_values)
+
+        # Revocations by this process take effect right away.
+        self.revoke_api.revoke_by_user(token_values['user_id'])
+        self.assertRaises(exception.TokenNotFound,
+                          self.revoke_api.check_token,
+                          token_values)
+
+    def test_revoke_tree_without_caching(self):
+        self.config_fixture.config(group='revoke', caching=False,
+                                   poll_interval=3600)
+        token_values = _sample_blank_token()
+        self.revoke_api.check_token(token_values)
+
+        with mock.patch.object(self.revoke_api.driver, 'list_events',
+                               return_value=[]) as m:
+            self.revoke_api.check_token(token_values)
+        m.assert_called_once_with(last_fetch=None)
+
+    def test_revoke_tree_prunes_expired_events(self):
+        token_values = _sample_blank_token()
+        token_values['user_id'] = _new_id()
+        self.revoke_api.revoke_by_user(token_values['user_id'])
+        self.assertRaises(exception.TokenNotFound,
+                          self.revoke_api.check_token,
+                          token_values)
+
+        future = timeutils.utcnow() + datetime.timedelta(
+            seconds=(self.config_fixture.conf.token.expiration +
+                     self.config_fixture.conf.revoke.expiration_buffer + 1))
+        with mock.patch.object(timeutils, 'utcnow', return_value=future):
+            self.config_fixture.config(group='revoke', cache_time=86400)
+            self.revoke_api.check_token(token_values)
+
     def test_revoke_by_expiration_project_and_domain_fails(self):
         user_id = _new_id()
         expires_at = utils.isotime(_future_time(), subsecond=True)
@@ -634,3 +724,31 @@ class RevokeTreeTests(tests.TestCase):
         for event in self.events:
             self.tree.remove_event(event)
         self._assertEmpty(self.tree.revoke_map)
+        self._assertEmpty(self.tree._index)
+
+    def test_compiled_matcher_matches_search(self):
+        user_ids = [_new_id() for i in range(5)]
+        project_ids = [_new_id() for i in range(5)]
+        role_ids = [_new_id() for i in range(5)]
+        domain_ids = [_new_id() for i in range(3)]
+        for i in range(5):
+            self._revoke_by_user(user_ids[i])
+            self._revoke_by_grant(role_ids[i], user_id=user_ids[(i + 1) % 5],
+                                  project_id=project_ids[i])
+            self._revoke_by_project_role_assignment(project_ids[(i + 2) % 5],
+                                                    role_ids[(i + 3) % 5])
+            self._revoke_by_domain_role_assignment(domain_ids[i % 3],
+                                                   role_ids[i])
+
+        for user_id in user_ids + [_new_id()]:
+            for project_id in project_ids + [None]:
+                for role_id in role_ids:
+                    token_data = _sample_blank_token()
+                    token_data['user_id'] = user_id
+                    token_data['project_id'] = project_id
+                    token_data['assignment_domain_id'] = domain_ids[0]
+                    token_data['roles'] = [role_id]
+                    self.assertEqual(
+                        self.tree._search(self.tree.revoke_map,
+                                          model._EVENT_NAMES, token_data),
+                        self.tree.is_revoked(token_data))
@@ -636,6 +636,51 @@ class SqlUpgradeTests(SqlMigrateBase):
                                  'enabled', 'domain_id', 'parent_id',
                                  'is_domain'])
 
+    def test_project_hierarchy_upgrade(self):
+        self.upgrade(74)
+        self.assertTableDoesNotExist('project_hierarchy')
+
+        session = self.Session()
+        domain = {'id': uuid.uuid4().hex,
+                  'name': uuid.uuid4().hex,
+                  'enabled': True}
+        self.insert_dict(session, 'domain', domain)
+        parent_id = None
+        project_ids = []
+        for i in range(3):
+            project = {'id': uuid.uuid4().hex,
+                       'name': uuid.uuid4().hex,
+                       'domain_id': domain['id'],
+                       'parent_id': parent_id}
+            self.insert_dict(session, 'project', project)
+            project_ids.append(project['id'])
+            parent_id = project['id']
+        session.close()
+
+        self.upgrade(75)
+        self.assertTableColumns('project_hierarchy',
+                                ['ancestor_id', 'descendant_id', 'depth'])
+
+        session = self.Session()
+        hierarchy_table = sqlalchemy.Table('project_hierarchy',
+                                           self.metadata, autoload=True)
+        rows = session.execute(hierarchy_table.select().where(
+            hierarchy_table.c.descendant_id == project_ids[2]))
+        self.assertEqual({project_ids[2]: 0, project_ids[1]: 1,
+                          project_ids[0]: 2},
+                         dict((row.ancestor_id, row.depth) for row in rows))
+        session.close()
+
+    def test_widen_user_password_upgrade(self):
+        self.upgrade(75)
+        user_table = sqlalchemy.Table('user', self.metadata, autoload=True)
+        self.assertEqual(128, user_table.c.password.type.length)
+
+        self.upgrade(76)
+        self.metadata.clear()
+        user_table = sqlalchemy.Table('user', self.metadata, autoload=True)
+        self.assertEqual(255, user_table.c.password.type.length)
+
     def populate_user_table(self, with_pass_enab=False,
                             with_pass_enab_domain=False):
         # Populate the appropriate fields in the user
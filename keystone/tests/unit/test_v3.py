@@ -15,6 +15,7 @@
 import datetime
 import uuid
 
+import mock
 from oslo_config import cfg
 from oslo_serialization import jsonutils
 from oslo_utils import timeutils
@@ -1332,6 +1333,46 @@ class AuthContextMiddlewareTestCase(RestfulTestCase):
             self.domain['name'],
             req.environ.get(authorization.AUTH_CONTEXT_ENV)['domain_name'])
 
+    def test_validated_token_kept_in_environment(self):
+        token = self.get_scoped_token()
+        req = self._mock_request_object(token)
+        middleware.AuthContextMiddleware(None).process_request(req)
+        self.assertEqual(1, req.environ[authorization.TOKEN_VALIDATIONS_ENV])
+
+        with mock.patch.object(self.token_provider_api,
+                               'validate_v3_token') as validate_v3_token:
+            token_data = authorization.validate_token(
+                self.token_provider_api, req.environ, token, v3=True)
+        self.assertFalse(validate_v3_token.called)
+        self.assertEqual(self.user['id'], token_data['token']['user']['id'])
+        self.assertEqual(1, req.environ[authorization.TOKEN_VALIDATIONS_ENV])
+
+    def test_token_validated_once_per_request(self):
+        token = self.get_scoped_token()
+        validate_token = mock.patch.object(
+            self.token_provider_api, 'validate_token',
+            wraps=self.token_provider_api.validate_token).start()
+        validate_v3_token = mock.patch.object(
+            self.token_provider_api, 'validate_v3_token',
+            wraps=self.token_provider_api.validate_v3_token).start()
+        self.addCleanup(mock.patch.stopall)
+
+        # The auth token is also the subject token, which is read by RBAC
+        # and then validated by the controller.
+        self.head('/auth/tokens', headers={'X-Subject-Token': token},
+                  token=token, expected_status=200)
+        self.assertEqual(1, validate_token.call_count +
+                         validate_v3_token.call_count)
+
+    def test_invalid_token_not_kept(self):
+        environment = {}
+        token = uuid.uuid4().hex
+        for i in range(2):
+            self.assertRaises(exception.TokenNotFound,
+                              authorization.validate_token,
+                              self.token_provider_api, environment, token)
+        self.assertEqual(2, environment[authorization.TOKEN_VALIDATIONS_ENV])
+
 
 class JsonHomeTestMixin(object):
     """JSON Home test
@@ -421,6 +421,31 @@ class TokenAPITests(object):
             headers={'X-Subject-Token': v3_token})
         self.assertValidProjectScopedTokenResponse(r, require_catalog=False)
 
+    def test_validate_tokens(self):
+        scoped_token = self.get_requested_token(
+            self.build_authentication_request(
+                user_id=self.user['id'],
+                password=self.user['password'],
+                project_id=self.project['id']))
+        revoked_token = self.get_requested_token(
+            self.build_authentication_request(
+                user_id=self.user['id'],
+                password=self.user['password']))
+        self.delete('/auth/tokens',
+                    headers={'X-Subject-Token': revoked_token})
+        invalid_token = uuid.uuid4().hex
+
+        tokens = self.token_provider_api.validate_tokens(
+            [self.v3_token, scoped_token, revoked_token, invalid_token])
+
+        self.assertEqual(
+            self.token_provider_api.validate_token(self.v3_token),
+            tokens[self.v3_token])
+        self.assertEqual(self.project['id'],
+                         tokens[scoped_token]['token']['project']['id'])
+        self.assertIsNone(tokens[revoked_token])
+        self.assertIsNone(tokens[invalid_token])
+
 
 class AllowRescopeScopedTokenDisabledTests(test_v3.RestfulTestCase):
     def config_overrides(self):
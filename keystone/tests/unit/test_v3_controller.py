@@ -14,10 +14,12 @@
 
 import uuid
 
+import mock
 import six
 from six.moves import range
 from testtools import matchers
 
+from keystone.common import authorization
 from keystone.common import controller
 from keystone import exception
 from keystone.tests import unit as tests
@@ -51,3 +53,47 @@ class V3ControllerTestCase(tests.TestCase):
         self.assertThat(ex_msg, matchers.Contains(self.api.__class__.__name__))
         for key in ref.keys():
             self.assertThat(ex_msg, matchers.Contains(key))
+
+
+class ProtectedTestCase(tests.TestCase):
+    """Tests for the protected decorator."""
+    def setUp(self):
+        super(ProtectedTestCase, self).setUp()
+
+        class ControllerUnderTest(controller.V3Controller):
+            member_name = 'user'
+
+            @controller.protected()
+            def get_user(self, context, user_id):
+                return user_id
+
+        self.api = ControllerUnderTest()
+        self.api.policy_api = mock.Mock()
+        self.user = {'id': uuid.uuid4().hex, 'domain_id': uuid.uuid4().hex}
+        self.api.get_member_from_driver = mock.Mock(return_value=self.user)
+        self.context = {
+            'is_admin': False,
+            'environment': {authorization.AUTH_CONTEXT_ENV: {'roles': []}}}
+
+    def _get_user(self, target_attributes):
+        self.api.policy_api.get_target_attributes.return_value = (
+            target_attributes)
+        self.api.get_user(self.context, user_id=self.user['id'])
+        return self.api.policy_api.enforce.call_args[0][2]
+
+    def test_target_built_when_rule_reads_it(self):
+        target = self._get_user(frozenset(['target.user.domain_id']))
+        self.api.get_member_from_driver.assert_called_once_with(
+            self.user['id'])
+        self.assertEqual(self.user['domain_id'],
+                         target['target.user.domain_id'])
+
+    def test_target_built_when_attributes_unknown(self):
+        self._get_user(None)
+        self.api.get_member_from_driver.assert_called_once_with(
+            self.user['id'])
+
+    def test_target_skipped_when_rule_does_not_read_it(self):
+        target = self._get_user(frozenset(['user_id']))
+        self.assertFalse(self.api.get_member_from_driver.called)
+        self.assertEqual({'user_id': self.user['id']}, target)
@@ -34,6 +34,7 @@ if not xmldsig:
 from keystone.auth import controllers as auth_controllers
 from keystone.contrib.federation import controllers as federation_controllers
 from keystone.contrib.federation import idp as keystone_idp
+from keystone.contrib.federation import utils as mapping_utils
 from keystone import exception
 from keystone import notifications
 from keystone.tests.unit import core
@@ -1472,6 +1473,26 @@ class FederatedTokenTests(FederationTests, FederatedSetupMixin):
             'send_saml_audit_notification',
             fake_saml_notify))
 
+    def test_evaluate_reuses_compiled_rules_until_mapping_update(self):
+        assertion = mapping_fixtures.EMPLOYEE_ASSERTION
+        mapping_id = self.mapping['id']
+
+        self.federation_api.evaluate(self.IDP, self.PROTOCOL, assertion)
+        rule_processor = self.federation_api._rule_processors[mapping_id]
+        self.federation_api.evaluate(self.IDP, self.PROTOCOL, assertion)
+        self.assertIs(rule_processor,
+                      self.federation_api._rule_processors[mapping_id])
+
+        self.federation_api.update_mapping(mapping_id,
+                                           mapping_fixtures.MAPPING_SMALL)
+        self.assertNotIn(mapping_id, self.federation_api._rule_processors)
+        mapped_properties, _ = self.federation_api.evaluate(
+            self.IDP, self.PROTOCOL, assertion)
+        self.assertEqual(
+            mapping_utils.RuleProcessor(
+                mapping_fixtures.MAPPING_SMALL['rules']).process(assertion),
+            mapped_properties)
+
     def _assert_last_notify(self, action, identity_provider, protocol,
                             user_id=None):
         self.assertTrue(self._notifications)
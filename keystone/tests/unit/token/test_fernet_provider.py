@@ -15,9 +15,12 @@ import hashlib
 import os
 import uuid
 
+from cryptography import fernet as cryptography_fernet
+import mock
 from oslo_utils import timeutils
 
 from keystone.common import config
+from keystone.common import environment
 from keystone.common import utils
 from keystone import exception
 from keystone.tests import unit as tests
@@ -387,6 +390,136 @@ class TestPayloads(tests.TestCase):
         self.assertDictEqual(exp_federated_info, federated_info)
 
 
+class TestPackedPayloads(tests.TestCase):
+    def setUp(self):
+        super(TestPackedPayloads, self).setUp()
+        self.useFixture(ksfixtures.KeyRepository(self.config_fixture))
+        self.formatter = token_formatters.TokenFormatter()
+
+    def _assertPackedRoundTrip(self, domain_id=None, project_id=None):
+        exp_user_id = uuid.uuid4().hex
+        exp_methods = ['password']
+        exp_expires_at = utils.isotime(timeutils.utcnow(), subsecond=True)
+        exp_audit_ids = [provider.random_urlsafe_str(),
+                         provider.random_urlsafe_str()]
+
+        payload = token_formatters.PackedPayload.assemble(
+            exp_user_id, exp_methods, domain_id, project_id, exp_expires_at,
+            exp_audit_ids)
+        self.assertTrue(token_formatters.PackedPayload.is_packed(payload))
+
+        (user_id, methods, actual_domain_id, actual_project_id, expires_at,
+         audit_ids) = token_formatters.PackedPayload.disassemble(payload)
+
+        self.assertEqual(exp_user_id, user_id)
+        self.assertEqual(exp_methods, methods)
+        self.assertEqual(domain_id, actual_domain_id)
+        self.assertEqual(project_id, actual_project_id)
+        self.assertEqual(exp_expires_at, expires_at)
+        self.assertEqual(exp_audit_ids, audit_ids)
+
+    def test_unscoped_payload(self):
+        self._assertPackedRoundTrip()
+
+    def test_domain_scoped_payload(self):
+        self._assertPackedRoundTrip(domain_id=uuid.uuid4().hex)
+
+    def test_project_scoped_payload(self):
+        self._assertPackedRoundTrip(project_id=uuid.uuid4().hex)
+
+    def test_non_uuid_ids_are_not_packed(self):
+        expires_at = utils.isotime(timeutils.utcnow(), subsecond=True)
+        audit_ids = [provider.random_urlsafe_str()]
+
+        self.assertIsNone(token_formatters.PackedPayload.assemble(
+            uuid.uuid4().hex, ['password'], CONF.identity.default_domain_id,
+            None, expires_at, audit_ids))
+        self.assertIsNone(token_formatters.PackedPayload.assemble(
+            'user_id_that_is_not_a_uuid', ['password'], None,
+            uuid.uuid4().hex, expires_at, audit_ids))
+
+    def _create_and_validate(self, **kwargs):
+        user_id = uuid.uuid4().hex
+        expires_at = utils.isotime(timeutils.utcnow(), subsecond=True)
+        audit_ids = [provider.random_urlsafe_str()]
+        token = self.formatter.create_token(
+            user_id, expires_at, audit_ids, methods=['password'], **kwargs)
+
+        (actual_user_id, methods, actual_audit_ids, domain_id, project_id,
+         trust_id, federated_info, created_at, actual_expires_at) = (
+            self.formatter.validate_token(token))
+        self.assertEqual(user_id, actual_user_id)
+        self.assertEqual(['password'], methods)
+        self.assertEqual(audit_ids, actual_audit_ids)
+        self.assertEqual(kwargs.get('domain_id'), domain_id)
+        self.assertEqual(kwargs.get('project_id'), project_id)
+        self.assertEqual(expires_at, actual_expires_at)
+        return self.formatter.unpack(token)
+
+    def test_tokens_are_packed_when_enabled(self):
+        self.config_fixture.config(group='fernet_tokens',
+                                   packed_payloads=True)
+        payload = self._create_and_validate(project_id=uuid.uuid4().hex)
+        self.assertTrue(token_formatters.PackedPayload.is_packed(payload))
+
+    def test_msgpack_tokens_validate_when_enabled(self):
+        project_id = uuid.uuid4().hex
+        token = self.formatter.create_token(
+            uuid.uuid4().hex, utils.isotime(timeutils.utcnow()),
+            [provider.random_urlsafe_str()], methods=['password'],
+            project_id=project_id)
+        self.assertFalse(token_formatters.PackedPayload.is_packed(
+            self.formatter.unpack(token)))
+
+        self.config_fixture.config(group='fernet_tokens',
+                                   packed_payloads=True)
+        self.assertEqual(project_id, self.formatter.validate_token(token)[4])
+
+    def test_default_domain_tokens_use_msgpack(self):
+        self.config_fixture.config(group='fernet_tokens',
+                                   packed_payloads=True)
+        payload = self._create_and_validate(
+            domain_id=CONF.identity.default_domain_id)
+        self.assertFalse(token_formatters.PackedPayload.is_packed(payload))
+
+
+class TestHintedMultiFernet(tests.TestCase):
+    def setUp(self):
+        super(TestHintedMultiFernet, self).setUp()
+        keys = [cryptography_fernet.Fernet.generate_key() for i in range(3)]
+        self.fernets = [cryptography_fernet.Fernet(key) for key in keys]
+        self.crypto = token_formatters.HintedMultiFernet(self.fernets)
+
+    def test_encrypt_with_primary_key(self):
+        token = self.crypto.encrypt(b'payload')
+        self.assertEqual(b'payload', self.fernets[0].decrypt(token))
+
+    def test_decrypt_with_any_key(self):
+        for fernet_instance in self.fernets:
+            token = fernet_instance.encrypt(b'payload')
+            self.assertEqual(b'payload', self.crypto.decrypt(token))
+        self.assertEqual([1, 1, 1], self.crypto.successes)
+
+    def test_decrypt_tries_last_successful_key_first(self):
+        tokens = [self.fernets[1].encrypt(b'payload') for i in range(3)]
+        self.crypto.decrypt(tokens[0])
+
+        with mock.patch.object(self.fernets[0], 'decrypt',
+                               wraps=self.fernets[0].decrypt) as primary:
+            for token in tokens[1:]:
+                self.assertEqual(b'payload', self.crypto.decrypt(token))
+        self.assertFalse(primary.called)
+        self.assertEqual([0, 3, 0], self.crypto.successes)
+
+    def test_decrypt_unknown_key(self):
+        other_fernet = cryptography_fernet.Fernet(
+            cryptography_fernet.Fernet.generate_key())
+        self.assertRaises(cryptography_fernet.InvalidToken,
+                          self.crypto.decrypt,
+                          other_fernet.encrypt(b'payload'))
+        self.assertEqual([0, 0, 0], self.crypto.successes)
+
+
 class TestFernetKeyRotation(tests.TestCase):
     def setUp(self):
         super(TestFernetKeyRotation, self).setUp()
@@ -521,3 +654,68 @@ class TestLoadKeys(tests.TestCase):
         keys = fernet_utils.load_keys()
         self.assertEqual(2, len(keys))
         self.assertTrue(len(keys[0]))
+
+
+class TestKeyCache(tests.TestCase):
+    def setUp(self):
+        super(TestKeyCache, self).setUp()
+        self.useFixture(ksfixtures.KeyRepository(self.config_fixture))
+        self.key_cache = fernet_utils.KeyCache()
+        self.age_key_repository()
+
+    def age_key_repository(self):
+        # Changes made within a second of loading the keys are not trusted,
+        # so make the key repository look like it was last modified a while
+        # ago.
+        mtime = os.stat(CONF.fernet_tokens.key_repository).st_mtime - 60
+        os.utime(CONF.fernet_tokens.key_repository, (mtime, mtime))
+
+    def test_keys_are_cached(self):
+        keys = self.key_cache.load_keys()
+        self.assertEqual(fernet_utils.load_keys(), keys)
+        self.assertIs(keys, self.key_cache.load_keys())
+        self.assertEqual(1, self.key_cache.hits)
+        self.assertEqual(1, self.key_cache.reloads)
+
+    def test_rotation_reloads_keys(self):
+        keys = self.key_cache.load_keys()
+        fernet_utils.rotate_keys()
+        self.age_key_repository()
+        rotated_keys = self.key_cache.load_keys()
+        self.assertEqual(fernet_utils.load_keys(), rotated_keys)
+        self.assertNotEqual(keys, rotated_keys)
+        self.assertEqual(0, self.key_cache.hits)
+        self.assertEqual(2, self.key_cache.reloads)
+
+    def test_recently_modified_repository_is_reloaded(self):
+        self.key_cache.load_keys()
+        fernet_utils.rotate_keys()
+        self.key_cache.load_keys()
+        self.key_cache.load_keys()
+        self.assertEqual(0, self.key_cache.hits)
+        self.assertEqual(3, self.key_cache.reloads)
+
+    def test_invalidate(self):
+        keys = self.key_cache.load_keys()
+        self.key_cache.invalidate()
+        self.assertEqual(keys, self.key_cache.load_keys())
+        self.assertEqual(0, self.key_cache.hits)
+        self.assertEqual(2, self.key_cache.reloads)
+
+    def test_server_reset_reloads_keys(self):
+        key_cache = fernet_utils.KEY_CACHE
+        key_cache.load_keys()
+        reloads = key_cache.reloads
+        environment.reset()
+        key_cache.load_keys()
+        self.assertEqual(reloads + 1, key_cache.reloads)
+
+    def test_formatter_reuses_crypto(self):
+        fernet_utils.KEY_CACHE.invalidate()
+        formatter = token_formatters.TokenFormatter()
+        crypto = formatter.crypto
+        self.assertIs(crypto, formatter.crypto)
+
+        fernet_utils.rotate_keys()
+        self.age_key_repository()
+        self.assertIsNot(crypto, formatter.crypto)
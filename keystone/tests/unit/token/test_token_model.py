@@ -262,3 +262,62 @@ class TestKeystoneTokenModel(core.TestCase):
                           token_model.KeystoneToken,
                           token_id=uuid.uuid4().hex,
                           token_data=self.v3_sample_token)
+
+
+class TestKeystoneTokenView(core.TestCase):
+    def setUp(self):
+        super(TestKeystoneTokenView, self).setUp()
+        self.v2_sample_token = copy.deepcopy(
+            test_token_provider.SAMPLE_V2_TOKEN)
+        self.v3_sample_token = copy.deepcopy(
+            test_token_provider.SAMPLE_V3_TOKEN)
+
+    def _assert_matches_token_model(self, token_data):
+        token_id = uuid.uuid4().hex
+        token = token_model.KeystoneToken(token_id, token_data)
+        view = token_model.KeystoneTokenView(token_id, token_data)
+        self.assertIs(token.version, view.version)
+        self.assertEqual(token.short_id, view.short_id)
+        self.assertEqual(dict(token), dict(view.items()))
+        for name, attribute in vars(token_model.KeystoneToken).items():
+            if not isinstance(attribute, property):
+                continue
+            try:
+                expected = getattr(token, name)
+            except (exception.UnexpectedError, NotImplementedError) as e:
+                self.assertRaises(type(e), getattr, view, name)
+            else:
+                self.assertEqual(expected, getattr(view, name), name)
+
+    def test_token_view_v2(self):
+        self._assert_matches_token_model(self.v2_sample_token)
+
+    def test_token_view_v3(self):
+        self._assert_matches_token_model(self.v3_sample_token)
+
+    def test_token_view_does_not_copy(self):
+        view = token_model.KeystoneTokenView(uuid.uuid4().hex,
+                                             self.v3_sample_token)
+        self.assertIs(self.v3_sample_token['token']['user'], view['user'])
+        self.assertFalse(hasattr(view, '__dict__'))
+
+    def test_token_view_caches_accessors(self):
+        view = token_model.KeystoneTokenView(uuid.uuid4().hex,
+                                             self.v3_sample_token)
+        user_id = view.user_id
+        self.v3_sample_token['token']['user']['id'] = uuid.uuid4().hex
+        self.assertEqual(user_id, view.user_id)
+
+    def test_token_view_unknown(self):
+        self.assertRaises(exception.UnsupportedTokenVersionException,
+                          token_model.KeystoneTokenView,
+                          token_id=uuid.uuid4().hex,
+                          token_data={'bogus_data': uuid.uuid4().hex})
+
+    def test_token_view_dual_scoped_token(self):
+        self.v3_sample_token['token']['domain'] = {'id': uuid.uuid4().hex,
+                                                   'name': uuid.uuid4().hex}
+        self.assertRaises(exception.UnexpectedError,
+                          token_model.KeystoneTokenView,
+                          token_id=uuid.uuid4().hex,
+                          token_data=self.v3_sample_token)
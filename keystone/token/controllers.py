@@ -23,6 +23,7 @@ from oslo_serialization import jsonutils
 from oslo_utils import timeutils
 import six
 
+from keystone.common import authorization
 from keystone.common import controller
 from keystone.common import dependency
 from keystone.common import wsgi
@@ -182,7 +183,9 @@ class Auth(controller.V2Controller):
         try:
             token_model_ref = token_model.KeystoneToken(
                 token_id=old_token,
-                token_data=self.token_provider_api.validate_token(old_token))
+                token_data=authorization.validate_token(
+                    self.token_provider_api, context.get('environment'),
+                    old_token))
         except exception.NotFound as e:
             raise exception.Unauthorized(e)
 
@@ -399,7 +402,7 @@ class Auth(controller.V2Controller):
 
         return (tenant_ref, role_list)
 
-    def _get_token_ref(self, token_id, belongs_to=None):
+    def _get_token_ref(self, context, token_id, belongs_to=None):
         """Returns a token if a valid one exists.
 
         Optionally, limited to a token owned by a specific tenant.
@@ -407,7 +410,9 @@ class Auth(controller.V2Controller):
         """
         token_ref = token_model.KeystoneToken(
             token_id=token_id,
-            token_data=self.token_provider_api.validate_token(token_id))
+            token_data=authorization.validate_token(
+                self.token_provider_api, context.get('environment'),
+                token_id))
         if belongs_to:
             if not token_ref.project_scoped:
                 raise exception.Unauthorized(
@@ -478,7 +483,7 @@ class Auth(controller.V2Controller):
         """Return a list of endpoints available to the token."""
         self.assert_admin(context)
 
-        token_ref = self._get_token_ref(token_id)
+        token_ref = self._get_token_ref(context, token_id)
 
         catalog_ref = None
         if token_ref.project_id:
@@ -14,6 +14,7 @@
 # under the License.
 
 from __future__ import absolute_import
+import calendar
 import copy
 
 from oslo_config import cfg
@@ -44,6 +45,13 @@ class Token(token.persistence.Driver):
     revocation_key = 'revocation-list'
     kvs_backend = 'openstack.kvs.Memory'
 
+    # NOTE: The per-user token indexes and the revocation list are split into
+    # buckets of entries for tokens that expire within the same interval of
+    # this many seconds. Adding an entry only rewrites the bucket it belongs
+    # to, and buckets are dropped as a whole once every token in them has
+    # expired.
+    index_bucket_seconds = 300
+
     def __init__(self, backing_store=None, **kwargs):
         super(Token, self).__init__()
         self._store = kvs.get_key_value_store('token-driver')
@@ -137,11 +145,149 @@ class Token(token.persistence.Driver):
 
         return data_copy
 
+    def _index_bucket(self, expires):
+        """Return the index bucket of a token expiring at ``expires``."""
+        return (calendar.timegm(expires.timetuple()) //
+                self.index_bucket_seconds)
+
+    def _prefix_bucketed_index(self, index_key):
+        return 'buckets-%s' % index_key
+
+    def _prefix_index_bucket(self, index_key, bucket):
+        return 'bucket-%d-%s' % (bucket, index_key)
+
+    def _get_index(self, key, index_type):
+        index = self._get_key_or_default(key, default=index_type())
+        if not isinstance(index, index_type):
+            # NOTE(morganfainberg): In the case that the index is not in a
+            # format we understand, reinitialize it. This is an attempt to not
+            # allow the index (e.g. the revocation list) to be completely
+            # broken if somehow the key is changed outside of keystone (e.g.
+            # memcache that is shared by multiple applications). Logging
+            # occurs at error level so that the cloud administrators have some
+            # awareness that the index needed to be cleared out. In all, this
+            # should be recoverable. Keystone cannot control external
+            # applications from changing a key in some backends, however, it
+            # is possible to gracefully handle and notify of this event.
+            LOG.error(_LE('Reinitializing `%(key)s` due to error in loading '
+                          'it from backend.  Expected `%(expected)s` type got '
+                          '`%(type)s`. Old data: %(data)r'),
+                      {'key': key, 'expected': index_type.__name__,
+                       'type': type(index), 'data': index})
+            index = index_type()
+        return index
+
+    def _get_index_entries(self, index_key):
+        """Return the entries of the unexpired buckets of an index."""
+        legacy_entries = self._get_index(index_key, list)
+        if CONF.token.legacy_kvs_indexes:
+            # NOTE: Every node writes the index in the format of earlier
+            # releases, a list of all its entries, so that list is complete.
+            return legacy_entries
+
+        index = self._get_index(self._prefix_bucketed_index(index_key), dict)
+        current_bucket = self._index_bucket(self._get_current_time())
+        entries = []
+        for bucket in index.get('buckets', []):
+            if bucket < current_bucket:
+                continue
+            bucket_key = self._prefix_index_bucket(index_key, bucket)
+            entries.extend(self._get_key_or_default(bucket_key, default=[]))
+        if legacy_entries:
+            # NOTE: A list left by earlier releases is migrated into the
+            # buckets the next time an entry is added to the index.
+            seen = set(self._index_entry_key(e) for e in entries)
+            entries.extend(e for e in legacy_entries
+                           if self._index_entry_key(e) not in seen)
+        return entries
+
+    @staticmethod
+    def _index_entry_key(entry):
+        """Return a hashable key identifying an index entry."""
+        if isinstance(entry, dict):
+            # NOTE: Revocation list entries are dicts of the token's id and
+            # expiry, user token list entries are (token_id, expires) pairs.
+            return entry.get('id'), entry.get('expires')
+        try:
+            return tuple(entry)
+        except TypeError:
+            return entry
+
+    def _add_to_index(self, index_key, entries, parse_expires, lock):
+        """Add entries to an index split into buckets by expiry.
+
+        Must be called holding ``lock`` on ``index_key``, which also guards
+        the index's buckets. Only the buckets the new entries belong to are
+        read and rewritten; expired buckets are dropped without being read.
+        ``parse_expires`` returns the expiry of an entry, and raises
+        ValueError or TypeError for entries that should be dropped.
+
+        The index is also kept as a list of all its entries under
+        ``index_key``, which is what earlier releases read and write, while
+        ``[token] legacy_kvs_indexes`` is enabled during an upgrade.
+        """
+        current_time = self._get_current_time()
+        current_bucket = self._index_bucket(current_time)
+        legacy_entries = self._get_index(index_key, list)
+        if CONF.token.legacy_kvs_indexes:
+            live_entries = []
+            for entry in legacy_entries + list(entries):
+                try:
+                    if parse_expires(entry) < current_time:
+                        continue
+                except (TypeError, ValueError):
+                    continue
+                live_entries.append(entry)
+            self._set_key(index_key, live_entries, lock)
+        elif legacy_entries:
+            # NOTE: Migrate the list left by earlier releases by adding its
+            # entries to the buckets alongside the new ones.
+            entries = legacy_entries + list(entries)
+            self._store.delete(index_key, lock)
+
+        bucketed_index_key = self._prefix_bucketed_index(index_key)
+        buckets = self._get_index(bucketed_index_key, dict).get('buckets', [])
+
+        additions = {}
+        for entry in entries:
+            try:
+                expires = parse_expires(entry)
+            except (TypeError, ValueError):
+                continue
+            bucket = self._index_bucket(expires)
+            if bucket >= current_bucket:
+                additions.setdefault(bucket, []).append(entry)
+
+        live_buckets = set(b for b in buckets if b >= current_bucket)
+        expired_buckets = [b for b in buckets if b < current_bucket]
+        if expired_buckets:
+            self._store.delete_multi(
+                [self._prefix_index_bucket(index_key, b)
+                 for b in expired_buckets])
+
+        for bucket, bucket_entries in additions.items():
+            bucket_key = self._prefix_index_bucket(index_key, bucket)
+            if bucket in live_buckets:
+                existing = self._get_key_or_default(bucket_key, default=[])
+                # NOTE: Entries migrated from the legacy list may already be
+                # in their bucket, if they were written to both.
+                seen = set(self._index_entry_key(e) for e in existing)
+                bucket_entries = existing + [
+                    e for e in bucket_entries
+                    if self._index_entry_key(e) not in seen]
+            live_buckets.add(bucket)
+            self._set_key(bucket_key, bucket_entries)
+
+        # NOTE: The index is rewritten even if its buckets did not change so
+        # that it does not expire before its buckets in backends that expire
+        # keys (e.g. memcache).
+        self._set_key(bucketed_index_key, {'buckets': sorted(live_buckets)})
+
     def _get_user_token_list_with_expiry(self, user_key):
         """Return a list of tuples in the format (token_id, token_expiry) for
         the user_key.
         """
-        return self._get_key_or_default(user_key, default=[])
+        return self._get_index_entries(user_key)
 
     def _get_user_token_list(self, user_key):
         """Return a list of token_ids for the user_key."""
@@ -151,46 +297,31 @@ class Token(token.persistence.Driver):
         # list of token_ids are returned.
         return [t[0] for t in token_list]
 
-    def _update_user_token_list(self, user_key, token_id, expires_isotime_str):
-        current_time = self._get_current_time()
-        revoked_token_list = set([t['id'] for t in
-                                  self.list_revoked_tokens()])
+    def _user_token_expires(self, item):
+        return self._format_token_index_item(item)[1]
 
+    def _update_user_token_list(self, user_key, token_id, expires_isotime_str):
+        # NOTE: Revoked tokens are not removed from the user's token list;
+        # they are skipped by _list_tokens once deleted and dropped with their
+        # bucket when they expire.
         with self._store.get_lock(user_key) as lock:
-            filtered_list = []
-            token_list = self._get_user_token_list_with_expiry(user_key)
-            for item in token_list:
-                try:
-                    item_id, expires = self._format_token_index_item(item)
-                except (ValueError, TypeError):
-                    # NOTE(morganfainberg): Skip on expected errors
-                    # possibilities from the `_format_token_index_item` method.
-                    continue
-
-                if expires < current_time:
-                    LOG.debug(('Token `%(token_id)s` is expired, removing '
-                               'from `%(user_key)s`.'),
-                              {'token_id': item_id, 'user_key': user_key})
-                    continue
-
-                if item_id in revoked_token_list:
-                    # NOTE(morganfainberg): If the token has been revoked, it
-                    # can safely be removed from this list.  This helps to keep
-                    # the user_token_list as reasonably small as possible.
-                    LOG.debug(('Token `%(token_id)s` is revoked, removing '
-                               'from `%(user_key)s`.'),
-                              {'token_id': item_id, 'user_key': user_key})
-                    continue
-                filtered_list.append(item)
-            filtered_list.append((token_id, expires_isotime_str))
-            self._set_key(user_key, filtered_list, lock)
-            return filtered_list
+            self._add_to_index(user_key, [(token_id, expires_isotime_str)],
+                               self._user_token_expires, lock)
 
     def _get_current_time(self):
         return timeutils.normalize_time(timeutils.utcnow())
 
+    def _revoked_token_expires(self, token_data):
+        try:
+            return timeutils.normalize_time(
+                timeutils.parse_isotime(token_data['expires']))
+        except ValueError:
+            LOG.warning(_LW('Removing `%s` from revocation list due to '
+                            'invalid expires data in revocation list.'),
+                        token_data.get('id', 'INVALID_TOKEN_DATA'))
+            raise
+
     def _add_to_revocation_list(self, data, lock):
-        filtered_list = []
         revoked_token_data = {}
 
         current_time = self._get_current_time()
@@ -210,40 +341,8 @@ class Token(token.persistence.Driver):
                                                       subsecond=True)
         revoked_token_data['id'] = data['id']
 
-        token_list = self._get_key_or_default(self.revocation_key, default=[])
-        if not isinstance(token_list, list):
-            # NOTE(morganfainberg): In the case that the revocation list is not
-            # in a format we understand, reinitialize it. This is an attempt to
-            # not allow the revocation list to be completely broken if
-            # somehow the key is changed outside of keystone (e.g. memcache
-            # that is shared by multiple applications). Logging occurs at error
-            # level so that the cloud administrators have some awareness that
-            # the revocation_list needed to be cleared out. In all, this should
-            # be recoverable. Keystone cannot control external applications
-            # from changing a key in some backends, however, it is possible to
-            # gracefully handle and notify of this event.
-            LOG.error(_LE('Reinitializing revocation list due to error '
-                          'in loading revocation list from backend.  '
-                          'Expected `list` type got `%(type)s`. Old '
-                          'revocation list data: %(list)r'),
-                      {'type': type(token_list), 'list': token_list})
-            token_list = []
-
-        # NOTE(morganfainberg): on revocation, cleanup the expired entries, try
-        # to keep the list of tokens revoked at the minimum.
-        for token_data in token_list:
-            try:
-                expires_at = timeutils.normalize_time(
-                    timeutils.parse_isotime(token_data['expires']))
-            except ValueError:
-                LOG.warning(_LW('Removing `%s` from revocation list due to '
-                                'invalid expires data in revocation list.'),
-                            token_data.get('id', 'INVALID_TOKEN_DATA'))
-                continue
-            if expires_at > current_time:
-                filtered_list.append(token_data)
-        filtered_list.append(revoked_token_data)
-        self._set_key(self.revocation_key, filtered_list, lock)
+        self._add_to_index(self.revocation_key, [revoked_token_data],
+                           self._revoked_token_expires, lock)
 
     def delete_token(self, token_id):
         # Test for existence
@@ -345,11 +444,16 @@ class Token(token.persistence.Driver):
         return tokens
 
     def list_revoked_tokens(self):
-        revoked_token_list = self._get_key_or_default(self.revocation_key,
-                                                      default=[])
-        if isinstance(revoked_token_list, list):
-            return revoked_token_list
-        return []
+        current_time = self._get_current_time()
+        revoked_token_list = []
+        for token_data in self._get_index_entries(self.revocation_key):
+            try:
+                expires = self._revoked_token_expires(token_data)
+            except (TypeError, ValueError):
+                continue
+            if expires > current_time:
+                revoked_token_list.append(token_data)
+        return revoked_token_list
 
     def flush_expired_tokens(self):
         """Archive or delete tokens that have expired."""
@@ -94,6 +94,18 @@ class Token(token.persistence.Driver):
             raise exception.TokenNotFound(token_id=token_id)
         return token_ref.to_dict()
 
+    def get_tokens(self, token_ids):
+        token_ids = [token_id for token_id in token_ids
+                     if token_id is not None]
+        if not token_ids:
+            return {}
+        session = sql.get_session()
+        query = session.query(TokenModel)
+        query = query.filter(TokenModel.id.in_(token_ids))
+        query = query.filter_by(valid=True)
+        return dict((token_ref.id, token_ref.to_dict())
+                    for token_ref in query)
+
     def create_token(self, token_id, data):
         data_copy = copy.deepcopy(data)
         if not data_copy.get('expires'):
@@ -281,3 +293,23 @@ class Token(token.persistence.Driver):
 
         session.flush()
         LOG.info(_LI('Total expired tokens removed: %d'), total_removed)
+
+    def flush_expired_tokens_batch(self, batch_size, lower_bound=None,
+                                   upper_bound=None):
+        now = timeutils.utcnow()
+        if upper_bound is None or upper_bound > now:
+            upper_bound = now
+        session = sql.get_session()
+        with session.begin():
+            query = session.query(TokenModel.id)
+            query = query.filter(TokenModel.expires <= upper_bound)
+            if lower_bound is not None:
+                query = query.filter(TokenModel.expires > lower_bound)
+            query = query.order_by(TokenModel.expires)
+            token_ids = [token_ref[0] for token_ref in
+                         query.limit(batch_size)]
+            if not token_ids:
+                return 0
+            delete_query = session.query(TokenModel)
+            delete_query = delete_query.filter(TokenModel.id.in_(token_ids))
+            return delete_query.delete(synchronize_session=False)
@@ -74,6 +74,28 @@ class PersistenceManager(manager.Manager):
         self._assert_valid(token_id, token_ref)
         return token_ref
 
+    def get_tokens(self, token_ids):
+        """Get several tokens with a single call to the backend.
+
+        :param token_ids: list of token identifiers
+        :returns: dict of token_ref keyed by the unique id of each token.
+                  Tokens that are not found or have expired are omitted.
+
+        """
+        unique_ids = set(utils.generate_unique_id(token_id)
+                         for token_id in token_ids if token_id)
+        if not unique_ids:
+            return {}
+        token_refs = self.driver.get_tokens(list(unique_ids))
+        valid_refs = {}
+        for unique_id, token_ref in token_refs.items():
+            try:
+                self._assert_valid(unique_id, token_ref)
+            except exception.TokenNotFound:
+                continue
+            valid_refs[unique_id] = token_ref
+        return valid_refs
+
     @MEMOIZE
     def _get_token(self, token_id):
         # Only ever use the "unique" id in the cache key.
@@ -245,6 +267,27 @@ class Driver(object):
         """
         raise exception.NotImplemented()  # pragma: no cover
 
+    def get_tokens(self, token_ids):
+        """Get several tokens by id.
+
+        Drivers that can look up several tokens in a single round trip should
+        override this; the default implementation calls ``get_token`` for
+        each token.
+
+        :param token_ids: identities of the tokens
+        :type token_ids: list
+        :returns: dict of token_ref keyed by token_id, tokens that are not
+                  found are omitted.
+
+        """
+        token_refs = {}
+        for token_id in token_ids:
+            try:
+                token_refs[token_id] = self.get_token(token_id)
+            except exception.TokenNotFound:
+                pass
+        return token_refs
+
     @abc.abstractmethod
     def create_token(self, token_id, data):
         """Create a token by id and data.
@@ -357,3 +400,24 @@ class Driver(object):
         """Archive or delete tokens that have expired.
         """
         raise exception.NotImplemented()  # pragma: no cover
+
+    def flush_expired_tokens_batch(self, batch_size, lower_bound=None,
+                                   upper_bound=None):
+        """Delete a bounded batch of expired tokens in a single transaction.
+
+        The oldest tokens that expired after ``lower_bound`` and no later than
+        ``upper_bound`` are deleted first, so several flushes may run in
+        parallel on disjoint expiry ranges.
+
+        :param batch_size: maximum number of tokens to delete
+        :param lower_bound: only delete tokens that expired after this time,
+                            defaults to no lower bound
+        :type lower_bound: datetime
+        :param upper_bound: only delete tokens that expired no later than this
+                            time, defaults to and is at most now so that
+                            unexpired tokens are never deleted
+        :type upper_bound: datetime
+        :returns: the number of tokens deleted
+
+        """
+        raise exception.NotImplemented()  # pragma: no cover
@@ -190,6 +190,95 @@ class Manager(manager.Manager):
         self._is_valid_token(token)
         return token
 
+    def validate_tokens(self, token_ids):
+        """Validate several tokens at once.
+
+        Previously validated tokens are fetched from the cache with a single
+        ``get_multi``, persisted token references are loaded with a single
+        call to the persistence backend and every token is checked against the
+        same snapshot of the revocation tree.
+
+        :param token_ids: list of token identifiers
+        :returns: dict mapping each token_id to its token data, or to None if
+                  the token is not valid
+
+        """
+        results = dict.fromkeys(token_ids)
+        unique_ids = dict((token_id, utils.generate_unique_id(token_id))
+                          for token_id in results if token_id)
+        tokens = self._validate_tokens(set(unique_ids.values()))
+
+        candidates = []
+        token_values_list = []
+        for token_id, unique_id in unique_ids.items():
+            token = tokens.get(unique_id)
+            if token is None:
+                continue
+            try:
+                self._assert_token_not_expired(token)
+                token_values = self._get_revocation_token_values(token)
+            except exception.Error:
+                continue
+            candidates.append((token_id, token))
+            token_values_list.append(token_values)
+
+        revoked = self.revoke_api.check_tokens(token_values_list)
+        for (token_id, token), is_revoked in zip(candidates, revoked):
+            if not is_revoked:
+                results[token_id] = token
+        return results
+
+    def _validate_tokens(self, unique_ids):
+        """Return the validated token data for several tokens.
+
+        Tokens which fail validation are omitted from the result.
+
+        """
+        unique_ids = list(unique_ids)
+        tokens = {}
+        if MEMOIZE.should_cache(None):
+            cached = cache.get_multi(self._validate_token,
+                                     *[(self, unique_id)
+                                       for unique_id in unique_ids])
+            for unique_id, token in zip(unique_ids, cached):
+                if token is not None:
+                    tokens[unique_id] = token
+
+        missing = [unique_id for unique_id in unique_ids
+                   if unique_id not in tokens]
+        if not missing:
+            return tokens
+
+        if self._needs_persistence:
+            token_refs = self._persistence.get_tokens(missing)
+            validate = self._validate_persisted_token
+        else:
+            token_refs = dict((unique_id, unique_id) for unique_id in missing)
+            validate = self.driver.validate_v3_token
+
+        for unique_id, token_ref in token_refs.items():
+            try:
+                token = validate(token_ref)
+            except exception.Error as e:
+                LOG.debug('Failed to validate token %(token_id)s: %(error)s',
+                          {'token_id': unique_id, 'error': e})
+                continue
+            if MEMOIZE.should_cache(token):
+                self._validate_token.set(token, self, unique_id)
+            tokens[unique_id] = token
+        return tokens
+
+    def _get_revocation_token_values(self, token):
+        """Build the values used to check the token against revocations."""
+        version = self.driver.get_token_version(token)
+        try:
+            if version == V2:
+                return self.revoke_api.model.build_token_values_v2(
+                    token['access'], CONF.identity.default_domain_id)
+            return self.revoke_api.model.build_token_values(token['token'])
+        except KeyError:
+            raise exception.TokenNotFound(_('Failed to validate token'))
+
     def check_revocation_v2(self, token):
         try:
             token_data = token['access']
@@ -251,6 +340,9 @@ class Manager(manager.Manager):
         if not self._needs_persistence:
             return self.driver.validate_v3_token(token_id)
         token_ref = self._persistence.get_token(token_id)
+        return self._validate_persisted_token(token_ref)
+
+    def _validate_persisted_token(self, token_ref):
         version = self.driver.get_token_version(token_ref)
         if version == self.V3:
             return self.driver.validate_v3_token(token_ref)
@@ -268,6 +360,13 @@ class Manager(manager.Manager):
 
     def _is_valid_token(self, token):
         """Verify the token is valid format and has not expired."""
+        self._assert_token_not_expired(token)
+        self.check_revocation(token)
+        # Token has not expired and has not been revoked.
+        return None
+
+    def _assert_token_not_expired(self, token):
+        """Raise TokenNotFound if the token is malformed or has expired."""
 
         current_time = timeutils.normalize_time(timeutils.utcnow())
 
@@ -286,11 +385,7 @@ class Manager(manager.Manager):
                               'determining token expiry: %s'), token)
             raise exception.TokenNotFound(_('Failed to validate token'))
 
-        if current_time < expiry:
-            self.check_revocation(token)
-            # Token has not expired and has not been revoked.
-            return None
-        else:
+        if current_time >= expiry:
             raise exception.TokenNotFound(_('Failed to validate token'))
 
     def _token_belongs_to(self, token, belongs_to):
@@ -40,9 +40,58 @@ TIMESTAMP_START = 1
 TIMESTAMP_END = 9
 
 
+class HintedMultiFernet(object):
+    """A MultiFernet that tries the key that last decrypted a token first.
+
+    ``fernet.MultiFernet`` tries each key in order, so after a rotation
+    every token signed with the previous primary key costs an extra HMAC for
+    each key tried before it. Tokens in flight are usually signed with the
+    same key, so remembering the key that last succeeded avoids most of the
+    failed attempts.
+
+    The number of tokens decrypted with each key, in key repository order
+    (primary key first), is exposed as ``successes``.
+
+    """
+
+    def __init__(self, fernets):
+        self._fernets = list(fernets)
+        if not self._fernets:
+            raise ValueError('HintedMultiFernet requires at least one key')
+        self._hint = 0
+        self.successes = [0] * len(self._fernets)
+
+    def encrypt(self, msg):
+        return self._fernets[0].encrypt(msg)
+
+    def _try_decrypt(self, index, msg, ttl):
+        plaintext = self._fernets[index].decrypt(msg, ttl)
+        self._hint = index
+        self.successes[index] += 1
+        return plaintext
+
+    def decrypt(self, msg, ttl=None):
+        hint = self._hint
+        try:
+            return self._try_decrypt(hint, msg, ttl)
+        except fernet.InvalidToken:
+            pass
+
+        for index in range(len(self._fernets)):
+            if index == hint:
+                continue
+            try:
+                return self._try_decrypt(index, msg, ttl)
+            except fernet.InvalidToken:
+                pass
+        raise fernet.InvalidToken
+
+
 class TokenFormatter(object):
     """Packs and unpacks payloads into tokens for transport."""
 
+    _crypto = (None, None)
+
     @property
     def crypto(self):
         """Return a cryptography instance.
@@ -56,13 +105,20 @@ class TokenFormatter(object):
         ``encrypt(plaintext)`` and ``decrypt(ciphertext)``.
 
         """
-        keys = utils.load_keys()
+        keys = utils.KEY_CACHE.load_keys()
 
         if not keys:
             raise exception.KeysNotFound()
 
-        fernet_instances = [fernet.Fernet(key) for key in keys]
-        return fernet.MultiFernet(fernet_instances)
+        # NOTE: The key cache returns the same list for as long as the key
+        # repository is unchanged, so the MultiFernet built from it is reused
+        # across requests.
+        crypto_keys, crypto = self._crypto
+        if keys is not crypto_keys:
+            fernet_instances = [fernet.Fernet(key) for key in keys]
+            crypto = HintedMultiFernet(fernet_instances)
+            self._crypto = (keys, crypto)
+        return crypto
 
     def pack(self, payload):
         """Pack a payload for transport as a token."""
@@ -108,6 +164,36 @@ class TokenFormatter(object):
                      domain_id=None, project_id=None, trust_id=None,
                      federated_info=None):
         """Given a set of payload attributes, generate a Fernet token."""
+        serialized_payload = None
+        if (CONF.fernet_tokens.packed_payloads and
+                not (trust_id or federated_info)):
+            serialized_payload = PackedPayload.assemble(
+                user_id, methods, domain_id, project_id, expires_at,
+                audit_ids)
+        if serialized_payload is None:
+            serialized_payload = self._assemble_payload(
+                user_id, expires_at, audit_ids, methods=methods,
+                domain_id=domain_id, project_id=project_id,
+                trust_id=trust_id, federated_info=federated_info)
+        token = self.pack(serialized_payload)
+
+        # NOTE(lbragstad): We should warn against Fernet tokens that are over
+        # 255 characters in length. This is mostly due to persisting the tokens
+        # in a backend store of some kind that might have a limit of 255
+        # characters. Even though Keystone isn't storing a Fernet token
+        # anywhere, we can't say it isn't being stored somewhere else with
+        # those kind of backend constraints.
+        if len(token) > 255:
+            LOG.info(_LI('Fernet token created with length of %d '
+                         'characters, which exceeds 255 characters'),
+                     len(token))
+
+        return token
+
+    def _assemble_payload(self, user_id, expires_at, audit_ids, methods=None,
+                          domain_id=None, project_id=None, trust_id=None,
+                          federated_info=None):
+        """Assemble and serialize a payload with msgpack."""
         if trust_id:
             version = TrustScopedPayload.version
             payload = TrustScopedPayload.assemble(
@@ -168,21 +254,7 @@ class TokenFormatter(object):
                 audit_ids)
 
         versioned_payload = (version,) + payload
-        serialized_payload = msgpack.packb(versioned_payload)
-        token = self.pack(serialized_payload)
-
-        # NOTE(lbragstad): We should warn against Fernet tokens that are over
-        # 255 characters in length. This is mostly due to persisting the tokens
-        # in a backend store of some kind that might have a limit of 255
-        # characters. Even though Keystone isn't storing a Fernet token
-        # anywhere, we can't say it isn't being stored somewhere else with
-        # those kind of backend constraints.
-        if len(token) > 255:
-            LOG.info(_LI('Fernet token created with length of %d '
-                         'characters, which exceeds 255 characters'),
-                     len(token))
-
-        return token
+        return msgpack.packb(versioned_payload)
 
     def validate_token(self, token):
         """Validates a Fernet token and returns the payload attributes."""
@@ -191,8 +263,6 @@ class TokenFormatter(object):
             token = token.encode('ascii')
 
         serialized_payload = self.unpack(token)
-        versioned_payload = msgpack.unpackb(serialized_payload)
-        version, payload = versioned_payload[0], versioned_payload[1:]
 
         # depending on the formatter, these may or may not be defined
         domain_id = None
@@ -200,7 +270,16 @@ class TokenFormatter(object):
         trust_id = None
         federated_info = None
 
-        if version == UnscopedPayload.version:
+        if PackedPayload.is_packed(serialized_payload):
+            version, payload = PackedPayload.version, serialized_payload
+        else:
+            versioned_payload = msgpack.unpackb(serialized_payload)
+            version, payload = versioned_payload[0], versioned_payload[1:]
+
+        if version == PackedPayload.version:
+            (user_id, methods, domain_id, project_id, expires_at,
+             audit_ids) = PackedPayload.disassemble(payload)
+        elif version == UnscopedPayload.version:
             (user_id, methods, expires_at, audit_ids) = (
                 UnscopedPayload.disassemble(payload))
         elif version == DomainScopedPayload.version:
@@ -655,3 +734,128 @@ class FederatedProjectScopedPayload(FederatedScopedPayload):
 
 class FederatedDomainScopedPayload(FederatedScopedPayload):
     version = 6
+
+
+class PackedPayload(BasePayload):
+    """Packs the most common payloads without msgpack.
+
+    Unscoped, domain-scoped and project-scoped payloads whose user, scope and
+    audit IDs are all UUIDs are packed with precompiled structs into a fixed
+    layout, led by a marker byte and the version of the equivalent msgpack
+    payload. Anything else is left to the msgpack payloads.
+
+    """
+
+    # NOTE: The version doubles as the leading marker byte. 0xc1 is never
+    # used by msgpack, so a msgpack payload can't start with it.
+    version = 0xc1
+
+    # The marker byte and the version of the equivalent msgpack payload.
+    _prefix = struct.Struct('>BB')
+    # Fixed-length fields following the prefix for each supported version:
+    # user_id, methods, [scope_id,] expires_at and the number of audit_ids.
+    _structs = {
+        UnscopedPayload.version: struct.Struct('>16sIdB'),
+        DomainScopedPayload.version: struct.Struct('>16sI16sdB'),
+        ProjectScopedPayload.version: struct.Struct('>16sI16sdB'),
+    }
+    _audit_id_length = 16
+
+    @classmethod
+    def is_packed(cls, serialized_payload):
+        return (bool(serialized_payload) and
+                six.indexbytes(serialized_payload, 0) == cls.version)
+
+    @classmethod
+    def assemble(cls, user_id, methods, domain_id, project_id, expires_at,
+                 audit_ids):
+        """Serialize the payload of a token, if it can be packed.
+
+        :param user_id: ID of the user in the token request
+        :param methods: list of authentication methods used
+        :param domain_id: optional ID of the domain to scope to
+        :param project_id: optional ID of the project to scope to
+        :param expires_at: datetime of the token's expiration
+        :param audit_ids: list of the token's audit IDs
+        :returns: the serialized payload, or None if the payload can't be
+                  packed and should be serialized with msgpack instead
+
+        """
+        try:
+            b_user_id = cls._convert_exact_uuid_hex_to_bytes(user_id)
+            if project_id:
+                scope_version = ProjectScopedPayload.version
+                scope = (cls._convert_exact_uuid_hex_to_bytes(project_id),)
+            elif domain_id:
+                scope_version = DomainScopedPayload.version
+                scope = (cls._convert_exact_uuid_hex_to_bytes(domain_id),)
+            else:
+                scope_version = UnscopedPayload.version
+                scope = ()
+            b_audit_ids = [provider.random_urlsafe_str_to_bytes(audit_id)
+                           for audit_id in audit_ids]
+        except (TypeError, ValueError):
+            return None
+
+        if (len(b_audit_ids) > 255 or
+                any(len(b_audit_id) != cls._audit_id_length
+                    for b_audit_id in b_audit_ids)):
+            return None
+
+        int_methods = auth_plugins.convert_method_list_to_integer(methods)
+        if int_methods >= 2 ** 32:
+            return None
+
+        fields = ((b_user_id, int_methods) + scope +
+                  (cls._convert_time_string_to_int(expires_at),
+                   len(b_audit_ids)))
+        return b''.join([cls._prefix.pack(cls.version, scope_version),
+                         cls._structs[scope_version].pack(*fields)] +
+                        b_audit_ids)
+
+    @classmethod
+    def _convert_exact_uuid_hex_to_bytes(cls, uuid_string):
+        """Compress a UUID hex string, only if it can be restored as is."""
+        b_uuid = cls.convert_uuid_hex_to_bytes(uuid_string)
+        if cls.convert_uuid_bytes_to_hex(b_uuid) != uuid_string:
+            raise ValueError(uuid_string)
+        return b_uuid
+
+    @classmethod
+    def disassemble(cls, serialized_payload):
+        """Disassemble a payload serialized by ``assemble``.
+
+        :param serialized_payload: the serialized payload of a token
+        :returns: a tuple containing the user_id, auth methods, domain_id,
+                  project_id, expires_at_str, and audit_ids
+
+        """
+        try:
+            scope_version = cls._prefix.unpack_from(serialized_payload)[1]
+            fields_struct = cls._structs[scope_version]
+            fields = fields_struct.unpack_from(serialized_payload,
+                                               cls._prefix.size)
+        except (KeyError, struct.error):
+            raise exception.ValidationError(
+                _('This is not a recognized Fernet payload'))
+
+        domain_id = None
+        project_id = None
+        user_id = cls.convert_uuid_bytes_to_hex(fields[0])
+        methods = auth_plugins.convert_integer_to_method_list(fields[1])
+        if scope_version == ProjectScopedPayload.version:
+            project_id = cls.convert_uuid_bytes_to_hex(fields[2])
+        elif scope_version == DomainScopedPayload.version:
+            domain_id = cls.convert_uuid_bytes_to_hex(fields[2])
+        expires_at_str = cls._convert_int_to_time_string(fields[-2])
+
+        offset = cls._prefix.size + fields_struct.size
+        length = cls._audit_id_length
+        audit_ids = [
+            provider.base64_encode(
+                serialized_payload[offset + i * length:
+                                   offset + (i + 1) * length])
+            for i in range(fields[-1])]
+
+        return (user_id, methods, domain_id, project_id, expires_at_str,
+                audit_ids)
@@ -12,11 +12,14 @@
 
 import os
 import stat
+import threading
+import time
 
 from cryptography import fernet
 from oslo_config import cfg
 from oslo_log import log
 
+from keystone.common import environment
 from keystone.i18n import _LE, _LW, _LI
 
 
@@ -263,3 +266,70 @@ def load_keys():
 
     # return the encryption_keys, sorted by key number, descending
     return [keys[x] for x in sorted(keys.keys(), reverse=True)]
+
+
+class KeyCache(object):
+    """Cache the keys loaded from the key repository.
+
+    Keys are only reloaded from disk when the key repository directory has
+    changed, which is detected by its inode, mtime and ctime (key rotation and
+    key distribution add, rename and remove files in the directory), or after
+    ``invalidate()`` has been called.
+
+    The number of cache hits and reloads are exposed as ``hits`` and
+    ``reloads``.
+
+    """
+
+    # NOTE: A change to the directory made within this many seconds of loading
+    # the keys could share the mtime of the loaded state, so a directory
+    # modified that recently is not trusted to be unchanged.
+    _MTIME_GRANULARITY = 1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._signature = None
+        self._keys = []
+        self.hits = 0
+        self.reloads = 0
+
+    def _repository_signature(self):
+        repository = CONF.fernet_tokens.key_repository
+        try:
+            stat_info = os.stat(repository)
+        except OSError:
+            return None
+        if time.time() - stat_info.st_mtime < self._MTIME_GRANULARITY:
+            return None
+        return (repository, stat_info.st_ino, stat_info.st_mtime,
+                stat_info.st_ctime)
+
+    def load_keys(self):
+        """Return the keys of the key repository, as ``load_keys()`` does.
+
+        The same list is returned for as long as the keys are unchanged.
+
+        """
+        signature = self._repository_signature()
+        if signature is not None and signature == self._signature:
+            self.hits += 1
+            return self._keys
+
+        with self._lock:
+            keys = load_keys()
+            if keys != self._keys:
+                self._keys = keys
+            # Only trust the signature if the keys could be loaded; an
+            # invalid repository is checked again on the next call.
+            self._signature = signature if keys else None
+            self.reloads += 1
+            return self._keys
+
+    def invalidate(self):
+        """Force the keys to be reloaded on the next call to load_keys."""
+        self._signature = None
+
+
+KEY_CACHE = KeyCache()
+# Reload the keys when the server is reset (SIGHUP).
+environment.register_reset_callback(KEY_CACHE.invalidate)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Measure Fernet tokens issued and validated per second on one core.
+
+Compares msgpack payloads with packed payloads (``[fernet_tokens]
+packed_payloads``) for unscoped, domain-scoped and project-scoped tokens.
+Keys are generated in memory, so key repository I/O is not measured.
+
+Usage: python tools/benchmark_fernet_tokens.py [tokens]
+
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+import uuid
+
+from cryptography import fernet
+from oslo_utils import timeutils
+
+from keystone.common import config
+from keystone.common import utils
+from keystone.token import provider
+from keystone.token.providers.fernet import token_formatters
+
+
+CONF = config.CONF
+
+
+class InMemoryTokenFormatter(token_formatters.TokenFormatter):
+    def __init__(self):
+        self._in_memory_crypto = fernet.MultiFernet(
+            [fernet.Fernet(fernet.Fernet.generate_key())])
+
+    @property
+    def crypto(self):
+        return self._in_memory_crypto
+
+
+def _rate(count, fn):
+    start = time.time()
+    for i in range(count):
+        fn(i)
+    return count / (time.time() - start)
+
+
+def main(count):
+    config.configure()
+    CONF(args=[], project='keystone', default_config_files=[])
+    formatter = InMemoryTokenFormatter()
+
+    user_id = uuid.uuid4().hex
+    expires_at = utils.isotime(timeutils.utcnow(), subsecond=True)
+    audit_ids = [provider.random_urlsafe_str()]
+    scopes = [('unscoped', {}),
+              ('domain', {'domain_id': uuid.uuid4().hex}),
+              ('project', {'project_id': uuid.uuid4().hex})]
+
+    for packed in (False, True):
+        CONF.set_override('packed_payloads', packed, group='fernet_tokens')
+        for name, scope in scopes:
+            tokens = []
+
+            def issue(i):
+                tokens.append(formatter.create_token(
+                    user_id, expires_at, audit_ids, methods=['password'],
+                    **scope))
+
+            def validate(i):
+                formatter.validate_token(tokens[i])
+
+            issued = _rate(count, issue)
+            validated = _rate(count, validate)
+            print('%-7s %-8s issued %8.0f/s  validated %8.0f/s' % (
+                'packed' if packed else 'msgpack', name, issued, validated))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Measure password authentication latency and throughput per hash scheme.
+
+For each ``[identity] password_hash_algorithm`` and a range of
+``password_hash_rounds``, reports the median and 95th percentile time to
+verify a password on one core, and the verifications per second when
+``[identity] password_hash_workers`` processes verify passwords for as many
+concurrent requests. Schemes whose backend is not installed are skipped.
+
+Usage: python tools/benchmark_password_hashing.py [count] [workers]
+
+"""
+
+from __future__ import print_function
+
+import multiprocessing
+import sys
+import threading
+import time
+import uuid
+
+from passlib import exc
+from six.moves import range
+
+from keystone.common import config
+from keystone.common import password_hashing
+from keystone.common import utils
+
+
+CONF = config.CONF
+
+COSTS = [('sha512_crypt', [5000, 10000, 40000, 100000]),
+         ('pbkdf2_sha512', [10000, 25000, 100000]),
+         ('bcrypt', [10, 12, 14]),
+         ('scrypt', [12, 14, 16])]
+
+
+def _latencies(count, hashed, password):
+    latencies = []
+    for i in range(count):
+        start = time.time()
+        utils.check_password(password, hashed)
+        latencies.append(time.time() - start)
+    latencies.sort()
+    return (latencies[len(latencies) // 2],
+            latencies[len(latencies) * 95 // 100])
+
+
+def _throughput(count, workers, hashed, password):
+    pool = password_hashing.HashingPool(workers, queue_size=workers,
+                                        timeout=60)
+
+    def verify():
+        for i in range(count):
+            pool.run(utils.check_password, password, hashed)
+
+    threads = [threading.Thread(target=verify) for i in range(workers)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+    pool.close()
+    return count * workers / elapsed
+
+
+def main(count, workers):
+    config.configure()
+    CONF(args=[], project='keystone', default_config_files=[])
+    password = uuid.uuid4().hex
+
+    for scheme, costs in COSTS:
+        CONF.set_override('password_hash_algorithm', scheme, group='identity')
+        for rounds in costs:
+            CONF.set_override('password_hash_rounds', rounds,
+                              group='identity')
+            try:
+                hashed = utils.hash_password(password)
+            except (exc.MissingBackendError, KeyError):
+                print('%-13s not available' % scheme)
+                break
+            median, p95 = _latencies(count, hashed, password)
+            rate = _throughput(count, workers, hashed, password)
+            print('%-13s rounds %6d  median %7.1fms  p95 %7.1fms  '
+                  '%d workers %7.1f/s' % (scheme, rounds, median * 1000,
+                                          p95 * 1000, workers, rate))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+         int(sys.argv[2]) if len(sys.argv) > 2
+         else multiprocessing.cpu_count())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compare policy enforcement with and without the decision cache.
+
+Enforces ``identity:list_users``, as the ``filterprotected`` decorator does,
+for a pool of 100 users making repeated requests against both sample policy
+files, and reports the enforcement rate and the cache hits and misses.
+
+Usage: python tools/benchmark_policy_cache.py [count]
+
+"""
+
+from __future__ import print_function
+
+import os
+import random
+import sys
+import time
+import uuid
+
+from six.moves import range
+
+from keystone.common import config
+from keystone.common import utils
+from keystone.policy.backends import rules
+
+
+CONF = config.CONF
+
+ETC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       os.pardir, 'etc')
+
+
+def _new_id():
+    return uuid.uuid4().hex
+
+
+def _build_requests(count):
+    domain_ids = [_new_id() for i in range(5)]
+    users = []
+    for i in range(100):
+        domain_id = random.choice(domain_ids)
+        users.append({'user_id': _new_id(),
+                      'domain_id': domain_id,
+                      'project_id': None,
+                      'roles': random.choice([['admin'], ['member']]),
+                      'is_delegated_auth': False,
+                      'trust_id': None,
+                      'trustor_id': None,
+                      'trustee_id': None,
+                      'consumer_id': None,
+                      'access_token_id': None})
+    requests = []
+    for i in range(count):
+        credentials = random.choice(users)
+        target = utils.flatten_dict({'domain_id': credentials['domain_id']})
+        requests.append((credentials, target))
+    return requests
+
+
+def _rate(requests):
+    start = time.time()
+    for credentials, target in requests:
+        rules.enforce(credentials, 'identity:list_users', target,
+                      do_raise=False)
+    return len(requests) / (time.time() - start)
+
+
+def main(count):
+    config.configure()
+    CONF(args=[], project='keystone', default_config_files=[])
+    # Creating the enforcer registers the [oslo_policy] options.
+    rules.init()
+    requests = _build_requests(count)
+
+    for policy_file in ('policy.json', 'policy.v3cloudsample.json'):
+        CONF.set_override('policy_file', os.path.join(ETC_DIR, policy_file),
+                          group='oslo_policy')
+        for cache_size in (0, 1000):
+            CONF.set_override('decision_cache_size', cache_size,
+                              group='policy')
+            rules.reset()
+            hits, misses = rules._DECISIONS.hits, rules._DECISIONS.misses
+            rate = _rate(requests)
+            print('%-26s cache %4d  %9.0f checks/s  hits %7d  misses %5d' % (
+                policy_file, cache_size, rate,
+                rules._DECISIONS.hits - hits,
+                rules._DECISIONS.misses - misses))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compare the recursive and compiled RevokeTree matchers.
+
+Builds trees of 1k, 10k and 100k revocation events and times checking a
+batch of tokens against each with ``RevokeTree._search`` and with
+``RevokeTree.is_revoked``.
+
+Usage: python tools/benchmark_revoke_tree.py [iterations]
+
+"""
+
+from __future__ import print_function
+
+import datetime
+import random
+import sys
+import timeit
+import uuid
+
+from oslo_utils import timeutils
+from six.moves import range
+
+from keystone.contrib.revoke import model
+
+
+def _new_id():
+    return uuid.uuid4().hex
+
+
+def _build_tree(count, user_ids, project_ids, role_ids):
+    tree = model.RevokeTree()
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            event = model.RevokeEvent(user_id=random.choice(user_ids))
+        elif kind == 1:
+            event = model.RevokeEvent(audit_id=_new_id())
+        elif kind == 2:
+            event = model.RevokeEvent(project_id=random.choice(project_ids),
+                                      role_id=random.choice(role_ids))
+        else:
+            event = model.RevokeEvent(user_id=random.choice(user_ids),
+                                      project_id=random.choice(project_ids))
+        tree.add_event(event)
+    return tree
+
+
+def _build_tokens(count, user_ids, project_ids, role_ids):
+    issued_at = timeutils.utcnow() - datetime.timedelta(minutes=2)
+    tokens = []
+    for i in range(count):
+        token_data = model.blank_token_data(issued_at)
+        token_data['user_id'] = random.choice(user_ids)
+        token_data['project_id'] = random.choice(project_ids)
+        token_data['audit_id'] = _new_id()
+        token_data['audit_chain_id'] = token_data['audit_id']
+        token_data['roles'] = random.sample(role_ids, 3)
+        tokens.append(token_data)
+    return tokens
+
+
+def main(iterations):
+    user_ids = [_new_id() for i in range(20000)]
+    project_ids = [_new_id() for i in range(2000)]
+    role_ids = [_new_id() for i in range(20)]
+    tokens = _build_tokens(1000, user_ids, project_ids, role_ids)
+
+    for count in (1000, 10000, 100000):
+        tree = _build_tree(count, user_ids, project_ids, role_ids)
+
+        def search():
+            for token_data in tokens:
+                tree._search(tree.revoke_map, model._EVENT_NAMES, token_data)
+
+        def compiled():
+            for token_data in tokens:
+                tree.is_revoked(token_data)
+
+        search_time = min(timeit.repeat(search, number=1,
+                                        repeat=iterations))
+        compiled_time = min(timeit.repeat(compiled, number=1,
+                                          repeat=iterations))
+        print('%6d events: _search %8.1f us/token, is_revoked %8.1f '
+              'us/token (%.1fx)' % (
+                  count,
+                  search_time * 1e6 / len(tokens),
+                  compiled_time * 1e6 / len(tokens),
+                  search_time / compiled_time))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)